@@ -7,6 +7,85 @@ class Settings(BaseSettings):
     gemini_api_key: str
     openai_api_key: str
     pinecone_api_key: str
+
+    # Vector store backend: "pinecone" or "local" (memory-mapped index on disk)
+    vector_store_backend: str = "pinecone"
+
+    # Embedding pipeline
+    embedding_batch_max_tokens: int = 100000  # Token budget per embeddings request
+    embedding_batch_max_inputs: int = 1024  # Max chunks per embeddings request
+    embedding_max_concurrency: int = 4  # Embedding requests in flight at once
+
+    # Speech recognition
+    speech_pool_size: int = 1  # Pre-connected recognizers kept ready
+    partial_transcription_interval_ms: int = 100  # Minimum time between partial transcriptions sent to /ws/output
+
+    # Voice activity detection on incoming PCM audio
+    vad_enabled: bool = True
+    vad_threshold_db: float = -45.0  # Minimum frame level counted as speech
+    vad_margin_db: float = 10.0  # Level above the noise floor counted as speech
+    vad_preroll_ms: int = 200  # Silence kept before speech onset
+    vad_hangover_ms: int = 600  # Silence kept after speech so segments still end
+    vad_end_silence_ms: int = 0  # Trailing silence that ends the utterance (0 = wait for END)
+    vad_end_frame_timeout_ms: int = 2000  # How long audio is dropped waiting for END after an automatic end
+
+    # Output fan-out to /ws/output clients
+    output_queue_size: int = 256  # Messages queued per client before the oldest is dropped
+    output_delta_window_ms: int = 25  # Answer tokens batched into one frame per window (0 = one frame per token)
+    output_delta_max_bytes: int = 1024  # Batched answer text sent without waiting for the window
+
+    # Speculative retrieval from partial transcriptions
+    speculative_retrieval_enabled: bool = True
+    speculative_retrieval_partials: bool = False  # Also query on partial hypotheses
+    speculative_reuse_similarity: float = 0.85  # Word-level similarity to reuse results
+    speculative_partial_min_new_words: int = 3
+
+    # Semantic answer cache for repeated or rephrased questions
+    answer_cache_enabled: bool = True
+    answer_cache_similarity: float = 0.92  # Question cosine similarity that reuses an answer outright (near-verbatim repeats)
+    answer_cache_candidate_similarity: float = 0.5  # Similarity from which an LLM check confirms a rephrasing
+    answer_cache_max_candidates: int = 3  # Cached questions offered to the check per lookup
+    answer_cache_confirm_model: str = "gpt-4.1-nano"  # Model for the check; empty disables it
+    answer_cache_max_entries: int = 256
+    prepare_question_count: int = 20  # Questions generated by POST /prepare-answers/
+    prepare_answers_concurrency: int = 4  # Answers generated at once while preparing
+    prepare_phrasings_per_question: int = 4  # Other phrasings of each prepared question that reuse its answer
+
+    # Question latency metrics (/metrics endpoint and question_trace log lines)
+    metrics_enabled: bool = True
+    metrics_quantile_window: int = 1000  # Recent questions the p50/p95/p99 gauges cover
+
+    # Local index data (ingestion manifest, caches)
+    index_data_dir: str = ".index"
+    embedding_cache_enabled: bool = True
+    embedding_cache_max_entries: int = 20000  # ~120 MB of float32 vectors at 1536 dims
+
+    # Knowledge file uploads
+    upload_max_bytes: int = 250 * 1024 * 1024  # Larger uploads are rejected with 413
+    upload_block_bytes: int = 1024 * 1024  # Bytes per disk write while streaming an upload
+
+    # Background ingestion jobs
+    ingestion_workers: int = 2  # Files ingested at the same time
+    ingestion_extract_concurrency: int = 1  # Paged documents extracted at once (each uses the process pool)
+    ingestion_chunk_concurrency: int = 2  # Text files chunked at once
+    ingestion_upsert_concurrency: int = 2  # Upsert requests in flight at once
+    ingestion_job_history: int = 100  # Finished jobs kept for the status endpoint
+    upsert_batch_max_bytes: int = 1500000  # Estimated request size per upsert (Pinecone caps requests at 2 MB)
+    index_retry_attempts: int = 5  # Attempts for upserts and deletes that fail transiently
+    index_retry_base_delay: float = 0.5  # Backoff before the first retry, doubled per attempt
+
+    # Document text extraction
+    extraction_max_workers: int = 0  # Extraction worker processes (0 = one per CPU core)
+    extraction_pages_per_task: int = 8  # PDF pages extracted per worker task
+
+    # Approximate nearest-neighbor search for the local vector store
+    local_index_type: str = "auto"  # "auto" (IVF-PQ once large enough), "flat" or "ivfpq"
+    ann_train_threshold: int = 20000  # Vectors stored before the IVF-PQ index is trained
+    ann_nlist: int = 0  # Inverted lists (0 = ~4*sqrt(n))
+    ann_nprobe: int = 16  # Lists scanned per query
+    ann_pq_subquantizers: int = 48  # Code bytes per vector (must divide the dimensions)
+    ann_refine_factor: int = 10  # Candidates re-ranked exactly per result
+
     class Config:
         env_file = ".env"
 
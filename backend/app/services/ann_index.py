@@ -0,0 +1,281 @@
+import os
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PQ_CENTROIDS = 256  # One byte per sub-quantizer code
+
+
+def _nearest_centroids(data: np.ndarray, centroids: np.ndarray, batch_size: int = 4096) -> np.ndarray:
+    """
+    Return the index of the nearest centroid (L2) for every row of data.
+
+    Args:
+        data: Array of shape (n, d)
+        centroids: Array of shape (k, d)
+        batch_size: Rows processed per matrix product, bounding memory use
+
+    Returns:
+        Array of shape (n,) with centroid indices
+    """
+    half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    labels = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), batch_size):
+        block = np.asarray(data[start:start + batch_size], dtype=np.float32)
+        # argmin ||x - c||^2 == argmax (x.c - ||c||^2 / 2)
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T - half_norms, axis=1)
+    return labels
+
+
+def _kmeans(data: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Lloyd's k-means with re-seeding of empty clusters.
+
+    Args:
+        data: Training data of shape (n, d), n >= k
+        k: Number of clusters
+        iterations: Number of Lloyd iterations
+        rng: Random generator used for initialization
+
+    Returns:
+        Centroids of shape (k, d)
+    """
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _nearest_centroids(data, centroids)
+        counts = np.bincount(labels, minlength=k)
+        # Sum members per cluster with one sorted reduceat instead of a Python loop
+        order = np.argsort(labels, kind="stable")
+        sorted_labels = labels[order]
+        starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+        present = sorted_labels[starts]
+        centroids[present] = np.add.reduceat(data[order], starts, axis=0) / counts[present, None]
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), size=len(empty), replace=False)]
+    return centroids
+
+
+class IVFPQIndex:
+    """
+    Inverted-file index with product-quantized residuals (IVF-PQ).
+
+    Vectors are assigned to the nearest of `nlist` coarse centroids, and the
+    residual to that centroid is compressed to `pq_m` one-byte codes. A query
+    scans only the `nprobe` closest inverted lists, scores candidates with
+    inner-product lookup tables, and re-ranks the best `refine_factor * k`
+    candidates exactly against the full-precision vectors.
+
+    The index is keyed by the slot numbers of the owning vector store. Codes
+    and list assignments live in memory-mapped files next to the vectors, so
+    the index persists and is only trained once.
+    """
+
+    def __init__(self, directory: str, dimensions: int, capacity: int,
+                 nlist: int = 0, nprobe: int = 16, pq_m: int = 48,
+                 refine_factor: int = 10, train_iterations: int = 10, seed: int = 0):
+        """
+        Initialize the index, loading a trained model from disk if present.
+
+        Args:
+            directory: Directory for the model and code files
+            dimensions: Vector dimensions (must be divisible by pq_m)
+            capacity: Number of slots to allocate
+            nlist: Number of inverted lists; 0 picks ~4*sqrt(n) at training time
+            nprobe: Number of lists scanned per query (recall/latency knob)
+            pq_m: Number of sub-quantizers, i.e. code bytes per vector
+            refine_factor: Candidates re-ranked exactly per result (0 disables)
+            train_iterations: k-means iterations used for training
+            seed: Random seed for training
+        """
+        if dimensions % pq_m:
+            raise ValueError(f"Dimensions {dimensions} are not divisible by pq_m={pq_m}")
+        self.directory = directory
+        self.dimensions = dimensions
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq_m = pq_m
+        self.sub_dimensions = dimensions // pq_m
+        self.refine_factor = refine_factor
+        self.train_iterations = train_iterations
+        self.seed = seed
+
+        self.centroids: Optional[np.ndarray] = None
+        self.codebooks: Optional[np.ndarray] = None  # (pq_m, 256, sub_dimensions)
+        self.trained_size = 0  # Number of stored vectors when the model was trained
+
+        os.makedirs(directory, exist_ok=True)
+        self._model_path = os.path.join(directory, "ann_model.npz")
+        self._assign_path = os.path.join(directory, "ann_assign.i32")
+        self._codes_path = os.path.join(directory, "ann_codes.u8")
+        self._open(capacity)
+
+        # Slots grouped by list (CSR layout), rebuilt lazily after changes
+        self._order: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+
+        if os.path.exists(self._model_path):
+            model = np.load(self._model_path)
+            self.codebooks = model["codebooks"]
+            self.centroids = model["centroids"]
+            self.trained_size = int(model["trained_size"])
+            logger.info(f"Loaded IVF-PQ model with {len(self.centroids)} lists")
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def _open(self, capacity: int):
+        """Map the per-slot assignment and code files, growing them to `capacity` slots."""
+        for path, row_bytes in ((self._assign_path, 4), (self._codes_path, self.pq_m)):
+            with open(path, "ab") as f:
+                if f.tell() < capacity * row_bytes:
+                    f.truncate(capacity * row_bytes)
+        # Assignments are stored as list + 1 so a zero-filled slot means "not indexed"
+        self._assign = np.memmap(self._assign_path, dtype=np.int32, mode="r+", shape=(capacity,))
+        self._codes = np.memmap(self._codes_path, dtype=np.uint8, mode="r+", shape=(capacity, self.pq_m))
+        self.capacity = capacity
+
+    def resize(self, capacity: int):
+        """Grow the index to hold `capacity` slots."""
+        if capacity <= self.capacity:
+            return
+        self.flush()
+        del self._assign, self._codes
+        self._open(capacity)
+
+    def flush(self):
+        """Write dirty pages of the code files to disk."""
+        self._assign.flush()
+        self._codes.flush()
+
+    def train(self, sample: np.ndarray, total_vectors: int):
+        """
+        Train coarse centroids and PQ codebooks, discarding existing codes.
+
+        Args:
+            sample: Normalized training vectors of shape (n, dimensions)
+            total_vectors: Expected index size, used to pick nlist automatically
+        """
+        rng = np.random.default_rng(self.seed)
+        sample = np.asarray(sample, dtype=np.float32)
+        nlist = self.nlist or int(np.clip(4 * np.sqrt(total_vectors), 16, 65536))
+        nlist = min(nlist, len(sample) // 8)
+        if nlist < 1 or len(sample) < PQ_CENTROIDS:
+            raise ValueError(f"Not enough training vectors ({len(sample)}) for IVF-PQ")
+
+        logger.info(f"Training IVF-PQ index: {nlist} lists, {self.pq_m} sub-quantizers, "
+                    f"{len(sample)} training vectors")
+        centroids = _kmeans(sample, nlist, self.train_iterations, rng)
+        residuals = sample - centroids[_nearest_centroids(sample, centroids)]
+        codebooks = np.empty((self.pq_m, PQ_CENTROIDS, self.sub_dimensions), dtype=np.float32)
+        for j in range(self.pq_m):
+            sub = np.ascontiguousarray(residuals[:, j * self.sub_dimensions:(j + 1) * self.sub_dimensions])
+            codebooks[j] = _kmeans(sub, PQ_CENTROIDS, self.train_iterations, rng)
+
+        # Codes from a previous model are meaningless under the new one
+        self._assign[:] = 0
+        self._order = None
+        self.codebooks = codebooks
+        self.centroids = centroids
+        self.trained_size = total_vectors
+        np.savez(self._model_path, centroids=centroids, codebooks=codebooks,
+                 trained_size=np.int64(total_vectors))
+
+    def add(self, slots: np.ndarray, vectors: np.ndarray, batch_size: int = 4096):
+        """
+        Assign and encode vectors into the index.
+
+        Args:
+            slots: Slot numbers of the vectors
+            vectors: Normalized vectors of shape (len(slots), dimensions)
+            batch_size: Vectors encoded per step, bounding memory use
+        """
+        if not self.trained or len(slots) == 0:
+            return
+        slots = np.asarray(slots, dtype=np.int64)
+        self.resize(int(slots.max()) + 1)
+        for start in range(0, len(slots), batch_size):
+            block_slots = slots[start:start + batch_size]
+            block = np.asarray(vectors[start:start + batch_size], dtype=np.float32)
+            labels = _nearest_centroids(block, self.centroids)
+            residuals = block - self.centroids[labels]
+            codes = np.empty((len(block), self.pq_m), dtype=np.uint8)
+            for j in range(self.pq_m):
+                sub = residuals[:, j * self.sub_dimensions:(j + 1) * self.sub_dimensions]
+                codes[:, j] = _nearest_centroids(sub, self.codebooks[j])
+            self._codes[block_slots] = codes
+            self._assign[block_slots] = labels + 1
+        self._order = None
+
+    def remove(self, slots: np.ndarray):
+        """
+        Remove slots from the index.
+
+        Args:
+            slots: Slot numbers to remove
+        """
+        slots = np.asarray(slots, dtype=np.int64)
+        slots = slots[slots < self.capacity]
+        if len(slots):
+            self._assign[slots] = 0
+            self._order = None
+
+    def indexed(self, count: int) -> np.ndarray:
+        """Return a boolean mask of which of the first `count` slots are indexed."""
+        mask = np.zeros(count, dtype=bool)
+        limit = min(count, self.capacity)
+        mask[:limit] = np.asarray(self._assign[:limit]) > 0
+        return mask
+
+    def _rebuild_lists(self):
+        """Group indexed slots by inverted list."""
+        assign = np.asarray(self._assign)
+        indexed = np.flatnonzero(assign)
+        order = indexed[np.argsort(assign[indexed], kind="stable")]
+        sorted_assign = assign[order]
+        self._offsets = np.searchsorted(sorted_assign, np.arange(1, len(self.centroids) + 2))
+        self._order = order
+
+    def search(self, query: np.ndarray, k: int, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find approximately the k vectors with the highest inner product.
+
+        Args:
+            query: Normalized query vector
+            k: Number of results
+            vectors: Full-precision vectors indexed by slot, used for re-ranking
+
+        Returns:
+            Tuple of (slots, scores), best first
+        """
+        if self._order is None:
+            self._rebuild_lists()
+
+        query = np.asarray(query, dtype=np.float32)
+        coarse = self.centroids @ query
+        nprobe = min(self.nprobe, len(coarse))
+        probe = np.argpartition(-coarse, nprobe - 1)[:nprobe]
+        candidates = np.concatenate([self._order[self._offsets[l]:self._offsets[l + 1]] for l in probe])
+        if len(candidates) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # q.x ~= q.c + sum_j q_j . codebook_j[code_j]
+        tables = np.einsum("mkd,md->mk", self.codebooks, query.reshape(self.pq_m, self.sub_dimensions))
+        codes = self._codes[candidates]
+        approx = coarse[self._assign[candidates] - 1] + tables[np.arange(self.pq_m), codes].sum(axis=1)
+
+        shortlist = min(len(candidates), max(k, self.refine_factor * k))
+        top = np.argpartition(-approx, shortlist - 1)[:shortlist]
+        slots = candidates[top]
+        if self.refine_factor > 0:
+            slots = np.sort(slots)  # Sequential access into the memory map
+            scores = np.asarray(vectors[slots]) @ query
+        else:
+            scores = approx[top]
+
+        best = np.argsort(-scores)[:k]
+        return slots[best], scores[best]
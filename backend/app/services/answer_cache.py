@@ -0,0 +1,329 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import tempfile
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Decides which of the candidate cached questions (if any) asks the same thing
+# as the question asked: (question, candidates) -> index into candidates or None
+ConfirmMatch = Callable[[str, List[str]], Awaitable[Optional[int]]]
+
+
+def question_key(question: str) -> str:
+    """Normalize a question so trivially different phrasings share an exact-match key."""
+    return normalize_text(question).lower().rstrip("?!. ")
+
+
+def answer_scope(presentation_context: str, knowledge_version: str) -> str:
+    """
+    Return the cache scope for a presentation context and knowledge base version.
+
+    Answers depend on both the system prompt and the retrieved context, so a
+    change to either starts a fresh scope.
+    """
+    material = f"{knowledge_version}\0{presentation_context}"
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class CachedAnswer:
+    """A generated answer and the embedding of the question it answers."""
+
+    def __init__(self, scope: str, question: str, embedding: np.ndarray, answer: str,
+                 pinned: bool = False, created: Optional[float] = None):
+        self.scope = scope
+        self.question = question
+        self.key = question_key(question)
+        self.embedding = embedding
+        self.answer = answer
+        # Pinned answers were prepared ahead of time; they are never evicted
+        self.pinned = pinned
+        self.created = time.time() if created is None else created
+        self.hits = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "scope": self.scope,
+            "question": self.question,
+            "embedding": self.embedding.tolist(),
+            "answer": self.answer,
+            "created": self.created
+        }
+
+
+class _ScopeEntries:
+    """The cached answers of one scope, with their embeddings stacked for search."""
+
+    def __init__(self):
+        self.entries: Dict[int, CachedAnswer] = {}
+        self.by_key: Dict[str, int] = {}
+        self._ids: List[int] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def add(self, entry_id: int, entry: CachedAnswer):
+        self.entries[entry_id] = entry
+        self.by_key[entry.key] = entry_id
+        self._matrix = None
+
+    def remove(self, entry_id: int):
+        entry = self.entries.pop(entry_id)
+        if self.by_key.get(entry.key) == entry_id:
+            del self.by_key[entry.key]
+        self._matrix = None
+
+    def nearest(self, embedding: np.ndarray, k: int = 1) -> List[Tuple[int, float]]:
+        """Return (entry_id, cosine similarity) of the k closest questions, closest first."""
+        if not self.entries:
+            return []
+        if self._matrix is None:
+            # Rebuilt lazily, so a burst of inserts costs one stack
+            self._ids = list(self.entries)
+            self._matrix = np.stack([self.entries[i].embedding for i in self._ids])
+        scores = self._matrix @ embedding
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(self._ids[i], float(scores[i])) for i in best]
+
+
+class SemanticAnswerCache:
+    """
+    In-memory cache of generated answers, matched on question similarity.
+
+    Every answer is stored with the unit-normalized embedding of its question
+    under a scope (see answer_scope). A later question in the same scope
+    reuses an answer in one of three ways:
+
+    - its normalized text matches a cached question exactly
+    - its embedding has at least `similarity` cosine similarity with a cached
+      question, which with text-embedding-3-small only near-verbatim repeats
+      reach
+    - up to `max_candidates` cached questions with at least
+      `candidate_similarity` are handed to a `confirm` callback (a cheap LLM
+      check), which picks the one asking the same thing, if any. Paraphrases
+      such as "what's the pricing?" / "how much does it cost?" score in this
+      range, but so do different questions on the same topic, so the
+      embedding alone can't tell them apart
+
+    Entries are evicted least recently used first.
+
+    Answers prepared before a talk are pinned: they don't count towards
+    max_entries, are never evicted and are saved to `path` so they survive
+    a restart. Since scopes are content hashes, they match again as soon as
+    the same presentation context is set.
+    """
+
+    def __init__(self, similarity: float = 0.92, max_entries: int = 256,
+                 path: Optional[str] = None, candidate_similarity: float = 0.5,
+                 max_candidates: int = 3):
+        """
+        Initialize the cache, loading pinned answers from path if it exists.
+
+        Args:
+            similarity: Minimum cosine similarity between questions for a hit
+            max_entries: Maximum number of unpinned answers kept across all scopes
+            path: JSON file pinned answers are saved to
+            candidate_similarity: Minimum cosine similarity for a question to be
+                confirmed as a rephrasing
+            max_candidates: Most cached questions confirmed per lookup
+        """
+        self.similarity = similarity
+        self.candidate_similarity = candidate_similarity
+        self.max_candidates = max_candidates
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+        self._lru: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._scopes: Dict[str, _ScopeEntries] = {}
+        self._next_id = 0
+        self._unpinned = 0
+        self._load()
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _hit(self, entry_id: int, similarity: float) -> CachedAnswer:
+        entry = self._lru[entry_id]
+        self._lru.move_to_end(entry_id)
+        entry.hits += 1
+        self.hits += 1
+        logger.info(f"Answer cache hit ({similarity:.3f}) for: {entry.question[:50]}...")
+        return entry
+
+    def get_exact(self, scope: str, question: str) -> Optional[CachedAnswer]:
+        """
+        Look up an answer by normalized question text, without an embedding.
+
+        Args:
+            scope: The answer scope
+            question: The question asked
+
+        Returns:
+            The cached answer, or None (misses are not counted here)
+        """
+        entries = self._scopes.get(scope)
+        entry_id = entries.by_key.get(question_key(question)) if entries else None
+        if entry_id is None:
+            return None
+        return self._hit(entry_id, 1.0)
+
+    async def get(self, scope: str, question: str, embedding,
+                  confirm: Optional[ConfirmMatch] = None) -> Optional[CachedAnswer]:
+        """
+        Look up the answer to a cached question that asks the same as this one.
+
+        Args:
+            scope: The answer scope
+            question: The question asked
+            embedding: Embedding of the question
+            confirm: Picks the candidate that is a rephrasing of the question;
+                without it only `similarity` matches hit
+
+        Returns:
+            The cached answer, or None if no cached question matches
+        """
+        entries = self._scopes.get(scope)
+        if entries:
+            entry_id = entries.by_key.get(question_key(question))
+            if entry_id is not None:
+                return self._hit(entry_id, 1.0)
+            matches = entries.nearest(self._unit(embedding), k=max(self.max_candidates, 1))
+            if matches and matches[0][1] >= self.similarity:
+                return self._hit(*matches[0])
+
+            # Several phrasings of a prepared question share an answer; confirm each answer once
+            candidates, answers = [], set()
+            for entry_id, score in matches:
+                entry = entries.entries[entry_id]
+                if score >= self.candidate_similarity and entry.answer not in answers:
+                    answers.add(entry.answer)
+                    candidates.append((entry_id, score, entry.question))
+            if confirm and candidates:
+                choice = await confirm(question, [candidate[2] for candidate in candidates])
+                if choice is not None and 0 <= choice < len(candidates):
+                    entry_id, score, _ = candidates[choice]
+                    # The entry may have been evicted while the match was confirmed
+                    if entry_id in self._lru:
+                        return self._hit(entry_id, score)
+        self.misses += 1
+        return None
+
+    def put(self, scope: str, question: str, embedding, answer: str, pinned: bool = False) -> None:
+        """
+        Store an answer, evicting the least recently used unpinned entry if full.
+
+        Args:
+            scope: The answer scope
+            question: The question that was answered
+            embedding: Embedding of the question
+            answer: The full generated answer
+            pinned: Whether the answer was prepared ahead of time
+        """
+        self._add(CachedAnswer(scope, question, self._unit(embedding), answer, pinned=pinned))
+
+    def _add(self, entry: CachedAnswer):
+        if not entry.answer or (not entry.pinned and self.max_entries <= 0):
+            return
+        existing = self._scopes.get(entry.scope)
+        previous = existing.by_key.get(entry.key) if existing else None
+        if previous is not None:
+            if self._lru[previous].pinned and not entry.pinned:
+                return  # Keep the prepared answer
+            self._remove(previous)
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self._scopes.setdefault(entry.scope, _ScopeEntries()).add(entry_id, entry)
+        self._lru[entry_id] = entry
+        if not entry.pinned:
+            self._unpinned += 1
+
+        if self._unpinned > self.max_entries:
+            self._remove(next(i for i, e in self._lru.items() if not e.pinned))
+
+    def _remove(self, entry_id: int):
+        entry = self._lru.pop(entry_id)
+        if not entry.pinned:
+            self._unpinned -= 1
+        entries = self._scopes[entry.scope]
+        entries.remove(entry_id)
+        if not entries.entries:
+            del self._scopes[entry.scope]
+
+    def pinned_entries(self) -> List[CachedAnswer]:
+        """Return the prepared answers, oldest first."""
+        return [entry for entry in self._lru.values() if entry.pinned]
+
+    def unpin_all(self):
+        """Drop every prepared answer, e.g. before preparing a new set."""
+        for entry_id in [i for i, e in self._lru.items() if e.pinned]:
+            self._remove(entry_id)
+
+    def _load(self):
+        """Load pinned answers from disk, starting without them if the file is unreadable."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for item in data.get("answers", []):
+                self._add(CachedAnswer(
+                    item["scope"], item["question"],
+                    np.asarray(item["embedding"], dtype=np.float32), item["answer"],
+                    pinned=True, created=item.get("created")
+                ))
+            logger.info(f"Loaded {len(self._lru)} prepared answers")
+        except Exception as e:
+            logger.error(f"Error loading prepared answers {self.path}: {e}", exc_info=True)
+
+    def _write(self, payload: str):
+        """Atomically replace the pinned answers file with the given JSON payload."""
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    async def save(self):
+        """Persist the pinned answers without blocking the event loop."""
+        if not self.path:
+            return
+        # Serialize on the loop thread so the snapshot is consistent
+        payload = json.dumps({"answers": [entry.to_dict() for entry in self.pinned_entries()]})
+        await asyncio.to_thread(self._write, payload)
+
+    def clear(self):
+        """Drop every cached answer, including prepared ones."""
+        self._lru.clear()
+        self._scopes.clear()
+        self._unpinned = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and occupancy."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._lru),
+            "pinned": len(self._lru) - self._unpinned,
+            "max_entries": self.max_entries
+        }
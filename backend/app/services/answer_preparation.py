@@ -0,0 +1,228 @@
+import json
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.services.answer_cache import question_key
+
+logger = logging.getLogger(__name__)
+
+# Preparation states
+IDLE = "idle"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+QUESTION_PROMPT = """
+You help a speaker prepare for the Q&A after a talk. Based on the presentation
+description and the excerpts from the speaker's knowledge base below, list the
+{count} questions the audience is most likely to ask. Cover different topics,
+phrase them the way someone would ask them out loud, and keep each one short.
+
+Respond with a JSON object of the form {{"questions": ["...", "..."]}}.
+"""
+
+PHRASING_PROMPT = """
+Below are numbered questions the audience of a talk may ask. For each of
+them, write {count} other ways someone might ask the same thing out loud:
+different wording, more or less casual, shorter or longer. Every phrasing must
+ask for exactly the same information as the original.
+
+Respond with a JSON object mapping each question number to its phrasings, of
+the form {{"1": ["...", "..."], "2": ["...", "..."]}}.
+"""
+
+
+class AnswerPreparer:
+    """
+    Answers likely audience questions before the talk starts.
+
+    A run generates questions from the presentation context and a sample of
+    the knowledge base, then retrieves context and generates an answer for
+    each of them, several at a time. Answers are pinned in the assistant's
+    answer cache as they finish, so a live question that matches one is
+    answered without retrieval or generation. Each answer is also pinned
+    under a few generated phrasings of its question, so a live question
+    worded differently still lands close to one of them. A new run replaces
+    the answers prepared by the previous one.
+    """
+
+    def __init__(self, assistant, concurrency: int = 4, phrasings: int = 4):
+        """
+        Initialize the preparer.
+
+        Args:
+            assistant: The PineconeAssistant whose answer cache is filled
+            concurrency: Answers generated at the same time
+            phrasings: Other phrasings generated per question (0 = none)
+        """
+        self.assistant = assistant
+        self.concurrency = max(concurrency, 1)
+        self.phrasings = max(phrasings, 0)
+        self.status = IDLE
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.error: Optional[str] = None
+        self.questions: List[Dict[str, Any]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable snapshot of the current or last run."""
+        return {
+            "status": self.status,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error,
+            "questions_total": len(self.questions),
+            "questions_answered": sum(1 for q in self.questions if q["status"] == COMPLETED),
+            "questions_failed": sum(1 for q in self.questions if q["status"] == FAILED),
+            "questions": self.questions
+        }
+
+    def start(self, count: int, questions: Optional[List[str]] = None):
+        """
+        Start preparing answers in the background.
+
+        Args:
+            count: Number of questions to generate
+            questions: Questions to prepare in addition to the generated ones
+
+        Raises:
+            RuntimeError: If a run is already in progress
+        """
+        if self.running:
+            raise RuntimeError("Answer preparation is already running")
+        self.status = RUNNING
+        self.started = time.time()
+        self.finished = None
+        self.error = None
+        self.questions = []
+        self._task = asyncio.create_task(self._run(count, questions or []))
+
+    async def close(self):
+        """Cancel a run in progress."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _generate_questions(self, count: int) -> List[str]:
+        """Ask the model for the questions the audience is most likely to ask."""
+        assistant = self.assistant
+        context = assistant.presentation_context
+        # Ground the questions in what the knowledge base actually covers
+        excerpts = await assistant.vector_store.query(
+            context or "overview of the main topics", top_k=8)
+        excerpt_text = "\n\n".join(f"[{r['source']}]\n{r['text'][:1500]}" for r in excerpts)
+
+        response = await assistant.async_client.chat.completions.create(
+            model=assistant.model,
+            messages=[
+                {"role": "system", "content": QUESTION_PROMPT.format(count=count)},
+                {"role": "user", "content": f"Presentation:\n{context or '(not provided)'}\n\n"
+                                            f"Knowledge base excerpts:\n{excerpt_text}"}
+            ],
+            response_format={"type": "json_object"}
+        )
+        questions = json.loads(response.choices[0].message.content).get("questions", [])
+        return [q.strip() for q in questions if isinstance(q, str) and q.strip()][:count]
+
+    async def _generate_phrasings(self, questions: List[str]) -> List[List[str]]:
+        """Ask the model for other phrasings of each question, in one request."""
+        assistant = self.assistant
+        numbered = "\n".join(f"{i}. {question}" for i, question in enumerate(questions, 1))
+        response = await assistant.async_client.chat.completions.create(
+            model=assistant.model,
+            messages=[
+                {"role": "system", "content": PHRASING_PROMPT.format(count=self.phrasings)},
+                {"role": "user", "content": numbered}
+            ],
+            response_format={"type": "json_object"}
+        )
+        by_number = json.loads(response.choices[0].message.content)
+        phrasings = []
+        for i, question in enumerate(questions, 1):
+            items = by_number.get(str(i), [])
+            seen = {question_key(question)}
+            unique = []
+            for phrasing in items if isinstance(items, list) else []:
+                key = question_key(phrasing) if isinstance(phrasing, str) else ""
+                if key and key not in seen:
+                    seen.add(key)
+                    unique.append(phrasing.strip())
+            phrasings.append(unique[:self.phrasings])
+        return phrasings
+
+    async def _add_phrasings(self) -> List[List[List[float]]]:
+        """
+        Generate and embed other phrasings of the questions being prepared.
+
+        Returns:
+            Embeddings of each question's phrasings, in the order of self.questions
+        """
+        questions = [item["question"] for item in self.questions]
+        try:
+            phrasings = await self._generate_phrasings(questions)
+            embeddings = iter(await self.assistant.vector_store.embed_queries(
+                [phrasing for group in phrasings for phrasing in group]))
+        except Exception as e:
+            # The answers are still worth preparing for the original wording
+            logger.warning(f"Error generating question phrasings: {e}")
+            return [[] for _ in questions]
+        for item, group in zip(self.questions, phrasings):
+            item["phrasings"] = group
+        return [[next(embeddings) for _ in group] for group in phrasings]
+
+    async def _run(self, count: int, extra_questions: List[str]):
+        assistant = self.assistant
+        cache = assistant.answer_cache
+        try:
+            if not assistant.vector_store:
+                await assistant.initialize_async()
+            scope = assistant.answer_scope()
+
+            generated = await self._generate_questions(count) if count > 0 else []
+            seen = set()
+            for question in extra_questions + generated:
+                key = question_key(question)
+                if key and key not in seen:
+                    seen.add(key)
+                    self.questions.append({"question": question, "status": RUNNING})
+            logger.info(f"Preparing answers for {len(self.questions)} questions")
+            phrasing_embeddings = [[] for _ in self.questions]
+            if self.phrasings and self.questions:
+                phrasing_embeddings = await self._add_phrasings()
+
+            cache.unpin_all()
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def prepare(item: Dict[str, Any], embeddings: List[List[float]]):
+                async with semaphore:
+                    try:
+                        result = await assistant.generate_answer(item["question"])
+                    except Exception as e:
+                        logger.error(f"Error preparing answer for '{item['question']}': {e}")
+                        item.update(status=FAILED, error=str(e))
+                        return
+                cache.put(scope, result["question"], result["embedding"], result["answer"], pinned=True)
+                for phrasing, embedding in zip(item.get("phrasings", []), embeddings):
+                    cache.put(scope, phrasing, embedding, result["answer"], pinned=True)
+                item.update(status=COMPLETED)
+
+            await asyncio.gather(*(prepare(item, embeddings)
+                                   for item, embeddings in zip(self.questions, phrasing_embeddings)))
+            await cache.save()
+            self.status = COMPLETED
+            logger.info(f"Prepared {self.to_dict()['questions_answered']}/{len(self.questions)} answers "
+                        f"in {time.time() - self.started:.1f}s")
+        except Exception as e:
+            logger.error(f"Answer preparation failed: {e}", exc_info=True)
+            self.status = FAILED
+            self.error = str(e)
+        finally:
+            self.finished = time.time()
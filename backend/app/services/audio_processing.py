@@ -0,0 +1,300 @@
+import time
+import logging
+from typing import Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+logger = logging.getLogger("app_logger")
+
+# Sample rate the speech service is fed with; it doesn't benefit from more
+TARGET_SAMPLE_RATE = 16000
+
+# Codecs a client can negotiate on /ws/unified
+CODEC_PCM = "pcm"  # Raw 16-bit little-endian PCM at any sample rate
+CODEC_OGG_OPUS = "ogg_opus"  # Opus in an Ogg container, decoded by the speech SDK
+SUPPORTED_CODECS = (CODEC_PCM, CODEC_OGG_OPUS)
+
+
+class AudioFormat(BaseModel):
+    """Audio format announced by a client before it streams audio."""
+    codec: str = CODEC_PCM
+    sample_rate: int = 44100
+    channels: int = 1
+
+    def stream_format(self) -> str:
+        """Return the speech push stream format this audio is delivered in."""
+        return CODEC_OGG_OPUS if self.codec == CODEC_OGG_OPUS else CODEC_PCM
+
+
+# Format the Raspberry Pi client streams in when it doesn't negotiate one
+LEGACY_AUDIO_FORMAT = AudioFormat(codec=CODEC_PCM, sample_rate=44100, channels=1)
+
+
+def _lowpass_taps(cutoff: float, num_taps: int) -> np.ndarray:
+    """
+    Design a Hamming-windowed sinc low-pass filter.
+
+    Args:
+        cutoff: Cutoff frequency as a fraction of the sample rate (0 to 0.5)
+        num_taps: Filter length (odd)
+
+    Returns:
+        Filter taps normalized to unity gain
+    """
+    n = np.arange(num_taps) - (num_taps - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(num_taps)
+    return (taps / taps.sum()).astype(np.float32)
+
+
+class PCMResampler:
+    """
+    Streaming converter from 16-bit PCM at any rate/channel count to 16 kHz mono.
+
+    Audio arrives in arbitrarily sized websocket frames, so the resampler
+    keeps the filter history, the fractional read position and any partial
+    sample frame between calls. All per-sample work is vectorized.
+    """
+
+    def __init__(self, input_rate: int, output_rate: int = TARGET_SAMPLE_RATE,
+                 channels: int = 1, num_taps: int = 63):
+        """
+        Initialize the resampler.
+
+        Args:
+            input_rate: Sample rate of the incoming audio
+            output_rate: Sample rate to produce
+            channels: Number of interleaved channels in the incoming audio
+            num_taps: Length of the anti-aliasing filter used when downsampling
+        """
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.channels = channels
+        self._frame_bytes = 2 * channels
+        self._remainder = b""
+        self._step = input_rate / output_rate
+
+        self._taps: Optional[np.ndarray] = None
+        if input_rate > output_rate:
+            # Keep content below ~90% of the output Nyquist frequency
+            self._taps = _lowpass_taps(0.45 * output_rate / input_rate, num_taps)
+            self._history = np.zeros(num_taps - 1, dtype=np.float32)
+
+        # Read position in the buffer [last sample of previous call, new samples...]
+        self._position = 1.0
+        self._last_sample = np.float32(0)
+
+    def process(self, data: bytes) -> bytes:
+        """
+        Convert a chunk of input audio.
+
+        Args:
+            data: Raw 16-bit little-endian PCM bytes
+
+        Returns:
+            16-bit little-endian mono PCM bytes at the output rate
+        """
+        data = self._remainder + data
+        usable = len(data) - len(data) % self._frame_bytes
+        self._remainder = data[usable:]
+        if usable == 0:
+            return b""
+
+        samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32)
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+
+        if self.input_rate == self.output_rate:
+            return self._to_bytes(samples)
+
+        if self._taps is not None:
+            padded = np.concatenate((self._history, samples))
+            samples = np.convolve(padded, self._taps, mode="valid").astype(np.float32)
+            self._history = padded[len(padded) - len(self._history):]
+
+        # Linear interpolation at the output sample positions
+        buffer = np.concatenate(([self._last_sample], samples))
+        end = len(buffer) - 1
+        positions = np.arange(self._position, end, self._step)
+        if len(positions) == 0:
+            self._position -= len(samples)
+            self._last_sample = buffer[-1]
+            return b""
+        indices = positions.astype(np.int64)
+        fractions = (positions - indices).astype(np.float32)
+        output = buffer[indices] * (1 - fractions) + buffer[indices + 1] * fractions
+
+        self._position = positions[-1] + self._step - end
+        self._last_sample = buffer[-1]
+        return self._to_bytes(output)
+
+    @staticmethod
+    def _to_bytes(samples: np.ndarray) -> bytes:
+        return np.clip(np.rint(samples), -32768, 32767).astype("<i2").tobytes()
+
+
+class VoiceActivityDetector:
+    """
+    Energy-based voice activity detection over 16 kHz mono PCM.
+
+    Frames are classified against an adaptive threshold (a margin above the
+    running noise floor, but never below an absolute level). Speech frames,
+    a short pre-roll before speech and a hangover of trailing silence are
+    kept so the speech service still sees segment boundaries; longer
+    silences are dropped. Once speech has been heard, a configurable amount
+    of trailing silence flags the end of the utterance.
+    """
+
+    def __init__(self, sample_rate: int = TARGET_SAMPLE_RATE, frame_ms: int = 20,
+                 threshold_db: float = -45.0, margin_db: float = 10.0,
+                 preroll_ms: int = 200, hangover_ms: int = 600,
+                 end_silence_ms: int = 0):
+        """
+        Initialize the detector.
+
+        Args:
+            sample_rate: Sample rate of the PCM fed to process()
+            frame_ms: Analysis frame length
+            threshold_db: Minimum frame level (dBFS) counted as speech
+            margin_db: Level above the noise floor counted as speech
+            preroll_ms: Silence kept before speech onset
+            hangover_ms: Silence kept after speech before frames are dropped
+            end_silence_ms: Trailing silence that ends the utterance (0 disables)
+        """
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.frame_bytes = self.frame_samples * 2
+        self.threshold_db = threshold_db
+        self.margin_db = margin_db
+        self.preroll_frames = preroll_ms // frame_ms
+        self.hangover_frames = hangover_ms // frame_ms
+        self.end_silence_frames = end_silence_ms // frame_ms if end_silence_ms > 0 else 0
+
+        self.noise_floor_db = threshold_db - margin_db
+        self.speech_started = False
+        self.end_of_utterance = False
+        self.frames_total = 0
+        self.frames_dropped = 0
+
+        self._remainder = b""
+        self._silent_run = 0  # Consecutive silent frames since the last speech frame
+        self._preroll = b""  # Most recent dropped frames, replayed at speech onset
+
+    def process(self, data: bytes) -> bytes:
+        """
+        Classify a chunk of audio and return the frames worth forwarding.
+
+        Args:
+            data: 16-bit little-endian mono PCM bytes
+
+        Returns:
+            The kept frames, concatenated in order
+        """
+        data = self._remainder + data
+        usable = len(data) - len(data) % self.frame_bytes
+        self._remainder = data[usable:]
+        if usable == 0:
+            return b""
+
+        frames = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32).reshape(-1, self.frame_samples)
+        rms = np.sqrt(np.mean(frames * frames, axis=1)) / 32768.0
+        levels_db = 20 * np.log10(np.maximum(rms, 1e-10))
+        threshold = max(self.threshold_db, self.noise_floor_db + self.margin_db)
+        is_speech = levels_db >= threshold
+
+        # Track the noise floor from this chunk's silent frames
+        if not is_speech.all():
+            chunk_floor = float(np.median(levels_db[~is_speech]))
+            self.noise_floor_db = 0.9 * self.noise_floor_db + 0.1 * chunk_floor
+
+        kept = []
+        for i in range(len(frames)):
+            frame = data[i * self.frame_bytes:(i + 1) * self.frame_bytes]
+            self.frames_total += 1
+            if is_speech[i]:
+                if self._preroll:
+                    # The pre-roll was counted as dropped, but it is forwarded after all
+                    kept.append(self._preroll)
+                    self.frames_dropped -= len(self._preroll) // self.frame_bytes
+                    self._preroll = b""
+                kept.append(frame)
+                self.speech_started = True
+                self._silent_run = 0
+                continue
+
+            self._silent_run += 1
+            if self.speech_started and self._silent_run <= self.hangover_frames:
+                kept.append(frame)
+            else:
+                self.frames_dropped += 1
+                self._preroll = (self._preroll + frame)[-self.preroll_frames * self.frame_bytes:] \
+                    if self.preroll_frames else b""
+            if (self.end_silence_frames and self.speech_started
+                    and self._silent_run >= self.end_silence_frames):
+                self.end_of_utterance = True
+
+        return b"".join(kept)
+
+    def stats(self) -> dict:
+        """Return frame counters for this utterance."""
+        return {
+            "frames_total": self.frames_total,
+            "frames_dropped": self.frames_dropped,
+            "end_of_utterance": self.end_of_utterance
+        }
+
+
+class EndFrameWait:
+    """
+    Audio received after voice activity detection ended an utterance early.
+
+    Clients still send END once they stop streaming, and the audio in between
+    must not start a new utterance that END would then end. Frames are
+    dropped until END arrives, speech starts again or `timeout` seconds pass,
+    so a client that relies on the automatic end and never sends END (or
+    loses it) is heard again.
+    """
+
+    def __init__(self, audio_format: AudioFormat, timeout: float,
+                 threshold_db: float = -45.0, margin_db: float = 10.0, preroll_ms: int = 200):
+        """
+        Initialize the wait.
+
+        Args:
+            audio_format: Format the client sends audio in
+            timeout: Seconds after which audio starts a new utterance anyway
+            threshold_db: Minimum frame level (dBFS) counted as speech
+            margin_db: Level above the noise floor counted as speech
+            preroll_ms: Audio before the speech onset kept for the next utterance
+        """
+        self.deadline = time.monotonic() + timeout
+        self.chunks_dropped = 0
+        self.reason: Optional[str] = None
+        # Compressed audio can't be inspected, so only the timeout applies to it
+        self.vad = None
+        if audio_format.codec == CODEC_PCM:
+            # Interleaved channels are analysed as one stream of samples
+            self.vad = VoiceActivityDetector(
+                sample_rate=audio_format.sample_rate * audio_format.channels,
+                threshold_db=threshold_db, margin_db=margin_db, preroll_ms=preroll_ms)
+
+    def process(self, data: bytes) -> Optional[bytes]:
+        """
+        Check a chunk of client audio.
+
+        Args:
+            data: Audio bytes in the client's format
+
+        Returns:
+            None while the chunk is dropped; otherwise the audio the next
+            utterance starts with (the chunk, or the speech and its pre-roll)
+        """
+        if time.monotonic() >= self.deadline:
+            self.reason = "timeout"
+            return data
+        if self.vad:
+            kept = self.vad.process(data)
+            if self.vad.speech_started:
+                self.reason = "speech onset"
+                return kept
+        self.chunks_dropped += 1
+        return None
@@ -0,0 +1,287 @@
+import re
+import bisect
+import logging
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+TOKENIZER_MODEL = "gpt-4"
+
+# Break priorities for chunk boundaries, higher is better
+BREAK_INVALID = -1  # Inside a multi-byte character
+BREAK_TOKEN = 0
+BREAK_WORD = 1
+BREAK_LINE = 2
+BREAK_SENTENCE = 3
+BREAK_PARAGRAPH = 4
+
+# Patterns run over the UTF-8 bytes; a match end is where the next chunk would start
+_SENTENCE_END = re.compile(rb"[.!?](?:[\"')\]]|\xe2\x80\x9d|\xe2\x80\x99)*\s+")
+_PARAGRAPH_END = re.compile(rb"\n[ \t\r]*\n\s*")
+_WHITESPACE_BYTES = np.frombuffer(b" \t\r\n\f\v", dtype=np.uint8)
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = TOKENIZER_MODEL) -> tiktoken.Encoding:
+    """Return the (cached) tiktoken encoding for a model."""
+    return tiktoken.encoding_for_model(model)
+
+
+@lru_cache(maxsize=None)
+def _token_byte_lengths(model: str) -> np.ndarray:
+    """Return the byte length of every token id in a model's vocabulary."""
+    encoding = get_encoding(model)
+    lengths = np.zeros(encoding.n_vocab, dtype=np.int64)
+    for token in range(encoding.n_vocab):
+        try:
+            lengths[token] = len(encoding.decode_single_token_bytes(token))
+        except KeyError:
+            pass  # Unused ids between the regular and special tokens
+    return lengths
+
+
+def count_tokens(text: str, model: str = TOKENIZER_MODEL) -> int:
+    """
+    Count the number of tokens in a text string.
+
+    Args:
+        text: The text to count tokens for
+        model: Model whose tokenizer is used
+
+    Returns:
+        Number of tokens
+    """
+    return len(get_encoding(model).encode_ordinary(text))
+
+
+class TokenChunker:
+    """
+    Splits text into overlapping chunks of a bounded number of tokens.
+
+    The text is encoded once. Every token start is scored as a potential
+    boundary (paragraph > sentence > line > word > any token), and each chunk
+    ends at the best boundary in the second half of its token budget. The
+    next chunk starts at the best boundary within `chunk_overlap` tokens
+    before that end, so neighbouring chunks share context. Chunk text is
+    sliced from the original bytes, never re-assembled, and the output only
+    depends on the input text.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200,
+                 model: str = TOKENIZER_MODEL):
+        """
+        Initialize the chunker.
+
+        Args:
+            chunk_size: Maximum tokens per chunk
+            chunk_overlap: Tokens shared by consecutive chunks
+            model: Model whose tokenizer defines the token counts
+        """
+        if chunk_size < 2:
+            raise ValueError("chunk_size must be at least 2")
+        if not 0 <= chunk_overlap < chunk_size // 2:
+            raise ValueError("chunk_overlap must be less than half of chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.model = model
+
+    def _break_priorities(self, data: bytes, byte_starts: np.ndarray) -> np.ndarray:
+        """
+        Score every token start (plus the end of the text) as a chunk boundary.
+
+        Args:
+            data: The UTF-8 encoded text
+            byte_starts: Byte offset of every token, followed by len(data)
+
+        Returns:
+            Array of break priorities, one per entry of byte_starts
+        """
+        raw = np.frombuffer(data, dtype=np.uint8)
+        token_starts = byte_starts[:-1]
+        first_bytes = raw[token_starts]
+
+        priorities = np.full(len(byte_starts), BREAK_TOKEN, dtype=np.int8)
+        # Tokens like " word" start on whitespace, marking word and line boundaries
+        priorities[:-1][np.isin(first_bytes, _WHITESPACE_BYTES)] = BREAK_WORD
+        priorities[:-1][first_bytes == ord("\n")] = BREAK_LINE
+
+        for priority, pattern in ((BREAK_SENTENCE, _SENTENCE_END), (BREAK_PARAGRAPH, _PARAGRAPH_END)):
+            ends = np.fromiter((match.end() for match in pattern.finditer(data)), dtype=np.int64)
+            # Break before the token containing the match end
+            tokens = np.searchsorted(byte_starts, ends, side="right") - 1
+            priorities[tokens] = np.maximum(priorities[tokens], priority)
+
+        # Never split a multi-byte character across chunks
+        priorities[:-1][(first_bytes & 0xC0) == 0x80] = BREAK_INVALID
+        priorities[-1] = BREAK_PARAGRAPH
+        return priorities
+
+    def _spans(self, data: bytes) -> Tuple[List[Tuple[int, int, int, int]], int]:
+        """
+        Compute chunk boundaries over UTF-8 encoded text.
+
+        Args:
+            data: The UTF-8 encoded text
+
+        Returns:
+            Tuple of ([(start_token, end_token, start_byte, end_byte), ...], total tokens)
+        """
+        tokens = np.asarray(get_encoding(self.model).encode_ordinary(data.decode("utf-8")), dtype=np.int64)
+        total = len(tokens)
+        if total == 0:
+            return [], 0
+
+        byte_starts = np.zeros(total + 1, dtype=np.int64)
+        np.cumsum(_token_byte_lengths(self.model)[tokens], out=byte_starts[1:])
+        priorities = self._break_priorities(data, byte_starts)
+
+        spans = []
+        start = 0
+        while True:
+            if total - start <= self.chunk_size:
+                end = total
+            else:
+                # Best boundary in the second half of the budget; the latest one on ties
+                low = start + self.chunk_size // 2
+                window = priorities[low:start + self.chunk_size + 1][::-1]
+                end = start + self.chunk_size - int(np.argmax(window))
+            spans.append((start, end, int(byte_starts[start]), int(byte_starts[end])))
+            if end >= total:
+                break
+
+            if self.chunk_overlap:
+                # Best boundary within the overlap; the earliest one on ties
+                low = end - self.chunk_overlap
+                start = low + int(np.argmax(priorities[low:end]))
+            else:
+                start = end
+        return spans, total
+
+    @staticmethod
+    def _encode(text: str) -> bytes:
+        # Lone surrogates (seen in some PDF extractions) can't be encoded as UTF-8
+        return text.encode("utf-8", errors="replace")
+
+    @staticmethod
+    def _make_chunk(data: bytes, span: Tuple[int, int, int, int], offset: int = 0) -> Optional[Dict[str, Any]]:
+        start_token, end_token, start_byte, end_byte = span
+        text = data[start_byte:end_byte].decode("utf-8", errors="ignore").strip()
+        if not text:
+            return None
+        return {
+            "text": text,
+            "token_count": end_token - start_token,
+            "start": offset + start_byte,
+            "end": offset + end_byte
+        }
+
+    def chunk(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Split text into chunks.
+
+        Args:
+            text: The text to chunk
+
+        Returns:
+            List of dictionaries with the chunk text, its token count and its
+            start/end byte offsets in the UTF-8 encoded text
+        """
+        data = self._encode(text)
+        spans, _ = self._spans(data)
+        chunks = [self._make_chunk(data, span) for span in spans]
+        return [chunk for chunk in chunks if chunk is not None]
+
+
+class StreamingChunker:
+    """
+    Chunks a document that arrives in pieces, such as pages of a PDF.
+
+    Text is buffered and re-chunked as it arrives, but only chunks whose
+    boundaries can no longer change are emitted; the rest of the buffer is
+    kept for the next piece. Each chunk records the range of pieces (pages)
+    it was cut from.
+    """
+
+    # Tokens at the end of the buffer whose boundary scores may still change
+    TAIL_MARGIN = 32
+
+    def __init__(self, chunker: TokenChunker, separator: str = "\n\n"):
+        """
+        Initialize the streaming chunker.
+
+        Args:
+            chunker: Chunker defining the chunk size and overlap
+            separator: Text inserted between consecutive pieces
+        """
+        self.chunker = chunker
+        self.separator = separator
+        self._buffer = b""
+        self._offset = 0  # Byte offset of the buffer in the whole document
+        self._piece_starts: List[int] = []  # Document byte offset where each piece starts
+        self._piece_labels: List[Any] = []
+
+    def _label(self, chunk: Dict[str, Any]) -> Dict[str, Any]:
+        """Attach the first and last piece label covered by a chunk."""
+        if self._piece_starts:
+            first = max(bisect.bisect_right(self._piece_starts, chunk["start"]) - 1, 0)
+            last = max(bisect.bisect_left(self._piece_starts, chunk["end"]) - 1, first)
+            chunk["page_start"] = self._piece_labels[first]
+            chunk["page_end"] = self._piece_labels[last]
+        return chunk
+
+    def feed(self, text: str, page: Any = None) -> List[Dict[str, Any]]:
+        """
+        Add the next piece of the document.
+
+        Args:
+            text: Text of the piece
+            page: Label (e.g. page number) recorded on chunks cut from this piece,
+                  or None for unlabeled pieces such as blocks of an upload
+
+        Returns:
+            Chunks that are complete, in document order
+        """
+        if self._buffer or self._offset:
+            self._buffer += self.chunker._encode(self.separator)
+        if page is not None:
+            self._piece_starts.append(self._offset + len(self._buffer))
+            self._piece_labels.append(page)
+        self._buffer += self.chunker._encode(text)
+
+        spans, total = self.chunker._spans(self._buffer)
+        # A chunk is final once the text its boundaries were chosen from is complete
+        final = [span for span in spans[:-1]
+                 if span[0] + self.chunker.chunk_size + self.TAIL_MARGIN < total]
+        if not final:
+            return []
+
+        chunks = []
+        for span in final:
+            chunk = self.chunker._make_chunk(self._buffer, span, self._offset)
+            if chunk is not None:
+                chunks.append(self._label(chunk))
+        # Keep the buffer from where the next chunk starts
+        keep_from = spans[len(final)][2]
+        self._buffer = self._buffer[keep_from:]
+        self._offset += keep_from
+        return chunks
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """
+        Chunk whatever is left of the document.
+
+        Returns:
+            The remaining chunks, in document order
+        """
+        spans, _ = self.chunker._spans(self._buffer)
+        chunks = []
+        for span in spans:
+            chunk = self.chunker._make_chunk(self._buffer, span, self._offset)
+            if chunk is not None:
+                chunks.append(self._label(chunk))
+        self._buffer = b""
+        return chunks
@@ -0,0 +1,154 @@
+import os
+import hashlib
+import logging
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, List
+
+import numpy as np
+
+from app.config import settings
+from app.services.metrics import EMBEDDING_CACHE_EVICTIONS, EMBEDDING_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+KEY_BYTES = 32  # SHA-256 digest size
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share a cache entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class EmbeddingCache:
+    """
+    Persistent on-disk embedding cache with LRU eviction.
+
+    Entries are keyed on a hash of (model, dimensions, normalized text) and
+    stored in fixed-size slots across three memory-mapped files:
+
+    - keys.bin: the SHA-256 key of each slot
+    - vectors.f32: the float32 embedding of each slot
+    - ticks.i64: the last access tick of each slot (0 marks an empty slot)
+
+    The in-memory index is rebuilt from these files on startup, so a hit is a
+    dictionary lookup plus a row copy out of the mapped vectors file.
+    """
+
+    def __init__(self, directory: str, model: str, dimensions: int, max_entries: int):
+        """
+        Initialize the cache, reopening existing cache files if compatible.
+
+        Args:
+            directory: Directory to store the cache files in
+            model: Embedding model name, part of every cache key
+            dimensions: Embedding dimensions, part of every cache key
+            max_entries: Maximum number of embeddings kept before evicting (must be positive)
+        """
+        self.directory = directory
+        self.model = model
+        self.dimensions = dimensions
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._keys = self._open_memmap("keys.bin", np.uint8, (max_entries, KEY_BYTES))
+        self._vectors = self._open_memmap("vectors.f32", np.float32, (max_entries, dimensions))
+        self._ticks = self._open_memmap("ticks.i64", np.int64, (max_entries,))
+
+        # Rebuild the LRU index from the access ticks, oldest first
+        self._slots: "OrderedDict[bytes, int]" = OrderedDict()
+        used = np.flatnonzero(self._ticks)
+        for slot in used[np.argsort(self._ticks[used], kind="stable")]:
+            self._slots[self._keys[slot].tobytes()] = int(slot)
+        self._free: List[int] = sorted(set(range(max_entries)) - set(self._slots.values()), reverse=True)
+        self._tick = int(self._ticks.max())
+
+        logger.info(f"Embedding cache loaded with {len(self._slots)}/{max_entries} entries")
+
+    def _open_memmap(self, name: str, dtype, shape) -> np.memmap:
+        """Open a cache file as a memmap, recreating it if the shape doesn't match."""
+        path = os.path.join(self.directory, name)
+        expected_size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if os.path.exists(path) and os.path.getsize(path) == expected_size:
+            return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+        if os.path.exists(path):
+            logger.warning(f"Embedding cache file {name} has an unexpected size, recreating it")
+        return np.memmap(path, dtype=dtype, mode="w+", shape=shape)
+
+    def _key(self, text: str) -> bytes:
+        """Return the cache key for a text."""
+        material = f"{self.model}\0{self.dimensions}\0{normalize_text(text)}"
+        return hashlib.sha256(material.encode("utf-8")).digest()
+
+    def _touch(self, key: bytes, slot: int):
+        """Mark a slot as most recently used."""
+        self._tick += 1
+        self._ticks[slot] = self._tick
+        self._slots.move_to_end(key)
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """
+        Look up the embedding for a text.
+
+        Args:
+            text: The embedded text
+
+        Returns:
+            A copy of the cached embedding, or None on a miss
+        """
+        key = self._key(text)
+        slot = self._slots.get(key)
+        if slot is None:
+            self.misses += 1
+            if settings.metrics_enabled:
+                EMBEDDING_CACHE_LOOKUPS.labels("miss").inc()
+            return None
+        self.hits += 1
+        if settings.metrics_enabled:
+            EMBEDDING_CACHE_LOOKUPS.labels("hit").inc()
+        self._touch(key, slot)
+        return np.array(self._vectors[slot])
+
+    def put(self, text: str, embedding) -> None:
+        """
+        Store the embedding for a text, evicting the least recently used entry if full.
+
+        Args:
+            text: The embedded text
+            embedding: The embedding vector
+        """
+        key = self._key(text)
+        slot = self._slots.get(key)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                _, slot = self._slots.popitem(last=False)
+                self.evictions += 1
+                if settings.metrics_enabled:
+                    EMBEDDING_CACHE_EVICTIONS.inc()
+            # Clear the tick first so a crash mid-write leaves an empty slot
+            self._ticks[slot] = 0
+            self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+            self._slots[key] = slot
+        self._vectors[slot] = np.asarray(embedding, dtype=np.float32)
+        self._touch(key, slot)
+
+    def flush(self):
+        """Write dirty pages of the cache files to disk."""
+        self._keys.flush()
+        self._vectors.flush()
+        self._ticks.flush()
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and occupancy."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._slots),
+            "max_entries": self.max_entries
+        }
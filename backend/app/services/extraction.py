@@ -0,0 +1,129 @@
+import os
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional, Tuple
+
+import PyPDF2
+
+logger = logging.getLogger(__name__)
+
+# File types whose text is extracted page by page in worker processes
+PAGED_EXTENSIONS = {".pdf"}
+
+
+def _pdf_page_count(file_path: str) -> int:
+    """Return the number of pages in a PDF (only reads the page tree)."""
+    with open(file_path, "rb") as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def _extract_pdf_pages(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """
+    Extract the text of a range of PDF pages (runs in a worker process).
+
+    Args:
+        file_path: Path to the PDF
+        start: First page index (0-based, inclusive)
+        end: Last page index (exclusive)
+
+    Returns:
+        List of (1-based page number, page text)
+    """
+    pages = []
+    with open(file_path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        for page_index in range(start, end):
+            pages.append((page_index + 1, reader.pages[page_index].extract_text() or ""))
+    return pages
+
+
+def read_text_file(file_path: str) -> str:
+    """
+    Read a plain text file, falling back to latin-1 if it isn't valid UTF-8.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        The file content
+    """
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except UnicodeDecodeError:
+        with open(file_path, "r", encoding="latin-1") as f:
+            return f.read()
+
+
+class DocumentExtractor:
+    """
+    Extracts document text in a pool of worker processes.
+
+    Paged documents are split into page ranges that are extracted in
+    parallel, so large decks use every core and the event loop (which keeps
+    serving the live presentation websockets) only awaits the results.
+    Pages are yielded in order as soon as every earlier page is done.
+    """
+
+    def __init__(self, max_workers: int = 0, pages_per_task: int = 8):
+        """
+        Initialize the extractor. The process pool is started on first use.
+
+        Args:
+            max_workers: Worker processes; 0 uses one per CPU core
+            pages_per_task: Pages extracted per task
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_task = max(pages_per_task, 1)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned workers don't inherit the server's threads and sockets
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def iter_pdf_pages(self, file_path: str) -> AsyncIterator[Tuple[int, str]]:
+        """
+        Extract the pages of a PDF in parallel.
+
+        Args:
+            file_path: Path to the PDF
+
+        Yields:
+            (1-based page number, page text), in page order
+        """
+        page_count = await asyncio.to_thread(_pdf_page_count, file_path)
+        if page_count == 0:
+            return
+
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        # Small documents are split so every worker gets a share
+        per_task = min(self.pages_per_task, max(1, -(-page_count // self.max_workers)))
+        futures = [
+            loop.run_in_executor(pool, _extract_pdf_pages, file_path, start,
+                                 min(start + per_task, page_count))
+            for start in range(0, page_count, per_task)
+        ]
+        logger.info(f"Extracting {page_count} pages of {os.path.basename(file_path)} "
+                    f"in {len(futures)} tasks")
+
+        try:
+            for future in futures:
+                for page in await future:
+                    yield page
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
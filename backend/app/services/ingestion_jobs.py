@@ -0,0 +1,205 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Job and file states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class IngestionJob:
+    """A batch of files submitted for ingestion together."""
+
+    def __init__(self, files: List[Dict[str, Any]]):
+        """
+        Initialize the job.
+
+        Args:
+            files: Work items with a file path and, optionally, the content
+                   hash and chunker pieces computed during the upload
+        """
+        self.id = uuid.uuid4().hex
+        self.status = QUEUED
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        # Per-file progress, keyed by filename
+        self.files: Dict[str, Dict[str, Any]] = {
+            os.path.basename(item["path"]): {"status": QUEUED, "stage": None}
+            for item in files
+        }
+        self.done = asyncio.Event()
+
+    def update(self, filename: str, **fields):
+        self.files[filename].update(fields)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable snapshot of the job."""
+        finished_files = sum(1 for f in self.files.values() if f["status"] in (COMPLETED, FAILED))
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "files_total": len(self.files),
+            "files_finished": finished_files,
+            "files": self.files
+        }
+
+
+class IngestionJobManager:
+    """
+    Runs knowledge file ingestion in the background.
+
+    Submitted files are queued and processed by a fixed number of workers,
+    so an upload request returns as soon as its files are on disk. The
+    vector store bounds each stage (extract, chunk, embed, upsert) across all
+    files in flight. Job snapshots can be polled and are pushed to a publish
+    callback (the /ws/output socket) at most every `publish_interval` seconds.
+    """
+
+    def __init__(self, get_vector_store: Callable[[], Awaitable[Any]],
+                 publish: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+                 workers: int = 2, history: int = 100, publish_interval: float = 0.25):
+        """
+        Initialize the job manager.
+
+        Args:
+            get_vector_store: Coroutine function returning the vector store to ingest into
+            publish: Coroutine function called with progress messages
+            workers: Number of files processed at the same time
+            history: Number of finished jobs kept for status lookups
+            publish_interval: Minimum seconds between progress messages for a job
+        """
+        self.get_vector_store = get_vector_store
+        self.publish = publish
+        self.workers = max(workers, 1)
+        self.history = history
+        self.publish_interval = publish_interval
+
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker_tasks: List[asyncio.Task] = []
+        self._publisher_task: Optional[asyncio.Task] = None
+        self._dirty: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._dirty_event = asyncio.Event()
+
+    async def start(self):
+        """Start the workers and the progress publisher."""
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if self.publish:
+            self._publisher_task = asyncio.create_task(self._publisher())
+
+    async def close(self):
+        """Stop the workers; queued files are abandoned."""
+        tasks = self._worker_tasks + ([self._publisher_task] if self._publisher_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._publisher_task = None
+
+    def submit(self, files: List[Dict[str, Any]]) -> IngestionJob:
+        """
+        Queue files for ingestion.
+
+        Args:
+            files: Work items, each {"path": ..., "content_hash": ..., "pieces": ...}
+                   where only the path is required
+
+        Returns:
+            The new job
+        """
+        job = IngestionJob(files)
+        self._jobs[job.id] = job
+        self._trim_history()
+        for item in files:
+            self._queue.put_nowait((job, item))
+        logger.info(f"Queued ingestion job {job.id} with {len(files)} files")
+        self._mark_dirty(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[IngestionJob]:
+        """Return known jobs, newest first."""
+        return list(reversed(self._jobs.values()))
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done.is_set()]
+        for job_id in finished[:max(len(finished) - self.history, 0)]:
+            del self._jobs[job_id]
+
+    def _mark_dirty(self, job: IngestionJob):
+        self._dirty[job.id] = job
+        self._dirty_event.set()
+
+    async def _publisher(self):
+        """Send snapshots of changed jobs, coalescing bursts of progress updates."""
+        while True:
+            await self._dirty_event.wait()
+            self._dirty_event.clear()
+            jobs = list(self._dirty.values())
+            self._dirty.clear()
+            for job in jobs:
+                try:
+                    await self.publish({"type": "ingestion_progress", "job": job.to_dict()})
+                except Exception as e:
+                    logger.debug(f"Could not publish ingestion progress: {e}")
+            await asyncio.sleep(self.publish_interval)
+
+    async def _worker(self):
+        while True:
+            job, item = await self._queue.get()
+            try:
+                await self._process(job, item)
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, job: IngestionJob, item: Dict[str, Any]):
+        """Ingest one file of a job and record the outcome."""
+        filename = os.path.basename(item["path"])
+        if job.status == QUEUED:
+            job.status = RUNNING
+            job.started = time.time()
+        job.update(filename, status=RUNNING, started=time.time())
+        self._mark_dirty(job)
+
+        def progress(stage: str, **details):
+            job.update(filename, stage=stage, **details)
+            self._mark_dirty(job)
+
+        try:
+            vector_store = await self.get_vector_store()
+            result = await vector_store.upload_file(
+                item["path"],
+                content_hash=item.get("content_hash"),
+                pieces=item.get("pieces"),
+                progress=progress
+            )
+            status = FAILED if result.get("status") == "error" else COMPLETED
+            job.update(filename, status=status, stage=None, result=result, finished=time.time())
+        except Exception as e:
+            logger.error(f"Error ingesting {filename} in job {job.id}: {e}", exc_info=True)
+            job.update(filename, status=FAILED, stage=None, error=str(e), finished=time.time())
+        finally:
+            # Pieces can be large; they are not needed once the file is processed
+            item.pop("pieces", None)
+
+        if all(f["status"] in (COMPLETED, FAILED) for f in job.files.values()):
+            failed = any(f["status"] == FAILED for f in job.files.values())
+            job.status = FAILED if failed else COMPLETED
+            job.finished = time.time()
+            job.done.set()
+            logger.info(f"Ingestion job {job.id} {job.status} in {job.finished - job.started:.1f}s")
+        self._mark_dirty(job)
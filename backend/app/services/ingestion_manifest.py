@@ -0,0 +1,134 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import time
+import asyncio
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def hash_text(text: str) -> str:
+    """Return the SHA-256 hex digest of a text string."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_file(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """
+    Return the SHA-256 hex digest of a file's contents.
+
+    Args:
+        file_path: Path to the file to hash
+        block_size: Number of bytes to read at a time
+
+    Returns:
+        Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestionManifest:
+    """
+    Persistent record of what has been ingested into the vector store.
+
+    For every knowledge file it keeps the content hash of the file and a
+    mapping from chunk hash to vector ID, so re-uploads only embed chunks
+    that are new and delete vectors for chunks that went away.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the manifest, loading it from disk if it exists.
+
+        Args:
+            path: Path to the JSON manifest file
+        """
+        self.path = path
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self._version: Optional[str] = None
+        # Saves run one at a time so an older snapshot never replaces a newer one
+        self._save_lock = asyncio.Lock()
+        self._load()
+
+    def _load(self):
+        """Load the manifest from disk, starting empty if it is missing or unreadable."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.files = data.get("files", {})
+            logger.info(f"Loaded ingestion manifest with {len(self.files)} files")
+        except Exception as e:
+            logger.error(f"Error loading ingestion manifest {self.path}: {e}", exc_info=True)
+            self.files = {}
+
+    def get_file(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Return the manifest entry for a file, or None if it was never ingested."""
+        return self.files.get(filename)
+
+    def get_chunk_ids(self, filename: str) -> Dict[str, str]:
+        """Return the chunk hash to vector ID mapping recorded for a file."""
+        entry = self.files.get(filename)
+        return dict(entry["chunks"]) if entry else {}
+
+    def set_file(self, filename: str, content_hash: str, chunks: Dict[str, str]):
+        """
+        Record the ingested state of a file.
+
+        Args:
+            filename: The source filename
+            content_hash: Hash of the file contents
+            chunks: Mapping from chunk hash to vector ID
+        """
+        self.files[filename] = {
+            "content_hash": content_hash,
+            "chunks": chunks,
+            "updated": time.time()
+        }
+        self._version = None
+
+    def remove_file(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Forget a file, returning its previous entry if there was one."""
+        self._version = None
+        return self.files.pop(filename, None)
+
+    def filenames(self) -> List[str]:
+        """Return the names of all files recorded in the manifest."""
+        return list(self.files.keys())
+
+    def version(self) -> str:
+        """Return a hash identifying the ingested content of every file."""
+        if self._version is None:
+            digest = hashlib.sha256()
+            for filename in sorted(self.files):
+                digest.update(f"{filename}\0{self.files[filename]['content_hash']}\0".encode("utf-8"))
+            self._version = digest.hexdigest()
+        return self._version
+
+    def _write(self, payload: str):
+        """Atomically replace the manifest file with the given JSON payload."""
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    async def save(self):
+        """Persist the manifest without blocking the event loop."""
+        async with self._save_lock:
+            # Serialize on the loop thread so the snapshot is consistent
+            payload = json.dumps({"files": self.files})
+            await asyncio.to_thread(self._write, payload)
@@ -0,0 +1,150 @@
+import time
+import asyncio
+import logging
+import platform
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import pyautogui
+from pynput.keyboard import Key, Controller
+
+from app.config import settings
+from app.services.metrics import INPUT_COMMAND_SECONDS
+
+logger = logging.getLogger("app_logger")
+
+DIRECTIONAL_COMMANDS = ("forward", "backward", "up", "down")
+
+# Apple key codes for the slide navigation keys sent through System Events
+SLIDE_KEY_CODES = {"forward": 124, "backward": 123}
+
+KEY_MAPPING = {
+    "forward": Key.right,
+    "backward": Key.left,
+    "up": Key.up,
+    "down": Key.down
+}
+
+
+class InputAutomationExecutor:
+    """
+    Emulates joystick commands (slide navigation and response scrolling) off the event loop.
+
+    Launching osascript and pressing keys block for tens to hundreds of
+    milliseconds, so commands run one at a time, in the order they were
+    submitted, on a single worker thread. The loop only queues them and keeps
+    streaming transcriptions and answers meanwhile. Keys are tapped without
+    sleeping between press and release. The time each command waits in the
+    queue and takes to run is exported as input_command_seconds.
+    """
+
+    def __init__(self):
+        self.is_macos = platform.system() == "Darwin"
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="input-automation")
+        self._keyboard: Optional[Controller] = None
+
+    def submit(self, command: str) -> "asyncio.Future[Dict[str, Any]]":
+        """
+        Queue a command without waiting for it to run.
+
+        Args:
+            command: One of "forward", "backward", "up", "down"
+
+        Returns:
+            A future with the result (see execute()); failures are logged
+            even if nobody awaits it
+        """
+        if command not in DIRECTIONAL_COMMANDS:
+            raise ValueError(
+                f"Invalid command: {command}. Accepted commands are: forward, backward, up, down.")
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._run, command, time.perf_counter())
+        future.add_done_callback(self._command_done)
+        return future
+
+    async def execute(self, command: str) -> Dict[str, Any]:
+        """
+        Run a command after the ones already queued and return its result.
+
+        Args:
+            command: One of "forward", "backward", "up", "down"
+
+        Returns:
+            Dictionary describing the key sent and the application it was sent to
+        """
+        return await self.submit(command)
+
+    def _command_done(self, future: "asyncio.Future[Dict[str, Any]]"):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Error emulating key press: {future.exception()}")
+
+    def _run(self, command: str, submitted_at: float) -> Dict[str, Any]:
+        """Run a command on the worker thread and record its latency."""
+        started = time.perf_counter()
+        try:
+            result = self._run_macos(command) if self.is_macos else self._tap(command)
+        finally:
+            finished = time.perf_counter()
+            if settings.metrics_enabled:
+                INPUT_COMMAND_SECONDS.labels(command, "queue").observe(started - submitted_at)
+                INPUT_COMMAND_SECONDS.labels(command, "execute").observe(finished - started)
+        logger.info(f"Input command {command} ran in {(finished - started) * 1000:.1f} ms "
+                    f"after {(started - submitted_at) * 1000:.1f} ms queued")
+        return result
+
+    def _tap(self, command: str) -> Dict[str, Any]:
+        if self._keyboard is None:
+            self._keyboard = Controller()
+        key = KEY_MAPPING[command]
+        self._keyboard.tap(key)
+        return {
+            "status": "success",
+            "message": f"Successfully emulated key press: {command}",
+            "key": str(key)
+        }
+
+    def _run_macos(self, command: str) -> Dict[str, Any]:
+        # Save the current mouse position
+        original_position = pyautogui.position()
+        try:
+            if command in SLIDE_KEY_CODES:
+                # Slide navigation in Figma on the secondary monitor
+                key_to_press = "right" if command == "forward" else "left"
+                applescript = f'''
+                tell application "Figma"
+                    activate
+                    tell application "System Events"
+                        key code {SLIDE_KEY_CODES[command]}
+                    end tell
+                end tell
+                '''
+                subprocess.run(["osascript", "-e", applescript], capture_output=True, text=True)
+                return {
+                    "status": "success",
+                    "message": f"Successfully sent {key_to_press} arrow key to Figma",
+                    "application": "Figma",
+                    "command": command
+                }
+
+            # Scrolling in Chrome on the main monitor; make sure Chrome is active first
+            applescript = '''
+            tell application "Google Chrome"
+                activate
+            end tell
+            '''
+            subprocess.run(["osascript", "-e", applescript], capture_output=True, text=True)
+            self._tap(command)
+            return {
+                "status": "success",
+                "message": f"Successfully scrolled {command} in Chrome",
+                "application": "Google Chrome",
+                "command": command
+            }
+        finally:
+            # Return mouse to original position
+            pyautogui.moveTo(original_position[0], original_position[1])
+
+    def close(self):
+        """Stop the worker thread; queued commands are dropped."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,367 @@
+import os
+import json
+import time
+import logging
+import asyncio
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.services.ann_index import IVFPQIndex, PQ_CENTROIDS
+from app.services.vector_store import BaseVectorStore
+
+logger = logging.getLogger(__name__)
+
+ANN_MIN_TRAIN_VECTORS = 4 * PQ_CENTROIDS  # Smallest store an IVF-PQ index is trained for
+ANN_RETRAIN_GROWTH = 8  # Retrain once the store has grown this much since training
+ANN_MAX_TRAIN_SAMPLE = 100000  # Vectors sampled for training
+
+
+class LocalVectorStore(BaseVectorStore):
+    """
+    A vector store kept entirely on local disk.
+
+    Vectors are L2-normalized and stored in a memory-mapped float32 matrix,
+    so cosine similarity is a single matrix-vector product. IDs and metadata
+    live in memory and are persisted as an append-only JSON lines log that
+    is replayed on startup and compacted when it accumulates dead records.
+
+    Large stores are searched through an IVF-PQ index (see IVFPQIndex)
+    instead of scanning every vector. The index is trained in a worker
+    thread once the store reaches `ann_train_threshold` vectors and is kept
+    up to date on every upsert and delete; until then queries are exact.
+    """
+
+    def __init__(self, data_dir: Optional[str] = None, initial_capacity: int = 1024):
+        """
+        Initialize the local vector store, loading any persisted vectors.
+
+        Args:
+            data_dir: Directory to keep the index in. Defaults to
+                      '<index_data_dir>/local' under the working directory.
+            initial_capacity: Number of vector slots to allocate up front
+        """
+        if data_dir is None:
+            data_dir = os.path.join(os.getcwd(), settings.index_data_dir, "local")
+        super().__init__(manifest_path=os.path.join(data_dir, "manifest.json"))
+        self.data_dir = data_dir
+        os.makedirs(data_dir, exist_ok=True)
+        self._vectors_path = os.path.join(data_dir, "vectors.f32")
+        self._records_path = os.path.join(data_dir, "records.jsonl")
+
+        # Slot bookkeeping; a slot's row in the matrix is only valid while _alive is set
+        self._ids: List[Optional[str]] = []
+        self._metadata: List[Optional[Dict[str, Any]]] = []
+        self._id_to_slot: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._log_records = 0
+        self._persist_lock = asyncio.Lock()
+
+        capacity = initial_capacity
+        if os.path.exists(self._vectors_path):
+            row_bytes = self.embedding_dimensions * 4
+            capacity = max(capacity, os.path.getsize(self._vectors_path) // row_bytes)
+        self._open_vectors(capacity)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._load_records()
+
+        # Approximate search index; queries only use it once it covers every vector
+        self.index_type = settings.local_index_type
+        if self.index_type not in ("auto", "flat", "ivfpq"):
+            raise ValueError(f"Unsupported local index type: {self.index_type}")
+        self.ann_train_threshold = (settings.ann_train_threshold if self.index_type == "auto"
+                                    else ANN_MIN_TRAIN_VECTORS)
+        self.ann: Optional[IVFPQIndex] = None
+        self._ann_ready = False
+        self._ann_lock = asyncio.Lock()
+        if self.index_type != "flat":
+            self.ann = IVFPQIndex(
+                data_dir, self.embedding_dimensions, len(self._alive),
+                nlist=settings.ann_nlist,
+                nprobe=settings.ann_nprobe,
+                pq_m=settings.ann_pq_subquantizers,
+                refine_factor=settings.ann_refine_factor
+            )
+            if self.ann.trained:
+                self._sync_ann()
+
+        logger.info(f"Loaded local vector store with {len(self._id_to_slot)} vectors from {data_dir}")
+
+    def _open_vectors(self, capacity: int):
+        """Map the vectors file with room for `capacity` rows, growing the file if needed."""
+        size = capacity * self.embedding_dimensions * 4
+        with open(self._vectors_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                  shape=(capacity, self.embedding_dimensions))
+
+    def _grow(self, needed: int):
+        """Make sure at least `needed` slots exist, doubling the capacity as required."""
+        capacity = len(self._alive)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self._vectors.flush()
+        del self._vectors
+        self._open_vectors(capacity)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self._alive)] = self._alive
+        self._alive = alive
+        if getattr(self, "ann", None) is not None:
+            self.ann.resize(capacity)
+
+    def _sync_ann(self):
+        """
+        Reconcile the ANN index with the live slots after loading.
+
+        Vectors written just before a crash may not have been encoded, and
+        deleted slots may still be indexed; both are fixed up here.
+        """
+        indexed = self.ann.indexed(len(self._alive))
+        self.ann.remove(np.flatnonzero(~self._alive & indexed))
+        missing = np.flatnonzero(self._alive & ~indexed)
+        if len(missing):
+            logger.info(f"Adding {len(missing)} unindexed vectors to the ANN index")
+            self.ann.add(missing, self._vectors[missing])
+        self._ann_ready = True
+
+    def _load_records(self):
+        """Replay the records log to rebuild the in-memory ID and metadata tables."""
+        if not os.path.exists(self._records_path):
+            return
+        with open(self._records_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                self._log_records += 1
+                if record["op"] == "upsert":
+                    self._set_slot(record["slot"], record["id"], record["metadata"])
+                else:
+                    self._clear_slot(record["id"])
+        self._free = [slot for slot in range(len(self._ids)) if self._ids[slot] is None]
+        self._free.reverse()
+
+    def _set_slot(self, slot: int, vector_id: str, metadata: Dict[str, Any]):
+        while len(self._ids) <= slot:
+            self._ids.append(None)
+            self._metadata.append(None)
+        self._grow(slot + 1)
+        previous = self._id_to_slot.get(vector_id)
+        if previous is not None and previous != slot:
+            self._clear_slot(vector_id)
+        self._ids[slot] = vector_id
+        self._metadata[slot] = metadata
+        self._id_to_slot[vector_id] = slot
+        self._alive[slot] = True
+
+    def _clear_slot(self, vector_id: str) -> Optional[int]:
+        slot = self._id_to_slot.pop(vector_id, None)
+        if slot is not None:
+            self._ids[slot] = None
+            self._metadata[slot] = None
+            self._alive[slot] = False
+        return slot
+
+    def _allocate_slot(self) -> int:
+        if self._free:
+            return self._free.pop()
+        return len(self._ids)
+
+    def _append_records(self, records: List[Dict[str, Any]]):
+        """Flush vector writes and append records to the log (runs in a worker thread)."""
+        self._vectors.flush()
+        with open(self._records_path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record) + "\n" for record in records))
+
+    async def _persist(self, records: List[Dict[str, Any]]):
+        """Persist a batch of log records, compacting the log when it is mostly dead."""
+        async with self._persist_lock:
+            self._log_records += len(records)
+            if self._log_records > 2 * max(len(self._id_to_slot), 1024):
+                await self._compact()
+            else:
+                await asyncio.to_thread(self._append_records, records)
+
+    async def _compact(self):
+        """Rewrite the records log with one upsert record per live vector (holds _persist_lock)."""
+        records = [
+            {"op": "upsert", "slot": slot, "id": vector_id, "metadata": self._metadata[slot]}
+            for vector_id, slot in self._id_to_slot.items()
+        ]
+        tmp_path = self._records_path + ".tmp"
+
+        def write():
+            self._vectors.flush()
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write("".join(json.dumps(record) + "\n" for record in records))
+            os.replace(tmp_path, self._records_path)
+
+        await asyncio.to_thread(write)
+        self._log_records = len(records)
+        logger.info(f"Compacted local vector store log to {len(records)} records")
+
+    async def _upsert_vectors(self, vectors: List[Dict[str, Any]]) -> None:
+        """
+        Upsert a batch of vector records into the local index.
+
+        Args:
+            vectors: Vector records with id, values and metadata
+        """
+        records = []
+        async with self._ann_lock:
+            slots = []
+            for vector in vectors:
+                slot = self._id_to_slot.get(vector["id"])
+                if slot is None:
+                    slot = self._allocate_slot()
+                values = np.asarray(vector["values"], dtype=np.float32)
+                norm = np.linalg.norm(values)
+                self._set_slot(slot, vector["id"], vector["metadata"])
+                self._vectors[slot] = values / norm if norm > 0 else values
+                slots.append(slot)
+                records.append({"op": "upsert", "slot": slot, "id": vector["id"],
+                                "metadata": vector["metadata"]})
+            if self.ann is not None and self.ann.trained:
+                slots = np.asarray(slots, dtype=np.int64)
+                self.ann.add(slots, self._vectors[slots])
+        await self._persist(records)
+        logger.info(f"Upserted batch of {len(vectors)} vectors")
+        await self._maybe_train_ann()
+
+    async def _delete_vector_ids(self, vector_ids: List[str]) -> None:
+        """
+        Delete vectors from the local index by ID.
+
+        Args:
+            vector_ids: IDs of the vectors to delete
+        """
+        records = []
+        async with self._ann_lock:
+            slots = []
+            for vector_id in vector_ids:
+                slot = self._clear_slot(vector_id)
+                if slot is not None:
+                    self._free.append(slot)
+                    slots.append(slot)
+                    records.append({"op": "delete", "id": vector_id})
+            if self.ann is not None and slots:
+                self.ann.remove(np.asarray(slots, dtype=np.int64))
+        if records:
+            await self._persist(records)
+
+    def _ann_needs_training(self) -> bool:
+        live = len(self._id_to_slot)
+        if self.ann.trained:
+            return live >= ANN_RETRAIN_GROWTH * max(self.ann.trained_size, 1)
+        return live >= max(self.ann_train_threshold, ANN_MIN_TRAIN_VECTORS)
+
+    async def _maybe_train_ann(self):
+        """Train (or retrain) the ANN index once the store has outgrown it."""
+        if self.ann is None or not self._ann_needs_training():
+            return
+        async with self._ann_lock:
+            # Another upsert may have trained it while we waited for the lock
+            if self._ann_needs_training():
+                await self._train_ann()
+
+    async def rebuild_ann_index(self):
+        """Retrain the ANN index on the current vectors."""
+        if self.ann is None:
+            return
+        async with self._ann_lock:
+            await self._train_ann()
+
+    async def _train_ann(self):
+        """
+        Train the ANN index on the live vectors and encode all of them (holds _ann_lock).
+
+        Training runs in a worker thread. Upserts and deletes wait for the
+        lock meanwhile, and queries fall back to exact search.
+        """
+        live_slots = np.flatnonzero(self._alive)
+        if len(live_slots) < ANN_MIN_TRAIN_VECTORS:
+            return
+        self._ann_ready = False
+
+        def train():
+            rng = np.random.default_rng(0)
+            sample_size = min(len(live_slots), ANN_MAX_TRAIN_SAMPLE)
+            sample = np.sort(rng.choice(live_slots, size=sample_size, replace=False))
+            self.ann.train(self._vectors[sample], total_vectors=len(live_slots))
+            self.ann.add(live_slots, self._vectors[live_slots])
+            self.ann.flush()
+
+        start = time.perf_counter()
+        await asyncio.to_thread(train)
+        self._ann_ready = True
+        logger.info(f"Built IVF-PQ index over {len(live_slots)} vectors "
+                    f"in {time.perf_counter() - start:.1f}s")
+
+    async def _query_vector(self, vector: List[float], top_k: int) -> List[Dict[str, Any]]:
+        """
+        Find the most similar vectors.
+
+        Uses the IVF-PQ index when it is ready (and, in "auto" mode, the store
+        is above the training threshold), otherwise a brute-force dot product.
+
+        Args:
+            vector: The query embedding
+            top_k: Number of results to return
+
+        Returns:
+            List of matching documents with similarity scores
+        """
+        count = len(self._ids)
+        if count == 0 or not self._id_to_slot:
+            return []
+
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        k = min(top_k, len(self._id_to_slot))
+        if self._use_ann():
+            top, top_scores = self.ann.search(query, k, self._vectors)
+        else:
+            scores = self._vectors[:count] @ query
+            scores[~self._alive[:count]] = -np.inf
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            top_scores = scores[top]
+
+        results = []
+        for slot, score in zip(top, top_scores):
+            metadata = self._metadata[slot]
+            if metadata is None:
+                continue
+            results.append({
+                "score": float(score),
+                "text": metadata["text"],
+                "source": metadata["source"],
+                "chunk_id": metadata["chunk_id"],
+                "page": metadata.get("page_start")
+            })
+        return results
+
+    def _use_ann(self) -> bool:
+        if self.ann is None or not self._ann_ready or not self.ann.trained:
+            return False
+        return self.index_type == "ivfpq" or len(self._id_to_slot) >= self.ann_train_threshold
+
+    async def _find_file_vector_ids(self, filename: str) -> List[str]:
+        """
+        Find the IDs of all vectors whose metadata source matches a file.
+
+        Args:
+            filename: The source filename
+
+        Returns:
+            List of vector IDs
+        """
+        return [vector_id for vector_id, slot in self._id_to_slot.items()
+                if self._metadata[slot]["source"] == filename]
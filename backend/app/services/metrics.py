@@ -0,0 +1,196 @@
+import json
+import time
+import uuid
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Iterator, Optional
+
+import numpy as np
+from prometheus_client import REGISTRY, Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+from app.config import settings
+
+logger = logging.getLogger("app_logger")
+
+# Latency buckets from 5 ms to 20 s; most stages land between 50 ms and 2 s
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.35, 0.5, 0.75,
+                 1.0, 1.5, 2.5, 5.0, 10.0, 20.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+STAGE_SECONDS = Histogram(
+    "question_stage_seconds",
+    "Duration of each stage between the end of a question and its answer",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+
+INPUT_COMMAND_SECONDS = Histogram(
+    "input_command_seconds",
+    "Time joystick commands wait for the input automation worker and take to run",
+    ["command", "stage"],
+    buckets=STAGE_BUCKETS
+)
+
+EMBEDDING_CACHE_LOOKUPS = Counter(
+    "embedding_cache_lookups",
+    "Embedding cache lookups by result (hit or miss)",
+    ["result"]
+)
+
+EMBEDDING_CACHE_EVICTIONS = Counter(
+    "embedding_cache_evictions",
+    "Embeddings evicted from the full embedding cache"
+)
+
+
+class StageQuantileCollector:
+    """
+    Exposes p50/p95/p99 per stage over a window of recent questions.
+
+    Histograms need a Prometheus server to turn buckets into quantiles; this
+    gauge family makes them readable straight from /metrics. Recording is a
+    deque append, and the quantiles are computed only when /metrics is scraped.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def observe(self, stage: str, seconds: float):
+        samples = self._samples.get(stage)
+        if samples is None:
+            samples = self._samples.setdefault(stage, deque(maxlen=self.window))
+        samples.append(seconds)
+
+    def quantiles(self) -> Dict[str, Dict[float, float]]:
+        """Return {stage: {quantile: seconds}} over the current window."""
+        result = {}
+        for stage, samples in list(self._samples.items()):
+            values = np.fromiter(list(samples), dtype=np.float64)
+            if values.size:
+                result[stage] = dict(zip(QUANTILES, np.quantile(values, QUANTILES).tolist()))
+        return result
+
+    def collect(self):
+        family = GaugeMetricFamily(
+            "question_stage_quantile_seconds",
+            f"Stage duration quantiles over the last {self.window} questions",
+            labels=["stage", "quantile"]
+        )
+        for stage, values in self.quantiles().items():
+            for quantile, seconds in values.items():
+                family.add_metric([stage, str(quantile)], seconds)
+        yield family
+
+
+STAGE_QUANTILES = StageQuantileCollector(settings.metrics_quantile_window)
+REGISTRY.register(STAGE_QUANTILES)
+
+
+class QuestionTrace:
+    """
+    Timing of one question, from the end of the utterance to the full answer.
+
+    Stages are recorded as spans (see span()); time_to_first_token and
+    answer_total are measured from the moment the trace starts. When the
+    trace finishes, every stage is observed in the histograms and the
+    trace is logged as a single JSON line.
+    """
+
+    def __init__(self, trigger: str):
+        """
+        Start a trace.
+
+        Args:
+            trigger: What ended the utterance, e.g. "end_frame" or "vad"
+        """
+        self.id = uuid.uuid4().hex[:12]
+        self.trigger = trigger
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.first_token: Optional[float] = None
+        self.finished = False
+
+    def record(self, stage: str, seconds: float):
+        """Add time spent in a stage (stages entered twice accumulate)."""
+        if not self.finished:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def mark_first_token(self):
+        """Record the first answer text handed to the output websocket."""
+        if self.first_token is None and not self.finished:
+            self.first_token = time.perf_counter() - self.start
+            self.stages["time_to_first_token"] = self.first_token
+
+    def finish(self):
+        """Observe every stage and log the trace."""
+        if self.finished:
+            return
+        self.stages["answer_total"] = time.perf_counter() - self.start
+        self.finished = True
+        for stage, seconds in self.stages.items():
+            STAGE_SECONDS.labels(stage).observe(seconds)
+            STAGE_QUANTILES.observe(stage, seconds)
+        logger.info(json.dumps({
+            "event": "question_trace",
+            "trace_id": self.id,
+            "trigger": self.trigger,
+            "stages_ms": {stage: round(seconds * 1000, 1) for stage, seconds in self.stages.items()}
+        }))
+
+
+# The trace of the question being answered in the current task, if any.
+# Tasks created while answering inherit it.
+current_trace: ContextVar[Optional[QuestionTrace]] = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def question_trace(trigger: str) -> Iterator[Optional[QuestionTrace]]:
+    """
+    Trace a question for the duration of the block.
+
+    Args:
+        trigger: What ended the utterance
+
+    Yields:
+        The trace, or None if metrics are disabled
+    """
+    if not settings.metrics_enabled:
+        yield None
+        return
+    trace = QuestionTrace(trigger)
+    token = current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        current_trace.reset(token)
+        trace.finish()
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Time a stage of the current question; does nothing outside a trace.
+
+    Args:
+        stage: Stage name, used as the histogram label
+    """
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.record(stage, time.perf_counter() - start)
+
+
+def mark_first_token():
+    """Record the first answer token for the current question, if traced."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.mark_first_token()
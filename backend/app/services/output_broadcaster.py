@@ -0,0 +1,241 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Hashable, List, Optional, Union
+
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.websockets import WebSocketState
+
+from app.services.output_protocol import CompactEncoder, JsonEncoder
+
+logger = logging.getLogger("app_logger")
+
+
+def coalesce_key(message: Dict[str, Any]) -> Optional[Hashable]:
+    """
+    Return the key of messages that supersede each other, or None.
+
+    A newer message with the same key makes a pending one obsolete: a partial
+    transcription is the whole hypothesis so far, and ingestion progress is a
+    full snapshot of the job.
+    """
+    message_type = message.get("type")
+    if message_type in ("partial_transcription", "heartbeat"):
+        return message_type
+    if message_type == "ingestion_progress":
+        return message_type, (message.get("job") or {}).get("id")
+    return None
+
+
+class OutputSubscriber:
+    """
+    One /ws/output client with its own bounded queue and sender task.
+
+    Messages are queued without waiting and sent in order by the sender task,
+    so a slow client only falls behind on its own queue. While it is behind,
+    superseded messages are replaced and consecutive text deltas are merged.
+    Once the queue is full, replaceable messages are dropped first, then the
+    oldest.
+
+    Answer text is batched: after a text delta is sent, the next one waits up
+    to `delta_window` seconds for more tokens to merge into it, unless it
+    reaches `delta_max_bytes` or another message (such as text_complete) is
+    queued behind it. The first delta after a pause is sent immediately.
+    """
+
+    def __init__(self, websocket: WebSocket, max_queue: int,
+                 delta_window: float = 0.0, delta_max_bytes: int = 1024,
+                 encoder: Union[JsonEncoder, CompactEncoder, None] = None):
+        """
+        Initialize the subscriber.
+
+        Args:
+            websocket: The accepted client websocket
+            max_queue: Messages queued before the oldest is dropped
+            delta_window: Seconds text deltas are batched for (0 sends each one)
+            delta_max_bytes: Batched text that is sent without waiting for the window
+            encoder: Frame encoder for this connection; defaults to JSON text frames
+        """
+        self.websocket = websocket
+        self.encoder = encoder or JsonEncoder()
+        self.max_queue = max(max_queue, 1)
+        self.delta_window = delta_window
+        self.delta_max_bytes = delta_max_bytes
+        self._last_delta_sent = 0.0
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.closed = False
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._pending: Dict[Hashable, Dict[str, Any]] = {}
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._sender())
+
+    def send(self, message: Dict[str, Any]):
+        """Queue a message for this client; never waits."""
+        if self.closed:
+            return
+        queue = self._queue
+        if queue:
+            key = coalesce_key(message)
+            if key is not None and key in self._pending:
+                queue.remove(self._pending.pop(key))
+                self.coalesced += 1
+            elif message.get("type") == "text_delta" and queue[-1].get("type") == "text_delta":
+                queue[-1] = {**queue[-1], "text": queue[-1]["text"] + message["text"]}
+                self.coalesced += 1
+                self._ready.set()
+                return
+            if len(queue) >= self.max_queue:
+                # Drop a message that a later one would replace anyway (partials,
+                # heartbeats, progress snapshots; _pending is in queue order),
+                # and the oldest message only if there is none
+                if self._pending:
+                    queue.remove(self._pending.pop(next(iter(self._pending))))
+                else:
+                    queue.popleft()
+                self.dropped += 1
+                if self.dropped == 1 or self.dropped % 100 == 0:
+                    logger.warning(f"Output subscriber is falling behind; {self.dropped} messages dropped")
+        key = coalesce_key(message)
+        if key is not None:
+            self._pending[key] = message
+        queue.append(message)
+        self._ready.set()
+
+    def _delta_hold(self) -> float:
+        """Seconds to keep batching the text delta at the head of the queue, or 0."""
+        if not self.delta_window or len(self._queue) != 1:
+            return 0.0
+        message = self._queue[0]
+        if message.get("type") != "text_delta" or len(message["text"].encode("utf-8")) >= self.delta_max_bytes:
+            return 0.0
+        return max(self._last_delta_sent + self.delta_window - time.monotonic(), 0.0)
+
+    async def _sender(self):
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                while self._queue:
+                    hold = self._delta_hold()
+                    if hold:
+                        # Wake up early if more text or another message arrives
+                        try:
+                            await asyncio.wait_for(self._ready.wait(), timeout=hold)
+                        except asyncio.TimeoutError:
+                            pass
+                        self._ready.clear()
+                        continue
+                    message = self._queue.popleft()
+                    key = coalesce_key(message)
+                    if key is not None and self._pending.get(key) is message:
+                        del self._pending[key]
+                    if self.websocket.client_state != WebSocketState.CONNECTED:
+                        self.closed = True
+                        return
+                    if self.encoder.binary:
+                        await self.websocket.send_bytes(self.encoder.encode(message))
+                    else:
+                        await self.websocket.send_text(self.encoder.encode(message))
+                    self.sent += 1
+                    if message.get("type") == "text_delta":
+                        self._last_delta_sent = time.monotonic()
+        except asyncio.CancelledError:
+            raise
+        except WebSocketDisconnect:
+            logger.info("Output websocket disconnected while sending")
+        except Exception as e:
+            logger.error(f"Error sending to output websocket: {e!r}")
+        finally:
+            self.closed = True
+            self._queue.clear()
+            self._pending.clear()
+
+    async def close(self):
+        """Stop the sender task; queued messages are discarded."""
+        self.closed = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self._queue),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped
+        }
+
+
+class OutputBroadcaster:
+    """
+    Fans output messages (transcriptions, answers, progress) out to every
+    /ws/output client.
+
+    Producers publish a message once and return immediately; each subscriber
+    sends it from its own queue. publish() must be called on the event loop;
+    from other threads use loop.call_soon_threadsafe(broadcaster.publish, message).
+    """
+
+    def __init__(self, max_queue: int = 256, delta_window: float = 0.0, delta_max_bytes: int = 1024):
+        """
+        Initialize the broadcaster.
+
+        Args:
+            max_queue: Messages queued per subscriber before the oldest is dropped
+            delta_window: Seconds each subscriber batches text deltas for
+            delta_max_bytes: Batched text sent without waiting for the window
+        """
+        self.max_queue = max_queue
+        self.delta_window = delta_window
+        self.delta_max_bytes = delta_max_bytes
+        self.subscribers: List[OutputSubscriber] = []
+
+    @property
+    def has_subscribers(self) -> bool:
+        return any(not subscriber.closed for subscriber in self.subscribers)
+
+    def subscribe(self, websocket: WebSocket, compact: bool = False) -> OutputSubscriber:
+        """
+        Start sending published messages to a websocket.
+
+        Args:
+            websocket: The accepted client websocket
+            compact: Send compact binary frames instead of JSON text frames
+
+        Returns:
+            The subscriber, for sending it messages of its own and unsubscribing
+        """
+        subscriber = OutputSubscriber(websocket, self.max_queue, self.delta_window, self.delta_max_bytes,
+                                      encoder=CompactEncoder() if compact else JsonEncoder())
+        subscriber.start()
+        self.subscribers.append(subscriber)
+        logger.info(f"Output subscriber added ({len(self.subscribers)} connected)")
+        return subscriber
+
+    async def unsubscribe(self, subscriber: OutputSubscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+        await subscriber.close()
+        logger.info(f"Output subscriber removed ({len(self.subscribers)} connected): {subscriber.to_dict()}")
+
+    def publish(self, message: Dict[str, Any]):
+        """Queue a message for every subscriber."""
+        for subscriber in self.subscribers:
+            subscriber.send(message)
+
+    async def close(self):
+        subscribers, self.subscribers = self.subscribers, []
+        await asyncio.gather(*(subscriber.close() for subscriber in subscribers))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"subscribers": [subscriber.to_dict() for subscriber in self.subscribers]}
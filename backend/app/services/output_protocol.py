@@ -0,0 +1,141 @@
+import json
+import struct
+from typing import Any, Dict, Union
+
+# Websocket subprotocol a /ws/output client offers to receive compact binary
+# frames instead of JSON text frames
+COMPACT_SUBPROTOCOL = "podium.compact.v1"
+
+# Each compact frame is one type byte followed by its payload
+FRAME_JSON = 0  # UTF-8 JSON of any message without a compact form
+FRAME_PARTIAL = 1  # uint16 LE count of bytes kept from the previous partial, then the new tail
+FRAME_FINAL = 2  # UTF-8 text of a final_transcription_segment
+FRAME_DELTA = 3  # UTF-8 text of a text_delta
+FRAME_COMPLETE = 4  # text_complete, no payload
+FRAME_HEARTBEAT = 5  # heartbeat, no payload
+FRAME_QUESTION = 6  # UTF-8 text of a complete_transcription
+
+# Messages carried as a single text field: type -> (frame type, field)
+TEXT_FRAMES = {
+    "final_transcription_segment": (FRAME_FINAL, "text"),
+    "text_delta": (FRAME_DELTA, "text"),
+    "complete_transcription": (FRAME_QUESTION, "data"),
+}
+EMPTY_FRAMES = {
+    "text_complete": FRAME_COMPLETE,
+    "heartbeat": FRAME_HEARTBEAT,
+}
+
+_KEEP = struct.Struct("<H")
+
+
+def _common_prefix(a: Union[bytes, str], b: Union[bytes, str], limit: int = 0xFFFF) -> int:
+    """Return the length of the common prefix of two strings, at most `limit`."""
+    n = min(len(a), len(b), limit)
+    if a[:n] == b[:n]:
+        return n
+    low, high = 0, n
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[:mid] == b[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+class JsonEncoder:
+    """
+    Encodes output messages for one connection as JSON text frames.
+
+    Partial transcriptions are sent as {"type": "partial_transcription",
+    "keep": n, "text": tail}: the client keeps the first n UTF-16 code units
+    (the length of a JavaScript string) of the previous partial on this
+    connection and appends the tail. The encoder must see every frame the
+    connection is sent, in order.
+    """
+
+    binary = False
+
+    def __init__(self):
+        self._partial = ""
+
+    def encode(self, message: Dict[str, Any]) -> str:
+        if message.get("type") == "partial_transcription" and message.keys() == {"type", "text"}:
+            text = message["text"]
+            keep = _common_prefix(self._partial, text, limit=len(text))
+            self._partial = text
+            message = {
+                "type": "partial_transcription",
+                "keep": len(text[:keep].encode("utf-16-le")) // 2,
+                "text": text[keep:]
+            }
+        return json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+
+
+class JsonDecoder:
+    """Decodes JSON text frames back into messages (the client side of JsonEncoder)."""
+
+    def __init__(self):
+        self._partial = ""
+
+    def decode(self, frame: str) -> Dict[str, Any]:
+        message = json.loads(frame)
+        if message.get("type") == "partial_transcription" and "keep" in message:
+            kept = self._partial.encode("utf-16-le")[:message.pop("keep") * 2].decode("utf-16-le")
+            self._partial = message["text"] = kept + message["text"]
+        return message
+
+
+class CompactEncoder:
+    """
+    Encodes output messages for one connection as compact binary frames.
+
+    Partial transcriptions grow word by word, so each one is sent as the
+    changed tail of its UTF-8 bytes against the previous partial on the same
+    connection. Byte offsets keep the diff exact whatever string type the
+    client uses. The encoder must therefore see every frame the connection
+    is sent, in order.
+    """
+
+    binary = True
+
+    def __init__(self):
+        self._partial = b""
+
+    def encode(self, message: Dict[str, Any]) -> bytes:
+        message_type = message.get("type")
+        if message_type == "partial_transcription" and message.keys() == {"type", "text"}:
+            text = message["text"].encode("utf-8")
+            keep = _common_prefix(self._partial, text)
+            self._partial = text
+            return bytes((FRAME_PARTIAL,)) + _KEEP.pack(keep) + text[keep:]
+        frame = TEXT_FRAMES.get(message_type)
+        if frame and message.keys() == {"type", frame[1]}:
+            return bytes((frame[0],)) + message[frame[1]].encode("utf-8")
+        if message_type in EMPTY_FRAMES and message.keys() == {"type"}:
+            return bytes((EMPTY_FRAMES[message_type],))
+        return bytes((FRAME_JSON,)) + json.dumps(message, separators=(",", ":")).encode("utf-8")
+
+
+class CompactDecoder:
+    """Decodes compact frames back into messages (the client side of CompactEncoder)."""
+
+    def __init__(self):
+        self._partial = b""
+
+    def decode(self, frame: bytes) -> Dict[str, Any]:
+        frame_type, payload = frame[0], frame[1:]
+        if frame_type == FRAME_PARTIAL:
+            (keep,) = _KEEP.unpack_from(payload)
+            self._partial = self._partial[:keep] + payload[_KEEP.size:]
+            return {"type": "partial_transcription", "text": self._partial.decode("utf-8")}
+        for message_type, (text_frame, field) in TEXT_FRAMES.items():
+            if frame_type == text_frame:
+                return {"type": message_type, field: payload.decode("utf-8")}
+        for message_type, empty_frame in EMPTY_FRAMES.items():
+            if frame_type == empty_frame:
+                return {"type": message_type}
+        if frame_type == FRAME_JSON:
+            return json.loads(payload)
+        raise ValueError(f"Unknown output frame type {frame_type}")
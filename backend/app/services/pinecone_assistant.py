@@ -1,4 +1,4 @@
-from openai import OpenAI, AssistantEventHandler
+from openai import OpenAI, AsyncOpenAI, AssistantEventHandler
 from openai.types.beta.threads import TextDelta, Text
 from typing_extensions import override
 import os
@@ -10,7 +10,17 @@ import datetime
 from fastapi import FastAPI
 
 from app.config import settings
-from app.services.pinecone_vector_store import PineconeVectorStore
+from app.services.answer_cache import SemanticAnswerCache, answer_scope
+from app.services.metrics import mark_first_token, span
+from app.services.vector_store import create_vector_store
+
+REPHRASING_PROMPT = """
+You check whether a question from the audience of a talk asks for the same
+information as one of the numbered questions below, so that the answer to
+that question fully answers it. Questions on the same topic that ask for
+something else don't count. Reply with the number of the matching question,
+or 0 if none matches. Reply with the number only.
+"""
 
 
 class StreamingCompletionHandler:
@@ -39,15 +49,27 @@ class StreamingCompletionHandler:
         if hasattr(chunk.choices[0], 'delta') and hasattr(chunk.choices[0].delta, 'content'):
             delta_content = chunk.choices[0].delta.content
             if delta_content:
-                # Create a TextDelta-like object
-                delta = type('TextDelta', (), {'value': delta_content})
+                self.handle_text(delta_content)
+
+    def handle_text(self, delta_content: str):
+        """
+        Handle a piece of response text, whether streamed or replayed from a cache.
+
+        Args:
+            delta_content: The new text
+        """
+        if not self.current_text:
+            mark_first_token()
 
-                # Create a Text-like object for the snapshot
-                self.current_text += delta_content
-                snapshot = type('Text', (), {'value': self.current_text})
+        # Create a TextDelta-like object
+        delta = type('TextDelta', (), {'value': delta_content})
 
-                # Call the on_text_delta method of the assistant handler
-                self.assistant_handler.on_text_delta(delta, snapshot)
+        # Create a Text-like object for the snapshot
+        self.current_text += delta_content
+        snapshot = type('Text', (), {'value': self.current_text})
+
+        # Call the on_text_delta method of the assistant handler
+        self.assistant_handler.on_text_delta(delta, snapshot)
 
     def handle_completion(self):
         """
@@ -69,6 +91,8 @@ class PineconeAssistant:
 
     def __init__(self, app: Optional[FastAPI] = None):
         self.client = OpenAI(api_key=settings.openai_api_key)
+        # Async client for streaming, so reading the stream never blocks the event loop
+        self.async_client = AsyncOpenAI(api_key=settings.openai_api_key)
         self.vector_store = None
         self.model = "gpt-4.1"
         self.base_system_prompt = """
@@ -92,6 +116,17 @@ class PineconeAssistant:
         # Placeholder for additional presentation context
         self.presentation_context = ""
 
+        # Answers to earlier questions, reused when a question is asked again
+        self.answer_cache = None
+        if settings.answer_cache_enabled:
+            self.answer_cache = SemanticAnswerCache(
+                similarity=settings.answer_cache_similarity,
+                max_entries=settings.answer_cache_max_entries,
+                path=os.path.join(os.getcwd(), settings.index_data_dir, "prepared_answers.json"),
+                candidate_similarity=settings.answer_cache_candidate_similarity,
+                max_candidates=settings.answer_cache_max_candidates
+            )
+
         # Store reference to the FastAPI app for accessing app.state
         self.app = app
 
@@ -106,8 +141,8 @@ class PineconeAssistant:
 
     async def initialize_async(self):
         """Initialize the parts that need to be done asynchronously."""
-        # Initialize Pinecone vector store
-        self.vector_store = PineconeVectorStore(index_name="knowledge-base")
+        # Initialize the configured vector store backend
+        self.vector_store = create_vector_store()
         return self
 
     @classmethod
@@ -132,19 +167,140 @@ class PineconeAssistant:
             await self.initialize_async()
         return await self.vector_store.upload_knowledge_directory(directory_path)
 
-    async def ask_and_stream_response(self, question: str, handler: AssistantEventHandler, thread_id: Optional[str] = None) -> None:
+    def answer_scope(self) -> str:
+        """Return the answer cache scope for the current presentation context and knowledge base."""
+        return answer_scope(self.presentation_context, self.vector_store.knowledge_version())
+
+    def _build_messages(self, question: str, context_results: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """
+        Create the completion messages for a question and its retrieved context.
+
+        Args:
+            question: The question to answer
+            context_results: Results retrieved from the vector store
+
+        Returns:
+            Messages for the completions API
+        """
+        # Format the context
+        context_text = "Here is relevant information from the knowledge base:\n\n"
+        for i, result in enumerate(context_results):
+            page = f", Page: {result['page']}" if result.get("page") else ""
+            context_text += f"[Document: {result['source']}{page}, Chunk: {result['chunk_id']}]\n"
+            context_text += f"{result['text']}\n\n"
+
+        # Create messages for the completions API
+        return [
+            {"role": "system", "content": self.get_system_prompt()},
+            {"role": "user", "content": f"{context_text}\n\nUser question: {question}"}
+        ]
+
+    async def confirm_rephrasing(self, question: str, candidates: List[str]) -> Optional[int]:
+        """
+        Ask a small model which cached question, if any, the question rephrases.
+
+        Args:
+            question: The question asked
+            candidates: Cached questions with similar embeddings
+
+        Returns:
+            Index of the matching candidate, or None
+        """
+        numbered = "\n".join(f"{i}. {candidate}" for i, candidate in enumerate(candidates, 1))
+        response = await self.async_client.chat.completions.create(
+            model=settings.answer_cache_confirm_model,
+            messages=[
+                {"role": "system", "content": REPHRASING_PROMPT},
+                {"role": "user", "content": f"Questions:\n{numbered}\n\nAudience question: {question}"}
+            ],
+            max_tokens=3,
+            temperature=0
+        )
+        reply = (response.choices[0].message.content or "").strip().rstrip(".")
+        choice = int(reply) if reply.isdigit() else 0
+        return choice - 1 if 1 <= choice <= len(candidates) else None
+
+    async def find_cached_answer(self, scope: str, question: str, question_embedding):
+        """
+        Look up a cached answer to the question or a rephrasing of it.
+
+        Args:
+            scope: The answer scope
+            question: The question asked
+            question_embedding: Embedding of the question, or a task computing it
+
+        Returns:
+            The cached answer, or None
+        """
+        if isinstance(question_embedding, asyncio.Future):
+            question_embedding = await question_embedding
+        confirm = self.confirm_rephrasing if settings.answer_cache_confirm_model else None
+        try:
+            return await self.answer_cache.get(scope, question, question_embedding, confirm=confirm)
+        except Exception as e:
+            # A failed check only costs the cache hit
+            print(f"Error looking up cached answer: {e}")
+            return None
+
+    @staticmethod
+    async def _discard_completion(completion: "asyncio.Task"):
+        """Cancel a completion request, closing its stream if it has opened already."""
+        completion.cancel()
+        result = (await asyncio.gather(completion, return_exceptions=True))[0]
+        if not isinstance(result, BaseException):
+            await result.close()
+
+    async def generate_answer(self, question: str) -> Dict[str, Any]:
+        """
+        Retrieve context for a question and generate the full answer without streaming.
+
+        Used to prepare answers ahead of time, so the answer cache is neither
+        consulted nor updated.
+
+        Args:
+            question: The question to answer
+
+        Returns:
+            Dictionary with the question, its embedding and the answer
+        """
+        if not self.vector_store:
+            await self.initialize_async()
+
+        question_embedding = await self.vector_store.embed_query(question)
+        context_results = await self.vector_store.query(
+            question, top_k=5, query_embedding=question_embedding)
+        response = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=self._build_messages(question, context_results)
+        )
+        return {
+            "question": question,
+            "embedding": question_embedding,
+            "answer": response.choices[0].message.content or ""
+        }
+
+    async def ask_and_stream_response(self, question: str, handler: AssistantEventHandler, thread_id: Optional[str] = None,
+                                      context_results: Optional[List[Dict[str, Any]]] = None) -> None:
         """
         Ask a question to the assistant and stream the response using completions API.
 
         This method:
-        1. Retrieves relevant context from Pinecone
-        2. Creates a prompt with the context and question
-        3. Streams the response through the provided handler
+        1. Replays a cached answer if the question (or a rephrasing of it)
+           was answered before for the same presentation and knowledge base
+        2. Otherwise retrieves relevant context from Pinecone
+        3. Creates a prompt with the context and question
+        4. Streams the response through the provided handler and caches it
+
+        Except for exact repeats, the cache is consulted while the completion
+        request is already in flight, and the request is dropped on a hit, so
+        a miss adds no round trip before generation starts.
 
         Args:
             question: The question to ask
             handler: Event handler for streaming the response
             thread_id: Optional thread ID (not used with completions API, kept for compatibility)
+            context_results: Optional results already retrieved for this question
+                (e.g. speculatively while it was being spoken)
         """
         if not self.vector_store:
             await self.initialize_async()
@@ -157,50 +313,85 @@ class PineconeAssistant:
             handler.on_text_created(None)
 
         try:
-            # Retrieve relevant context from Pinecone
-            context_results = await self.vector_store.query(question, top_k=5)
-
-            # Format the context
-            context_text = "Here is relevant information from the knowledge base:\n\n"
-            for i, result in enumerate(context_results):
-                context_text += f"[Document: {result['source']}, Chunk: {result['chunk_id']}]\n"
-                context_text += f"{result['text']}\n\n"
-
-            # Create messages for the completions API
-            messages = [
-                {"role": "system", "content": self.get_system_prompt()},
-                {"role": "user", "content": f"{context_text}\n\nUser question: {question}"}
-            ]
-
-            # Stream the response using the completions API
-            stream = await asyncio.to_thread(
-                lambda: self.client.chat.completions.create(
+            if self.answer_cache:
+                scope = self.answer_scope()
+                # An exact repeat doesn't even need the question embedded
+                with span("answer_cache"):
+                    cached = self.answer_cache.get_exact(scope, question)
+                if cached is not None:
+                    completion_handler.handle_text(cached.answer)
+                    completion_handler.handle_completion()
+                    return
+
+            # The embedding is needed by the cache lookup and, unless context was
+            # retrieved already, by retrieval
+            pending: List[asyncio.Task] = []
+            embedding_task = None
+            if self.answer_cache or context_results is None:
+                embedding_task = asyncio.create_task(self.vector_store.embed_query(question))
+                pending.append(embedding_task)
+            lookup = None
+            if self.answer_cache:
+                lookup = asyncio.create_task(self.find_cached_answer(scope, question, embedding_task))
+                pending.append(lookup)
+
+            try:
+                # Retrieve relevant context from Pinecone unless it was retrieved already
+                if context_results is None:
+                    context_results = await self.vector_store.query(
+                        question, top_k=5, query_embedding=await embedding_task)
+
+                messages = self._build_messages(question, context_results)
+
+                # Request the answer while the cache lookup finishes
+                completion = asyncio.create_task(self.async_client.chat.completions.create(
                     model=self.model,
                     messages=messages,
                     stream=True
-                )
-            )
-
-            # Process the streaming response
-            for chunk in stream:
-                completion_handler.handle_chunk(chunk)
-                # Small yield to allow other async tasks to run
-                await asyncio.sleep(0)
+                ))
+                pending.append(completion)
+
+                if lookup:
+                    with span("answer_cache"):
+                        cached = await lookup
+                    if cached is not None:
+                        await self._discard_completion(completion)
+                        completion_handler.handle_text(cached.answer)
+                        completion_handler.handle_completion()
+                        return
+
+                # Stream the response using the completions API
+                with span("completion_request"):
+                    stream = await completion
+            except BaseException:
+                for task in pending:
+                    task.cancel()
+                raise
+
+            # Process the streaming response; each network read awaits on the loop
+            with span("completion_stream"):
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    completion_handler.handle_chunk(chunk)
 
             # Signal that the message is complete
             completion_handler.handle_completion()
 
+            if self.answer_cache:
+                self.answer_cache.put(scope, question, embedding_task.result(), completion_handler.current_text)
+
         except Exception as e:
             print(f"Error in ask_and_stream_response: {e}")
             raise
 
-    def get_output_websocket(self):
+    def get_output(self):
         """
-        Get the output websocket from app state if available.
+        Get the output broadcaster from app state if available.
 
         Returns:
-            WebSocket: The output websocket or None if not available
+            OutputBroadcaster: The broadcaster for /ws/output clients or None if not available
         """
-        if self.app and hasattr(self.app.state, 'output_websocket'):
-            return self.app.state.output_websocket
+        if self.app and hasattr(self.app.state, 'output_broadcaster'):
+            return self.app.state.output_broadcaster
         return None
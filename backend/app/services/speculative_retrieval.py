@@ -0,0 +1,124 @@
+import asyncio
+import difflib
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger("app_logger")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class SpeculativeRetriever:
+    """
+    Starts knowledge-base retrieval while the question is still being spoken.
+
+    Every recognized segment (and optionally every stable partial) is
+    submitted as the transcription so far. A background query is started for
+    it, superseding any query for older text that is still in flight. When
+    the final transcription arrives, the most recent speculative result is
+    reused if its text is close enough to the final question.
+    """
+
+    def __init__(self, vector_store, top_k: int = 5,
+                 reuse_similarity: Optional[float] = None,
+                 partial_min_new_words: Optional[int] = None,
+                 use_partials: Optional[bool] = None):
+        """
+        Initialize the speculative retriever for a single utterance.
+
+        Args:
+            vector_store: Vector store whose query method is used for retrieval
+            top_k: Number of results to retrieve per query
+            reuse_similarity: Minimum word-level similarity for reusing a result
+            partial_min_new_words: Words a partial must add before it is queried
+            use_partials: Whether partial hypotheses start queries at all
+        """
+        self.vector_store = vector_store
+        self.top_k = top_k
+        self.reuse_similarity = (settings.speculative_reuse_similarity
+                                 if reuse_similarity is None else reuse_similarity)
+        self.partial_min_new_words = (settings.speculative_partial_min_new_words
+                                      if partial_min_new_words is None else partial_min_new_words)
+        self.use_partials = (settings.speculative_retrieval_partials
+                             if use_partials is None else use_partials)
+        # Normalized text -> query task, in submission order
+        self._queries: Dict[str, asyncio.Task] = {}
+        self._last_submitted = ""
+
+    def submit(self, text: str, partial: bool = False) -> None:
+        """
+        Start a background retrieval for the transcription so far.
+
+        Must be called on the event loop thread.
+
+        Args:
+            text: The transcription so far
+            partial: Whether the text ends in an unstable partial hypothesis
+        """
+        if partial and not self.use_partials:
+            return
+        normalized = _normalize(text)
+        if not normalized or normalized in self._queries:
+            return
+        if partial:
+            new_words = len(normalized.split()) - len(self._last_submitted.split())
+            if new_words < self.partial_min_new_words:
+                return
+
+        # Older queries still in flight are superseded by this one
+        for task in self._queries.values():
+            if not task.done():
+                task.cancel()
+
+        logger.debug(f"Starting speculative retrieval for: {text[:50]}...")
+        task = asyncio.create_task(self.vector_store.query(text, top_k=self.top_k))
+        # Retrieve errors of superseded queries so they aren't logged as unhandled
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._queries[normalized] = task
+        self._last_submitted = normalized
+
+    async def get_results(self, final_text: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Return speculative retrieval results usable for the final question.
+
+        Args:
+            final_text: The complete transcription
+
+        Returns:
+            The retrieved results, or None if no speculative query matches
+        """
+        normalized = _normalize(final_text)
+        task = self._queries.get(normalized)
+        if task is None and self._last_submitted:
+            similarity = difflib.SequenceMatcher(
+                None, self._last_submitted.split(), normalized.split()).ratio()
+            if similarity >= self.reuse_similarity:
+                task = self._queries[self._last_submitted]
+            else:
+                logger.info(f"Speculative retrieval not reused (similarity {similarity:.2f})")
+
+        if task is None:
+            return None
+        try:
+            # asyncio.wait doesn't propagate the task's own cancellation or error
+            await asyncio.wait({task})
+        finally:
+            self.cancel()
+
+        if task.cancelled():
+            return None
+        if task.exception() is not None:
+            logger.error(f"Speculative retrieval failed: {task.exception()}")
+            return None
+        logger.info("Reusing speculative retrieval results")
+        return task.result()
+
+    def cancel(self) -> None:
+        """Cancel any speculative queries still in flight."""
+        for task in self._queries.values():
+            if not task.done():
+                task.cancel()
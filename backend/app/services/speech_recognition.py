@@ -1,13 +1,25 @@
 import azure.cognitiveservices.speech as speechsdk
+import re
 import asyncio
 import logging
-from typing import Callable, Optional, Any
+import time
+from collections import deque
+from typing import Callable, List, Optional, Any
 from app.config import settings
-from fastapi import WebSocket
-from fastapi.websockets import WebSocketState
+from app.services.audio_processing import (
+    AudioFormat, PCMResampler, VoiceActivityDetector, CODEC_PCM, CODEC_OGG_OPUS, TARGET_SAMPLE_RATE, LEGACY_AUDIO_FORMAT
+)
+from app.services.output_broadcaster import OutputBroadcaster
 
 logger = logging.getLogger("app_logger")
 
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def _normalized_words(text: str) -> List[str]:
+    """Return the words of a hypothesis, ignoring case and punctuation."""
+    return _PUNCTUATION.sub("", text).lower().split()
+
 # Configure Azure Speech
 speech_config = speechsdk.SpeechConfig(
     subscription=settings.azure_speech_key,
@@ -23,7 +35,11 @@ class SpeechRecognitionManager:
                  message_callback: Optional[Callable[[str], Any]] = None,
                  recognition_done_event: Optional[asyncio.Event] = None,
                  transcription_result = None,
-                 output_websocket: Optional[WebSocket] = None):
+                 output: Optional[OutputBroadcaster] = None,
+                 segment_callback: Optional[Callable[..., Any]] = None,
+                 loop: Optional[asyncio.AbstractEventLoop] = None,
+                 stream_format: str = CODEC_PCM,
+                 audio_format: Optional[AudioFormat] = None):
         """
         Initialize the speech recognition manager.
         
@@ -31,18 +47,49 @@ class SpeechRecognitionManager:
             message_callback: (Legacy) Callback function to receive recognition messages
             recognition_done_event: Optional event to signal when recognition is done
             transcription_result: Optional TranscriptionResult to update directly
-            output_websocket: Optional WebSocket to send messages directly to
+            output: Optional broadcaster to publish transcriptions to /ws/output clients
+            segment_callback: Optional callback run on the event loop with the
+                transcription so far after every recognized segment, and with
+                partial=True for partial hypotheses
+            loop: Event loop to deliver callbacks on; defaults to the current loop
+                (pass it explicitly when constructing from a worker thread)
+            stream_format: Push stream format, CODEC_PCM (16 kHz mono PCM) or
+                CODEC_OGG_OPUS (compressed, decoded by the speech SDK)
+            audio_format: Format the client sends audio in; PCM that isn't
+                16 kHz mono is resampled before it is pushed. Defaults to the
+                legacy 44.1 kHz PCM format for PCM streams
         """
         self.message_callback = message_callback
         self.recognition_done_event = recognition_done_event or asyncio.Event()
         self.transcription_result = transcription_result
-        self.output_websocket = output_websocket
+        self.output = output
+        self.segment_callback = segment_callback
+        self.final_segments = []
         
-        # Save the current event loop for use in callbacks
-        self.loop = asyncio.get_event_loop()
+        # Save the event loop for use in callbacks
+        self.loop = loop or asyncio.get_event_loop()
+
+        # Recognizer events waiting for the loop, and the partial transcription throttle
+        self._events = deque()
+        self._drain_scheduled = False
+        self.partial_interval = settings.partial_transcription_interval_ms / 1000
+        self._reset_partials()
+        self.connection = None
+        self.warmed_at = None
         
-        audio_format = speechsdk.audio.AudioStreamFormat(samples_per_second=44100, bits_per_sample=16, channels=1)
-        self.stream = speechsdk.audio.PushAudioInputStream(stream_format=audio_format)
+        self.stream_format = stream_format
+        if stream_format == CODEC_OGG_OPUS:
+            push_format = speechsdk.audio.AudioStreamFormat(
+                compressed_stream_format=speechsdk.AudioStreamContainerFormat.OGG_OPUS)
+        else:
+            push_format = speechsdk.audio.AudioStreamFormat(
+                samples_per_second=TARGET_SAMPLE_RATE, bits_per_sample=16, channels=1)
+        self.stream = speechsdk.audio.PushAudioInputStream(stream_format=push_format)
+        self.resampler = None
+        if audio_format is None:
+            audio_format = (AudioFormat(codec=CODEC_OGG_OPUS) if stream_format == CODEC_OGG_OPUS
+                            else LEGACY_AUDIO_FORMAT)
+        self.set_audio_format(audio_format)
         self.audio_config = speechsdk.audio.AudioConfig(stream=self.stream)
         self.speech_recognizer = speechsdk.SpeechRecognizer(
             speech_config=speech_config, 
@@ -52,20 +99,102 @@ class SpeechRecognitionManager:
         # Set up event handlers
         self.setup_event_handlers()
     
-    async def _send_json_to_websocket(self, data: dict):
+    def _push_event(self, kind: str, text: str = ""):
         """
-        Helper to safely send JSON to the output websocket.
+        Hand a recognizer event to the event loop (called from SDK threads).
+
+        Events go into one deque that the loop drains in order. A drain is
+        scheduled only when none is pending, so a burst of events costs a
+        single wakeup of the loop instead of one callback per event.
         """
-        if not self.output_websocket:
+        self._events.append((kind, text))
+        # The drain clears the flag before it empties the deque, so an event
+        # appended after the check below is still picked up by that drain
+        if not self._drain_scheduled:
+            self._drain_scheduled = True
+            try:
+                self.loop.call_soon_threadsafe(self._drain_events)
+            except RuntimeError as e:
+                logger.error(f"Error scheduling recognition events: {e}")
+
+    def _drain_events(self):
+        """Handle the queued recognizer events on the event loop."""
+        self._drain_scheduled = False
+        latest_partial = None
+        while self._events:
+            kind, text = self._events.popleft()
+            if kind == "partial":
+                # Only the newest hypothesis in a burst matters
+                latest_partial = text
+                continue
+            latest_partial = None
+            if kind == "final":
+                self._handle_final(text)
+            else:
+                # Session stopped or canceled: every final is handled by now
+                self._cancel_partial_send()
+                self.recognition_done_event.set()
+        if latest_partial is not None:
+            self._handle_partial(latest_partial)
+
+    def _handle_partial(self, partial_text: str):
+        # Let the segment callback speculate on the transcription so far
+        if self.segment_callback and partial_text:
+            self.segment_callback(" ".join(self.final_segments + [partial_text]), partial=True)
+
+        if not self.output:
             return
-            
-        try:
-            if self.output_websocket.client_state == WebSocketState.CONNECTED:
-                await self.output_websocket.send_json(data)
-                logger.debug(f"Sent message to output websocket: {data.get('type')}")
-        except Exception as e:
-            logger.error(f"Error sending message to websocket: {e}", exc_info=True)
-    
+        self._latest_partial = partial_text
+        # Skip hypotheses that only differ in case or punctuation from the last one sent
+        if _normalized_words(partial_text) == _normalized_words(self._sent_partial):
+            return
+        wait = self._partial_sent_at + self.partial_interval - time.monotonic()
+        if wait <= 0:
+            self._send_partial()
+        elif self._partial_timer is None:
+            # Send the newest hypothesis once the interval is up
+            self._partial_timer = self.loop.call_later(wait, self._send_partial)
+
+    def _send_partial(self):
+        self._partial_timer = None
+        text = self._latest_partial
+        if text is None or _normalized_words(text) == _normalized_words(self._sent_partial):
+            return
+        self._sent_partial = text
+        self._partial_sent_at = time.monotonic()
+        self.output.publish({
+            "type": "partial_transcription",
+            "text": text
+        })
+
+    def _cancel_partial_send(self):
+        if self._partial_timer is not None:
+            self._partial_timer.cancel()
+            self._partial_timer = None
+        self._latest_partial = None
+
+    def _handle_final(self, final_text: str):
+        # Update transcription result if available
+        if self.transcription_result:
+            self.transcription_result.add_final_output(final_text)
+
+        # A finished segment supersedes its partials; the next partial starts afresh
+        self._cancel_partial_send()
+        self._sent_partial = ""
+
+        # Let the segment callback speculate on the transcription so far
+        if final_text:
+            self.final_segments.append(final_text)
+            if self.segment_callback:
+                self.segment_callback(" ".join(self.final_segments))
+
+        # Publish to the output websocket clients
+        if self.output:
+            self.output.publish({
+                "type": "final_transcription_segment",
+                "text": final_text
+            })
+
     def setup_event_handlers(self):
         """Set up the event handlers for the speech recognizer."""
         def recognizing_handler(evt):
@@ -75,20 +204,8 @@ class SpeechRecognitionManager:
             # Handle the partial transcription result via message callback
             if self.message_callback:
                 self.message_callback(f"PARTIAL: {partial_text}")
-                
-            # If we have an output websocket, send directly to it using run_coroutine_threadsafe
-            if self.output_websocket:
-                try:
-                    # Use run_coroutine_threadsafe to properly run the coroutine from this thread
-                    asyncio.run_coroutine_threadsafe(
-                        self._send_json_to_websocket({
-                            "type": "partial_transcription",
-                            "text": partial_text
-                        }), 
-                        self.loop
-                    )
-                except Exception as e:
-                    logger.error(f"Error scheduling partial transcription send: {e}", exc_info=True)
+
+            self._push_event("partial", partial_text)
 
         def recognized_handler(evt):
             final_text = evt.result.text
@@ -97,33 +214,17 @@ class SpeechRecognitionManager:
             # Handle the final transcription via message callback
             if self.message_callback:
                 self.message_callback(f"FINAL: {final_text}")
-                
-            # Update transcription result if available
-            if self.transcription_result:
-                self.transcription_result.add_final_output(final_text)
-                
-            # Send to output websocket if available
-            if self.output_websocket:
-                try:
-                    # Use run_coroutine_threadsafe to properly run the coroutine from this thread
-                    asyncio.run_coroutine_threadsafe(
-                        self._send_json_to_websocket({
-                            "type": "final_transcription_segment",
-                            "text": final_text
-                        }), 
-                        self.loop
-                    )
-                except Exception as e:
-                    logger.error(f"Error scheduling final transcription send: {e}", exc_info=True)
+
+            self._push_event("final", final_text)
 
         def session_stopped_handler(evt):
             if self.message_callback:
                 self.message_callback("SESSION_STOPPED")
-            self.recognition_done_event.set()
+            self._push_event("stopped")
 
         def canceled_handler(evt):
             logger.error("Recognition canceled")
-            self.recognition_done_event.set()
+            self._push_event("stopped")
 
         # Attach handlers to recognizer events
         self.speech_recognizer.recognizing.connect(recognizing_handler)
@@ -131,17 +232,105 @@ class SpeechRecognitionManager:
         self.speech_recognizer.session_stopped.connect(session_stopped_handler)
         self.speech_recognizer.canceled.connect(canceled_handler)
     
+    def bind(self,
+             message_callback: Optional[Callable[[str], Any]] = None,
+             recognition_done_event: Optional[asyncio.Event] = None,
+             transcription_result = None,
+             output: Optional[OutputBroadcaster] = None,
+             segment_callback: Optional[Callable[..., Any]] = None,
+             audio_format: AudioFormat = LEGACY_AUDIO_FORMAT):
+        """
+        Attach per-utterance state to a pre-built manager.
+
+        The event handlers read these attributes when they fire, so a manager
+        taken from the pool can be bound right before recognition starts.
+        """
+        self.message_callback = message_callback
+        self.recognition_done_event = recognition_done_event or asyncio.Event()
+        self.transcription_result = transcription_result
+        self.output = output
+        self.segment_callback = segment_callback
+        self.final_segments = []
+        self._reset_partials()
+        self.set_audio_format(audio_format)
+        return self
+
+    def _reset_partials(self):
+        self._latest_partial = None
+        self._sent_partial = ""
+        self._partial_sent_at = 0.0
+        self._partial_timer = None
+
+    def set_audio_format(self, audio_format: AudioFormat):
+        """
+        Set the format the client sends audio in.
+
+        Args:
+            audio_format: The client's audio format; must match the push stream format
+        """
+        if audio_format.stream_format() != self.stream_format:
+            raise ValueError(
+                f"Audio codec {audio_format.codec} can't be pushed to a {self.stream_format} stream")
+        self.resampler = None
+        if audio_format.codec == CODEC_PCM and (
+            audio_format.sample_rate != TARGET_SAMPLE_RATE or audio_format.channels != 1
+        ):
+            self.resampler = PCMResampler(audio_format.sample_rate, channels=audio_format.channels)
+
+        # Compressed audio can't be inspected, so voice activity detection is PCM only
+        self.vad = None
+        if settings.vad_enabled and self.stream_format == CODEC_PCM:
+            self.vad = VoiceActivityDetector(
+                threshold_db=settings.vad_threshold_db,
+                margin_db=settings.vad_margin_db,
+                preroll_ms=settings.vad_preroll_ms,
+                hangover_ms=settings.vad_hangover_ms,
+                end_silence_ms=settings.vad_end_silence_ms
+            )
+
+    def warm_up(self):
+        """
+        Open the connection to the speech service ahead of recognition.
+
+        Blocks while connecting, so call it from a worker thread.
+        """
+        try:
+            self.connection = speechsdk.Connection.from_recognizer(self.speech_recognizer)
+            self.connection.open(True)
+            self.warmed_at = time.monotonic()
+        except Exception as e:
+            logger.warning(f"Failed to pre-open speech connection: {e}")
+
     def start_recognition(self):
-        """Start continuous recognition."""
-        self.speech_recognizer.start_continuous_recognition()
+        """Start continuous recognition without waiting for the session to connect."""
+        self.speech_recognizer.start_continuous_recognition_async()
     
     def stop_recognition(self):
-        """Stop continuous recognition."""
-        self.speech_recognizer.stop_continuous_recognition()
+        """Stop continuous recognition; recognition_done_event is set once the session stops."""
+        self.speech_recognizer.stop_continuous_recognition_async()
     
     def process_audio_chunk(self, audio_chunk):
-        """Process an audio chunk."""
-        self.stream.write(audio_chunk)
+        """
+        Process an audio chunk.
+
+        PCM is resampled to 16 kHz mono if needed and long silences are
+        dropped before the audio is pushed to the recognizer.
+        """
+        if self.resampler:
+            audio_chunk = self.resampler.process(audio_chunk)
+        if self.vad:
+            audio_chunk = self.vad.process(audio_chunk)
+        if audio_chunk:
+            self.stream.write(audio_chunk)
+
+    @property
+    def end_of_utterance_detected(self) -> bool:
+        """Whether voice activity detection saw enough trailing silence to end the utterance."""
+        return bool(self.vad and self.vad.end_of_utterance)
+
+    def get_audio_stats(self) -> dict:
+        """Return voice activity detection counters for the current utterance."""
+        return self.vad.stats() if self.vad else {}
     
     def wait_for_recognition_done(self):
         """Wait for recognition to complete."""
@@ -150,6 +339,179 @@ class SpeechRecognitionManager:
     def close(self):
         """Clean up resources."""
         self.stream.close()
+        if self.connection:
+            self.connection.close()
+
+
+class SpeechRecognizerPool:
+    """
+    Keeps pre-built, pre-connected speech recognition managers ready to use.
+
+    Building a recognizer and connecting it to Azure takes noticeable time,
+    so the pool does it ahead of time in a worker thread. A manager is handed
+    out instantly when audio starts and the pool refills in the background.
+    Managers can't be restarted once their push stream is closed, so used
+    managers are replaced rather than returned.
+    """
+
+    def __init__(self, size: int = 1, max_idle_seconds: float = 240.0):
+        """
+        Initialize the pool.
+
+        Args:
+            size: Number of ready managers to keep
+            max_idle_seconds: Age after which an idle manager is rebuilt, since
+                the service drops idle connections
+        """
+        self.size = size
+        self.max_idle_seconds = max_idle_seconds
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # Ready managers and in-flight builds per push stream format
+        self._ready = {CODEC_PCM: deque()}
+        self._pending = {CODEC_PCM: 0}
+        self._maintenance_task: Optional[asyncio.Task] = None
+
+    def _build(self, stream_format: str) -> SpeechRecognitionManager:
+        """Build and warm up a manager (runs in a worker thread)."""
+        manager = SpeechRecognitionManager(loop=self.loop, stream_format=stream_format)
+        manager.warm_up()
+        return manager
+
+    async def _add_one(self, stream_format: str):
+        try:
+            manager = await asyncio.to_thread(self._build, stream_format)
+            self._ready[stream_format].append(manager)
+        except Exception as e:
+            logger.error(f"Error pre-building speech recognition manager: {e}", exc_info=True)
+        finally:
+            self._pending[stream_format] -= 1
+
+    def _refill(self):
+        """Schedule background builds until every format in use is full again."""
+        for stream_format, ready in self._ready.items():
+            while len(ready) + self._pending[stream_format] < self.size:
+                self._pending[stream_format] += 1
+                self.loop.create_task(self._add_one(stream_format))
+
+    async def _maintain(self):
+        """Periodically replace managers whose connection has been idle too long."""
+        while True:
+            await asyncio.sleep(self.max_idle_seconds / 4)
+            now = time.monotonic()
+            for ready in self._ready.values():
+                for manager in list(ready):
+                    if manager.warmed_at is None or now - manager.warmed_at > self.max_idle_seconds:
+                        ready.remove(manager)
+                        manager.close()
+            self._refill()
+
+    async def start(self):
+        """Start filling the pool in the background."""
+        self.loop = asyncio.get_running_loop()
+        self._refill()
+        self._maintenance_task = asyncio.create_task(self._maintain())
+
+    async def acquire(self, audio_format: AudioFormat = LEGACY_AUDIO_FORMAT, **bindings) -> SpeechRecognitionManager:
+        """
+        Take a ready manager bound to the given per-utterance state.
+
+        If the pool is empty, one is built and connected in a worker thread
+        instead, so the event loop never waits for it. Once a push stream
+        format has been requested, the pool keeps managers of that format
+        ready too.
+
+        Args:
+            audio_format: Format the client sends audio in
+            **bindings: Keyword arguments for SpeechRecognitionManager.bind
+
+        Returns:
+            SpeechRecognitionManager: A manager ready for start_recognition
+        """
+        stream_format = audio_format.stream_format()
+        ready = self._ready.setdefault(stream_format, deque())
+        self._pending.setdefault(stream_format, 0)
+        if ready:
+            manager = ready.popleft()
+            self._refill()
+        else:
+            logger.info(f"Speech recognizer pool has no {stream_format} manager, building one now")
+            self._refill()
+            manager = await asyncio.to_thread(self._build, stream_format)
+        return manager.bind(audio_format=audio_format, **bindings)
+
+    async def close(self):
+        """Stop maintenance and release the idle managers."""
+        if self._maintenance_task:
+            self._maintenance_task.cancel()
+        for ready in self._ready.values():
+            while ready:
+                ready.popleft().close()
+
+
+class UtteranceRecognition:
+    """
+    Speech recognition of one utterance, started in the background.
+
+    Taking a manager from the pool may mean building one, and the previous
+    utterance's recognizer may still be stopping, so recognition is started
+    by a task of its own. Audio that arrives before it has started is
+    buffered and pushed as soon as it has, so the websocket receive loop
+    never waits for either.
+    """
+
+    def __init__(self, pool: SpeechRecognizerPool, audio_format: AudioFormat = LEGACY_AUDIO_FORMAT,
+                 after: Optional[asyncio.Event] = None, **bindings):
+        """
+        Start recognition in the background.
+
+        Args:
+            pool: Pool the manager is taken from
+            audio_format: Format the client sends audio in
+            after: Event to wait for before starting, e.g. set once the
+                previous utterance's recognizer has stopped
+            **bindings: Keyword arguments for SpeechRecognitionManager.bind
+        """
+        self.manager: Optional[SpeechRecognitionManager] = None
+        self._pending: List[bytes] = []
+        self._start_task = asyncio.create_task(self._start(pool, audio_format, after, bindings))
+
+    async def _start(self, pool: SpeechRecognizerPool, audio_format: AudioFormat,
+                     after: Optional[asyncio.Event], bindings: dict) -> SpeechRecognitionManager:
+        if after is not None:
+            await after.wait()
+        manager = await pool.acquire(audio_format=audio_format, **bindings)
+        manager.start_recognition()
+        for chunk in self._pending:
+            manager.process_audio_chunk(chunk)
+        self._pending.clear()
+        self.manager = manager
+        return manager
+
+    def process_audio_chunk(self, audio_chunk: bytes):
+        """Push an audio chunk, or buffer it until recognition has started."""
+        if self.manager is None:
+            self._pending.append(audio_chunk)
+        else:
+            self.manager.process_audio_chunk(audio_chunk)
+
+    @property
+    def end_of_utterance_detected(self) -> bool:
+        return bool(self.manager and self.manager.end_of_utterance_detected)
+
+    async def stop(self):
+        """Wait for recognition to start, then stop it; recognition_done_event is set once the session stops."""
+        manager = await self._start_task
+        manager.stop_recognition()
+
+    def get_audio_stats(self) -> dict:
+        return self.manager.get_audio_stats() if self.manager else {}
+
+    def close(self):
+        """Cancel a start still in progress and release the manager."""
+        if not self._start_task.done():
+            self._start_task.cancel()
+        if self.manager:
+            self.manager.close()
 
 
 # Helper function to create a speech recognition manager
@@ -157,7 +519,8 @@ def create_speech_manager(
     message_callback=None, 
     recognition_done_event=None,
     transcription_result=None,
-    output_websocket=None
+    output=None,
+    segment_callback=None
 ):
     """
     Create and return a new speech recognition manager.
@@ -166,7 +529,8 @@ def create_speech_manager(
         message_callback: (Legacy) Function to call with recognition messages
         recognition_done_event: Optional event to signal recognition completion
         transcription_result: Optional TranscriptionResult object to update
-        output_websocket: Optional WebSocket to send transcription updates to
+        output: Optional OutputBroadcaster to publish transcription updates to
+        segment_callback: Optional callback for speculating on the transcription so far
         
     Returns:
         SpeechRecognitionManager: Configured speech recognition manager
@@ -175,5 +539,6 @@ def create_speech_manager(
         message_callback=message_callback,
         recognition_done_event=recognition_done_event,
         transcription_result=transcription_result,
-        output_websocket=output_websocket
+        output=output,
+        segment_callback=segment_callback
     ) 
\ No newline at end of file
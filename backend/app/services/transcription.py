@@ -1,9 +1,8 @@
 from fastapi import WebSocket, WebSocketDisconnect
 import asyncio
 import logging
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
-from fastapi.websockets import WebSocketState
 from app.config import settings
 from app.services.pinecone_assistant import PineconeAssistant
 from app.services.speech_recognition import create_speech_manager
@@ -47,28 +46,29 @@ async def send_messages(websocket, message_queue, transcription_result):
 
 async def process_with_pinecone_assistant_text_only(
     question: str,
-    pinecone_assistant: PineconeAssistant
+    pinecone_assistant: PineconeAssistant,
+    context_results: Optional[List[Dict[str, Any]]] = None
 ) -> None:
     """
-    Process the user question with the Pinecone assistant and send text responses
-    directly to the output websocket for teleprompter-style display.
+    Process the user question with the Pinecone assistant and publish text responses
+    to the output websocket clients for teleprompter-style display.
     
-    The output websocket is obtained from app.state.output_websocket.
+    The output broadcaster is obtained from app.state.output_broadcaster.
+    Pass context_results to skip retrieval when it was already done speculatively.
     """
     try:
-        # Get the output websocket from app state via the assistant
-        output_websocket = pinecone_assistant.get_output_websocket()
-        if not output_websocket:
+        # Get the output broadcaster from app state via the assistant
+        output = pinecone_assistant.get_output()
+        if not output or not output.has_subscribers:
             logger.error("No output websocket available")
             return
             
-        # Create a custom handler that sends text directly to the websocket
+        # Create a custom handler that publishes text to the output websocket clients
         class WebSocketTextHandler(AssistantEventHandler):
-            def __init__(self, websocket):
+            def __init__(self, output):
                 super().__init__()
-                self.websocket = websocket
+                self.output = output
                 self.current_text = ""
-                self.is_connection_open = True
                 
             @override
             def on_text_created(self, text) -> None:
@@ -76,38 +76,25 @@ async def process_with_pinecone_assistant_text_only(
             
             @override
             def on_text_delta(self, delta: TextDelta, snapshot: Text) -> None:
-                # Send each piece of text as it comes in
-                if delta.value and self.is_connection_open:
-                    # Create a task to send the text without blocking
-                    asyncio.create_task(self._safe_send_json({
+                # Publish each piece of text as it comes in; queuing never blocks
+                if delta.value:
+                    self.output.publish({
                         "type": "text_delta",
                         "text": delta.value
-                    }))
+                    })
             
             @override
             def on_message_done(self, message) -> None:
                 # Signal that we're done
-                if self.is_connection_open:
-                    asyncio.create_task(self._safe_send_json({
-                        "type": "text_complete"
-                    }))
-            
-            async def _safe_send_json(self, data: dict) -> None:
-                try:
-                    if self.websocket.client_state == WebSocketState.CONNECTED:
-                        await self.websocket.send_json(data)
-                except RuntimeError as e:
-                    logger.error(f"WebSocket error: {e}")
-                    self.is_connection_open = False
-                except Exception as e:
-                    logger.error(f"Error sending WebSocket message: {e}")
-                    self.is_connection_open = False
+                self.output.publish({
+                    "type": "text_complete"
+                })
         
-        # Create the handler with the output websocket
-        handler = WebSocketTextHandler(output_websocket)
+        # Create the handler with the output broadcaster
+        handler = WebSocketTextHandler(output)
         
         # Send message to client that we're starting to process
-        await output_websocket.send_json({
+        output.publish({
             "type": "processing_start",
             "message": "Processing your question..."
         })
@@ -116,21 +103,19 @@ async def process_with_pinecone_assistant_text_only(
         await pinecone_assistant.ask_and_stream_response(
             question,
             handler=handler,
-            thread_id=None  # Not used with completions API
+            thread_id=None,  # Not used with completions API
+            context_results=context_results
         )
         
     except Exception as e:
         logger.error(f"Error processing with Pinecone assistant (text only): {e}", exc_info=True)
-        # Send error message to the client if output websocket is available
-        try:
-            output_websocket = pinecone_assistant.get_output_websocket()
-            if output_websocket and output_websocket.client_state == WebSocketState.CONNECTED:
-                await output_websocket.send_json({
-                    "type": "error",
-                    "message": f"Error: {str(e)}"
-                })
-        except Exception as ws_error:
-            logger.error(f"Failed to send error to websocket: {ws_error}")
+        # Send error message to the output websocket clients
+        output = pinecone_assistant.get_output()
+        if output:
+            output.publish({
+                "type": "error",
+                "message": f"Error: {str(e)}"
+            })
 
 async def websocket_transcribe(websocket: WebSocket, pinecone_assistant: PineconeAssistant):
     await websocket.accept()
@@ -140,8 +125,8 @@ async def websocket_transcribe(websocket: WebSocket, pinecone_assistant: Pinecon
     message_queue = asyncio.Queue()
     transcription_result = TranscriptionResult()
 
-    # Get output websocket if available (for backwards compatibility)
-    output_websocket = pinecone_assistant.get_output_websocket()
+    # Get the output broadcaster if available (for backwards compatibility)
+    output = pinecone_assistant.get_output()
 
     # Create a message callback that puts messages on the queue
     def message_callback(message):
@@ -152,7 +137,7 @@ async def websocket_transcribe(websocket: WebSocket, pinecone_assistant: Pinecon
         message_callback=message_callback,  # Keep the message callback for this endpoint
         recognition_done_event=recognition_done,
         transcription_result=transcription_result,
-        output_websocket=output_websocket  # Also use the output websocket if available
+        output=output  # Also publish to the output websocket clients if available
     )
 
     # Start sending partial/final transcription messages
@@ -186,15 +171,12 @@ async def websocket_transcribe(websocket: WebSocket, pinecone_assistant: Pinecon
                         logger.info(f"Complete transcription text: {complete_text[:50]}...")
                         await websocket.send_text(f"COMPLETE_TRANSCRIPTION: {complete_text}")
 
-                        # Send to output websocket if available
-                        if output_websocket:
-                            try:
-                                await output_websocket.send_json({
-                                    "type": "complete_transcription",
-                                    "data": complete_text
-                                })
-                            except Exception as e:
-                                logger.error(f"Error sending complete transcription to output websocket: {e}")
+                        # Publish to the output websocket clients if available
+                        if output:
+                            output.publish({
+                                "type": "complete_transcription",
+                                "data": complete_text
+                            })
 
                         # Process with Pinecone assistant if available
                         if pinecone_assistant and complete_text.strip():
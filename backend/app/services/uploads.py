@@ -0,0 +1,204 @@
+import os
+import codecs
+import asyncio
+import hashlib
+import logging
+import tempfile
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import UploadFile
+
+from app.services.chunking import StreamingChunker, TokenChunker
+
+logger = logging.getLogger(__name__)
+
+# Files that can be chunked while they are still being uploaded
+STREAM_CHUNKED_EXTENSIONS = {".txt", ".md", ".csv", ".json", ".html", ".htm", ".xml", ".rst"}
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size limit."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds the {limit} byte limit")
+        self.limit = limit
+
+
+class StreamingUpload:
+    """
+    Writes an upload to disk block by block.
+
+    Every block is written (and hashed, and for text files chunked) in a
+    worker thread before the next block is read, so memory use is bounded
+    by the block size and a fast client is throttled to the disk's pace.
+    The data goes to a temporary file in a hidden `.uploads` directory next
+    to the destination and is renamed into place only once it is complete,
+    so partial uploads never show up as knowledge files.
+    """
+
+    def __init__(self, destination: str, max_bytes: int, chunker: Optional[TokenChunker] = None):
+        """
+        Initialize the upload.
+
+        Args:
+            destination: Final path of the uploaded file
+            max_bytes: Maximum upload size in bytes
+            chunker: If given, text is decoded and chunked as it arrives
+        """
+        self.destination = destination
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._digest = hashlib.sha256()
+        staging_dir = os.path.join(os.path.dirname(destination), ".uploads")
+        os.makedirs(staging_dir, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=staging_dir, suffix=".part")
+        self._file = os.fdopen(fd, "wb")
+
+        self._stream: Optional[StreamingChunker] = None
+        self._decoder = None
+        self._pieces: List[Dict[str, Any]] = []
+        if chunker is not None:
+            self._stream = StreamingChunker(chunker, separator="")
+            self._decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def _feed_chunker(self, block: bytes, final: bool = False):
+        """Decode and chunk a block; gives up on chunking if the file isn't UTF-8."""
+        if self._stream is None:
+            return
+        try:
+            text = self._decoder.decode(block, final=final)
+        except UnicodeDecodeError:
+            # Ingestion re-reads the file with its encoding fallback instead
+            self._stream = None
+            self._pieces = []
+            return
+        if text:
+            self._pieces.extend(self._stream.feed(text))
+
+    def _write_block(self, block: bytes):
+        self._file.write(block)
+        self._digest.update(block)
+        self._feed_chunker(block)
+
+    async def write(self, block: bytes):
+        """
+        Append a block of data.
+
+        Args:
+            block: The next bytes of the upload
+
+        Raises:
+            UploadTooLarge: If the upload grows beyond max_bytes
+        """
+        self.size += len(block)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(self.max_bytes)
+        await asyncio.to_thread(self._write_block, block)
+
+    def _finish(self) -> Optional[List[Dict[str, Any]]]:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp_path, self.destination)
+        self._feed_chunker(b"", final=True)
+        if self._stream is None:
+            return None
+        return self._pieces + self._stream.finish()
+
+    async def commit(self) -> Dict[str, Any]:
+        """
+        Move the completed upload into place.
+
+        Returns:
+            Dictionary with the path, size, SHA-256 hex digest and, for
+            text uploads that decoded cleanly, the chunker pieces
+        """
+        pieces = await asyncio.to_thread(self._finish)
+        return {
+            "path": self.destination,
+            "size": self.size,
+            "sha256": self._digest.hexdigest(),
+            "pieces": pieces
+        }
+
+    async def abort(self):
+        """Discard a partial upload."""
+        def discard():
+            self._file.close()
+            if os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
+
+        await asyncio.to_thread(discard)
+
+
+async def save_upload(blocks: AsyncIterator[bytes], destination: str, max_bytes: int,
+                      block_size: int = 1024 * 1024,
+                      chunker: Optional[TokenChunker] = None) -> Dict[str, Any]:
+    """
+    Stream an upload to disk, hashing it (and optionally chunking it) on the way.
+
+    Incoming data is regrouped into block_size writes, whatever sizes the
+    network delivers it in.
+
+    Args:
+        blocks: Async iterator over the uploaded bytes
+        destination: Final path of the uploaded file
+        max_bytes: Maximum upload size in bytes
+        block_size: Bytes per disk write
+        chunker: If given and the file is UTF-8 text, chunk it while it arrives
+
+    Returns:
+        Dictionary with path, size, sha256 and pieces (see StreamingUpload.commit)
+
+    Raises:
+        UploadTooLarge: If the upload exceeds max_bytes
+    """
+    upload = StreamingUpload(destination, max_bytes, chunker)
+    pending = bytearray()
+    try:
+        async for data in blocks:
+            pending += data
+            if upload.size + len(pending) > max_bytes:
+                raise UploadTooLarge(max_bytes)
+            while len(pending) >= block_size:
+                await upload.write(bytes(pending[:block_size]))
+                del pending[:block_size]
+        if pending:
+            await upload.write(bytes(pending))
+        result = await upload.commit()
+    except BaseException:
+        await upload.abort()
+        raise
+    logger.info(f"Saved upload {os.path.basename(destination)} ({result['size']} bytes)")
+    return result
+
+
+async def iter_upload_file(file: UploadFile, block_size: int) -> AsyncIterator[bytes]:
+    """
+    Read a multipart UploadFile in fixed-size blocks.
+
+    Args:
+        file: The uploaded file
+        block_size: Bytes per block
+
+    Yields:
+        Blocks of the file
+    """
+    while True:
+        block = await file.read(block_size)
+        if not block:
+            break
+        yield block
+
+
+def safe_filename(filename: str) -> str:
+    """
+    Reduce a client-supplied filename to a plain file name.
+
+    Raises:
+        ValueError: If nothing usable is left
+    """
+    name = os.path.basename(filename.replace("\\", "/")).strip()
+    if not name or name.startswith("."):
+        raise ValueError(f"Invalid filename: {filename!r}")
+    return name
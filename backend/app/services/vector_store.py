@@ -0,0 +1,695 @@
+import os
+import glob
+import json
+import random
+import logging
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+import asyncio
+
+from openai import OpenAI
+
+from app.config import settings
+from app.services.chunking import StreamingChunker, TokenChunker, count_tokens
+from app.services.embedding_cache import EmbeddingCache
+from app.services.extraction import PAGED_EXTENSIONS, DocumentExtractor, read_text_file
+from app.services.ingestion_manifest import IngestionManifest, hash_file, hash_text
+from app.services.metrics import span
+
+logger = logging.getLogger(__name__)
+
+
+class BaseVectorStore(ABC):
+    """
+    Shared document ingestion and retrieval logic for vector store backends.
+
+    Handles reading, chunking and embedding documents, the ingestion manifest
+    and the embedding cache. Backends implement the abstract index operations:
+    _upsert_vectors, _delete_vector_ids, _query_vector and _find_file_vector_ids.
+    """
+
+    def __init__(self, manifest_path: str):
+        """
+        Initialize the shared vector store state.
+
+        Args:
+            manifest_path: Path to this backend's ingestion manifest
+        """
+        self.openai_client = OpenAI(api_key=settings.openai_api_key)
+        self.embedding_model = "text-embedding-3-small"
+        self.embedding_dimensions = 1536  # Dimensions for text-embedding-3-small
+        self.chunk_size = 1000  # Maximum tokens per chunk
+        self.chunk_overlap = 200  # Tokens shared by consecutive chunks
+        self.chunker = TokenChunker(self.chunk_size, self.chunk_overlap)
+        self.extractor = DocumentExtractor(
+            max_workers=settings.extraction_max_workers,
+            pages_per_task=settings.extraction_pages_per_task
+        )
+        self.embedding_batch_max_tokens = settings.embedding_batch_max_tokens
+        self.embedding_batch_max_inputs = settings.embedding_batch_max_inputs
+        self.embedding_max_concurrency = settings.embedding_max_concurrency
+        self.upsert_batch_size = 1000  # Most vectors per upsert call
+        self.upsert_batch_max_bytes = settings.upsert_batch_max_bytes
+        self.retry_attempts = settings.index_retry_attempts
+        self.retry_base_delay = settings.index_retry_base_delay
+        # Ingestion stage limits, shared by every file being processed
+        self.stage_limits = {
+            "extract": asyncio.Semaphore(settings.ingestion_extract_concurrency),
+            "chunk": asyncio.Semaphore(settings.ingestion_chunk_concurrency),
+            "embed": asyncio.Semaphore(self.embedding_max_concurrency),
+            "upsert": asyncio.Semaphore(settings.ingestion_upsert_concurrency)
+        }
+        self.manifest = IngestionManifest(manifest_path)
+        self.embedding_cache = None
+        if settings.embedding_cache_enabled and settings.embedding_cache_max_entries > 0:
+            self.embedding_cache = EmbeddingCache(
+                os.path.join(os.getcwd(), settings.index_data_dir, "embeddings",
+                             f"{self.embedding_model}-{self.embedding_dimensions}"),
+                model=self.embedding_model,
+                dimensions=self.embedding_dimensions,
+                max_entries=settings.embedding_cache_max_entries
+            )
+
+    @abstractmethod
+    async def _upsert_vectors(self, vectors: List[Dict[str, Any]]) -> None:
+        """
+        Upsert a batch of vector records into the index.
+
+        Args:
+            vectors: Vector records with id, values and metadata
+        """
+
+    @abstractmethod
+    async def _delete_vector_ids(self, vector_ids: List[str]) -> None:
+        """
+        Delete vectors from the index by ID.
+
+        Args:
+            vector_ids: IDs of the vectors to delete
+        """
+
+    @abstractmethod
+    async def _query_vector(self, vector: List[float], top_k: int) -> List[Dict[str, Any]]:
+        """
+        Find the vectors most similar to a query vector.
+
+        Args:
+            vector: The query embedding
+            top_k: Number of results to return
+
+        Returns:
+            List of matches with score, text, source and chunk_id
+        """
+
+    @abstractmethod
+    async def _find_file_vector_ids(self, filename: str) -> List[str]:
+        """
+        Find the IDs of all vectors that came from a file by searching the index.
+
+        Only used for files missing from the ingestion manifest.
+
+        Args:
+            filename: The source filename
+
+        Returns:
+            List of vector IDs
+        """
+
+    def _is_transient_error(self, error: Exception) -> bool:
+        """
+        Decide whether a failed index request is worth retrying.
+
+        Args:
+            error: The exception raised by the request
+
+        Returns:
+            True for rate limiting, server errors and connection problems
+        """
+        status = getattr(error, "status", None) or getattr(error, "status_code", None)
+        if isinstance(status, int):
+            return status == 429 or status >= 500
+        return isinstance(error, (ConnectionError, TimeoutError))
+
+    async def _with_retries(self, operation: Callable[[], Awaitable[Any]], description: str) -> Any:
+        """
+        Run an index request, retrying transient failures with exponential backoff.
+
+        Args:
+            operation: Coroutine function performing the request
+            description: What the request does, for log messages
+
+        Returns:
+            The result of the operation
+        """
+        for attempt in range(1, self.retry_attempts + 1):
+            try:
+                return await operation()
+            except Exception as e:
+                if attempt == self.retry_attempts or not self._is_transient_error(e):
+                    raise
+                # Full jitter keeps parallel uploads from retrying in lockstep
+                delay = random.uniform(0, self.retry_base_delay * 2 ** (attempt - 1))
+                logger.warning(f"{description} failed ({e}); retrying in {delay:.2f}s "
+                               f"(attempt {attempt}/{self.retry_attempts})")
+                await asyncio.sleep(delay)
+
+    def _vector_payload_bytes(self, vector: Dict[str, Any]) -> int:
+        """Estimate the request bytes a vector record adds to an upsert (JSON encoded)."""
+        return (len(vector["id"]) + len(json.dumps(vector["metadata"]))
+                + 20 * len(vector["values"]) + 64)
+
+    def _get_token_count(self, text: str) -> int:
+        """
+        Count the number of tokens in a text string.
+
+        Args:
+            text: The text to count tokens for
+
+        Returns:
+            Number of tokens
+        """
+        return count_tokens(text)
+
+    @staticmethod
+    def _to_chunk(piece: Dict[str, Any], filename: str, index: int) -> Dict[str, Any]:
+        """Wrap a chunker piece in a chunk dictionary with metadata."""
+        metadata = {"source": filename, "chunk_id": str(index)}
+        if "page_start" in piece:
+            metadata["page_start"] = piece["page_start"]
+            metadata["page_end"] = piece["page_end"]
+        return {"text": piece["text"], "token_count": piece["token_count"], "metadata": metadata}
+
+    def _chunk_text(self, text: str, filename: str) -> List[Dict[str, Any]]:
+        """
+        Split text into chunks with metadata.
+
+        Args:
+            text: The text to chunk
+            filename: The source filename for metadata
+
+        Returns:
+            List of chunk dictionaries with text, token count and metadata
+        """
+        return [self._to_chunk(piece, filename, index)
+                for index, piece in enumerate(self.chunker.chunk(text))]
+
+    async def _chunk_paged_file(self, file_path: str, filename: str) -> List[Dict[str, Any]]:
+        """
+        Extract a paged document in worker processes and chunk pages as they arrive.
+
+        Args:
+            file_path: Path to the document
+            filename: The source filename for metadata
+
+        Returns:
+            List of chunk dictionaries with text, token count and metadata
+            including the page range of each chunk
+        """
+        stream = StreamingChunker(self.chunker)
+        pieces = []
+        async with self.stage_limits["extract"]:
+            async for page_number, page_text in self.extractor.iter_pdf_pages(file_path):
+                pieces.extend(await asyncio.to_thread(stream.feed, page_text, page_number))
+            pieces.extend(await asyncio.to_thread(stream.finish))
+        return [self._to_chunk(piece, filename, index) for index, piece in enumerate(pieces)]
+
+    async def _get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Get embeddings for several texts with a single OpenAI embeddings request.
+
+        Texts found in the embedding cache are not sent to the API.
+
+        Args:
+            texts: The texts to embed
+
+        Returns:
+            Embedding vectors in the same order as the input texts
+        """
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        missing = []
+        for i, text in enumerate(texts):
+            cached = self.embedding_cache.get(text) if self.embedding_cache else None
+            if cached is not None:
+                embeddings[i] = cached.tolist()
+            else:
+                missing.append(i)
+
+        if not missing:
+            return embeddings
+
+        try:
+            # Use asyncio.to_thread to run the synchronous OpenAI call in a thread
+            response = await asyncio.to_thread(
+                lambda: self.openai_client.embeddings.create(
+                    model=self.embedding_model,
+                    input=[texts[i] for i in missing]
+                )
+            )
+            # The API does not guarantee ordering, so sort by input index
+            for item in sorted(response.data, key=lambda item: item.index):
+                i = missing[item.index]
+                embeddings[i] = item.embedding
+                if self.embedding_cache:
+                    self.embedding_cache.put(texts[i], item.embedding)
+            return embeddings
+        except Exception as e:
+            logger.error(f"Error getting embeddings: {e}", exc_info=True)
+            raise
+
+    async def _get_embedding(self, text: str) -> List[float]:
+        """
+        Get embedding for a text using OpenAI's embedding API.
+
+        Args:
+            text: The text to embed
+
+        Returns:
+            Embedding vector
+        """
+        embeddings = await self._get_embeddings([text])
+        return embeddings[0]
+
+    def _batch_chunks(self, chunks: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Pack chunks into embedding request batches bounded by a token budget.
+
+        Args:
+            chunks: Chunk dictionaries as produced by _chunk_text
+
+        Returns:
+            List of chunk batches, each small enough for one embeddings request
+        """
+        batches = []
+        current_batch = []
+        current_tokens = 0
+
+        for chunk in chunks:
+            chunk_tokens = chunk["token_count"]
+            if current_batch and (
+                current_tokens + chunk_tokens > self.embedding_batch_max_tokens
+                or len(current_batch) >= self.embedding_batch_max_inputs
+            ):
+                batches.append(current_batch)
+                current_batch = []
+                current_tokens = 0
+            current_batch.append(chunk)
+            current_tokens += chunk_tokens
+
+        if current_batch:
+            batches.append(current_batch)
+
+        return batches
+
+    async def _embed_and_upsert(self, chunks: List[Dict[str, Any]], filename: str,
+                                progress: Optional[Callable[..., None]] = None) -> int:
+        """
+        Embed chunks in batched, concurrent requests and upsert the results.
+
+        Embedding batches run up to embedding_max_concurrency at a time (across
+        all files being ingested) and each finished batch is handed straight to
+        the upsert stage, so upserts overlap with the embedding requests still
+        in flight.
+
+        Args:
+            chunks: Chunk dictionaries as produced by _chunk_text
+            filename: The source filename
+            progress: Optional callback, called with the number of vectors
+                      upserted so far after every upsert
+
+        Returns:
+            Number of vectors upserted
+        """
+        upsert_queue: asyncio.Queue = asyncio.Queue()
+
+        async def embed_batch(batch: List[Dict[str, Any]]) -> None:
+            async with self.stage_limits["embed"]:
+                embeddings = await self._get_embeddings([chunk["text"] for chunk in batch])
+
+            for chunk, embedding in zip(batch, embeddings):
+                await upsert_queue.put({
+                    "id": chunk["id"],
+                    "values": embedding,
+                    "metadata": {
+                        "text": chunk["text"],
+                        **chunk["metadata"]
+                    }
+                })
+
+        upserted = 0
+
+        async def upsert_batch(vectors: List[Dict[str, Any]]) -> None:
+            nonlocal upserted
+            async with self.stage_limits["upsert"]:
+                await self._with_retries(lambda: self._upsert_vectors(vectors),
+                                         f"Upsert of {len(vectors)} vectors for {filename}")
+            upserted += len(vectors)
+            if progress:
+                progress(upserted)
+
+        async def upsert_worker() -> int:
+            # Batches are sized by payload bytes since the metadata carries the chunk text
+            max_in_flight = 2 * settings.ingestion_upsert_concurrency
+            in_flight = set()
+            batch, batch_bytes = [], 0
+            try:
+                while True:
+                    vector_record = await upsert_queue.get()
+                    if vector_record is not None:
+                        record_bytes = self._vector_payload_bytes(vector_record)
+                        if batch and (batch_bytes + record_bytes > self.upsert_batch_max_bytes
+                                      or len(batch) >= self.upsert_batch_size):
+                            in_flight.add(asyncio.create_task(upsert_batch(batch)))
+                            batch, batch_bytes = [], 0
+                        batch.append(vector_record)
+                        batch_bytes += record_bytes
+                    elif batch:
+                        in_flight.add(asyncio.create_task(upsert_batch(batch)))
+
+                    # Surface failures early and stop reading ahead of the upserts
+                    while in_flight and (len(in_flight) >= max_in_flight or vector_record is None):
+                        done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            task.result()
+
+                    if vector_record is None:
+                        return upserted
+            except BaseException:
+                for task in in_flight:
+                    task.cancel()
+                raise
+
+        upsert_task = asyncio.create_task(upsert_worker())
+        embed_tasks = [asyncio.create_task(embed_batch(batch))
+                       for batch in self._batch_chunks(chunks)]
+        try:
+            await asyncio.gather(*embed_tasks)
+        except BaseException:
+            for task in embed_tasks:
+                task.cancel()
+            upsert_task.cancel()
+            raise
+
+        # Signal the upsert worker that no more vectors are coming
+        await upsert_queue.put(None)
+        return await upsert_task
+
+    async def upload_file(self, file_path: str, content_hash: Optional[str] = None,
+                          pieces: Optional[List[Dict[str, Any]]] = None,
+                          progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+        """
+        Process a file, chunk it, and upload it to the vector store.
+
+        Args:
+            file_path: Path to the file to process
+            content_hash: SHA-256 of the file if already known (e.g. computed
+                          while it was uploaded)
+            pieces: Chunker output for the file if it was chunked already
+            progress: Optional callback, called as progress(stage, **details)
+                      when the file enters a stage (extracting, embedding,
+                      deleting) and as vectors are upserted
+
+        Returns:
+            Dictionary with upload statistics
+        """
+        try:
+            # Get filename for metadata
+            filename = os.path.basename(file_path)
+            file_extension = os.path.splitext(filename)[1].lower()
+
+            # Skip files whose content hasn't changed since the last ingestion
+            if content_hash is None:
+                content_hash = await asyncio.to_thread(hash_file, file_path)
+            manifest_entry = self.manifest.get_file(filename)
+            if manifest_entry and manifest_entry["content_hash"] == content_hash:
+                logger.info(f"File {filename} is unchanged, skipping")
+                return {
+                    "status": "success",
+                    "file": filename,
+                    "unchanged": True,
+                    "chunks_processed": 0
+                }
+
+            def report(stage: str, **details):
+                if progress:
+                    progress(stage, **details)
+
+            # Extract and chunk the text off the event loop
+            report("extracting")
+            if pieces is not None:
+                chunks = [self._to_chunk(piece, filename, index) for index, piece in enumerate(pieces)]
+            elif file_extension in PAGED_EXTENSIONS:
+                chunks = await self._chunk_paged_file(file_path, filename)
+            else:
+                try:
+                    content = await asyncio.to_thread(read_text_file, file_path)
+                except Exception as e:
+                    logger.error(f"Error reading file {filename}: {e}")
+                    return {
+                        "status": "error",
+                        "file": filename,
+                        "error": f"Unable to read file: {str(e)}"
+                    }
+                async with self.stage_limits["chunk"]:
+                    chunks = await asyncio.to_thread(self._chunk_text, content, filename)
+
+            # Skip empty content
+            if not chunks:
+                logger.warning(
+                    f"File {filename} is empty or contains no extractable text.")
+                # Drop whatever an earlier version of this file contributed
+                if manifest_entry:
+                    await self.delete_file_vectors(filename)
+                return {
+                    "status": "warning",
+                    "file": filename,
+                    "error": "File is empty or contains no extractable text."
+                }
+            logger.info(f"Created {len(chunks)} chunks from {filename}")
+
+            # Vectors indexed before the manifest existed can't be diffed, so clear them
+            if manifest_entry is None:
+                await self.delete_file_vectors(filename)
+
+            # Diff chunk hashes against the manifest
+            previous_chunks = self.manifest.get_chunk_ids(filename)
+            current_chunks = {}
+            new_chunks = []
+            for chunk in chunks:
+                chunk_hash = hash_text(chunk["text"])
+                if chunk_hash in current_chunks:
+                    continue  # Identical chunk already indexed for this file
+                if chunk_hash in previous_chunks:
+                    current_chunks[chunk_hash] = previous_chunks[chunk_hash]
+                    continue
+                chunk["id"] = f"{filename}#{chunk_hash[:32]}"
+                current_chunks[chunk_hash] = chunk["id"]
+                new_chunks.append(chunk)
+
+            stale_ids = [vector_id for chunk_hash, vector_id in previous_chunks.items()
+                         if chunk_hash not in current_chunks]
+
+            # Embed in batched, concurrent requests and upsert as batches finish
+            report("embedding", chunks_total=len(chunks), chunks_new=len(new_chunks), chunks_upserted=0)
+            await self._embed_and_upsert(
+                new_chunks, filename,
+                progress=lambda upserted: report("embedding", chunks_upserted=upserted)
+            )
+
+            if stale_ids:
+                report("deleting", chunks_deleted=len(stale_ids))
+                await self._delete_vector_ids(stale_ids)
+                logger.info(f"Deleted {len(stale_ids)} stale vectors for {filename}")
+
+            self.manifest.set_file(filename, content_hash, current_chunks)
+            await self.manifest.save()
+            if self.embedding_cache:
+                await asyncio.to_thread(self.embedding_cache.flush)
+
+            return {
+                "status": "success",
+                "file": filename,
+                "chunks_processed": len(chunks),
+                "chunks_embedded": len(new_chunks),
+                "chunks_deleted": len(stale_ids)
+            }
+
+        except Exception as e:
+            logger.error(
+                f"Error uploading file {file_path}: {e}", exc_info=True)
+            return {
+                "status": "error",
+                "file": os.path.basename(file_path),
+                "error": str(e)
+            }
+
+    async def upload_knowledge_directory(self, directory_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Upload all files from a directory to the vector store.
+
+        Args:
+            directory_path: Path to directory containing knowledge files.
+                           If None, uses the default 'knowledge' directory.
+
+        Returns:
+            Dictionary with upload statistics
+        """
+        if directory_path is None:
+            directory_path = os.path.join(os.getcwd(), "knowledge")
+
+        file_paths = glob.glob(os.path.join(directory_path, "*"))
+
+        if not file_paths:
+            raise ValueError(
+                f"No files found in the directory: {directory_path}")
+
+        logger.info(
+            f"Uploading {len(file_paths)} files from '{directory_path}' to the vector store")
+
+        # Process several files at once; the stage limits bound the shared work
+        semaphore = asyncio.Semaphore(settings.ingestion_workers)
+
+        async def upload(file_path: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.upload_file(file_path)
+
+        results = await asyncio.gather(*(upload(file_path) for file_path in file_paths))
+
+        # Remove vectors for files that have disappeared from the directory
+        present_files = {os.path.basename(file_path) for file_path in file_paths}
+        for filename in self.manifest.filenames():
+            if filename not in present_files:
+                logger.info(f"File {filename} no longer exists, deleting its vectors")
+                await self.delete_file_vectors(filename)
+
+        success_count = sum(1 for r in results if r["status"] == "success")
+
+        return {
+            "status": "completed",
+            "total_files": len(file_paths),
+            "successful_uploads": success_count,
+            "failed_uploads": len(file_paths) - success_count,
+            "details": results
+        }
+
+    async def embed_query(self, query_text: str) -> List[float]:
+        """
+        Embed a query text, e.g. to use the embedding before querying with it.
+
+        Args:
+            query_text: The query text
+
+        Returns:
+            Embedding vector
+        """
+        with span("embedding"):
+            return await self._get_embedding(query_text)
+
+    async def embed_queries(self, query_texts: List[str]) -> List[List[float]]:
+        """
+        Embed several query texts with as few requests as possible.
+
+        Args:
+            query_texts: The query texts
+
+        Returns:
+            Embedding vectors in the same order as the input texts
+        """
+        return await self._get_embeddings(query_texts)
+
+    async def query(self, query_text: str, top_k: int = 5,
+                    query_embedding: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+        """
+        Query the vector store for similar documents.
+
+        Args:
+            query_text: The query text
+            top_k: Number of results to return
+            query_embedding: Embedding of query_text if already computed
+
+        Returns:
+            List of matching documents with similarity scores
+        """
+        try:
+            # Get embedding for query
+            if query_embedding is None:
+                with span("embedding"):
+                    query_embedding = await self._get_embedding(query_text)
+            with span("retrieval"):
+                return await self._query_vector(query_embedding, top_k)
+
+        except Exception as e:
+            logger.error(f"Error querying vector store: {e}", exc_info=True)
+            raise
+
+    def knowledge_version(self) -> str:
+        """Return a hash that changes whenever the ingested knowledge files change."""
+        return self.manifest.version()
+
+    async def delete_file_vectors(self, filename: str) -> Dict[str, Any]:
+        """
+        Delete all vector embeddings associated with a specific file.
+
+        The vector IDs come from the ingestion manifest, which records every
+        chunk indexed for a file, so no index lookup is needed. Files the
+        manifest doesn't know (indexed before it existed) are looked up in
+        the index instead.
+
+        Args:
+            filename: Name of the file whose vectors should be deleted
+            
+        Returns:
+            Dictionary with deletion statistics
+        """
+        try:
+            if self.manifest.get_file(filename) is not None:
+                vector_ids = list(self.manifest.get_chunk_ids(filename).values())
+            else:
+                vector_ids = await self._find_file_vector_ids(filename)
+
+            if vector_ids:
+                await self._delete_vector_ids(vector_ids)
+
+            # Forget the file only once its vectors are gone, so a failed
+            # delete can be retried from the same registry entry
+            if self.manifest.remove_file(filename) is not None:
+                await self.manifest.save()
+            
+            if not vector_ids:
+                logger.info(f"No vectors found for file '{filename}'")
+                return {
+                    "deleted": False,
+                    "message": f"No vectors found for file '{filename}'",
+                    "count": 0
+                }
+                
+            logger.info(f"Deleted {len(vector_ids)} vectors for file '{filename}'")
+            return {
+                "deleted": True,
+                "message": f"Deleted {len(vector_ids)} vectors for file '{filename}'",
+                "count": len(vector_ids)
+            }
+            
+        except Exception as e:
+            logger.error(f"Error deleting vectors for file '{filename}': {e}", exc_info=True)
+            raise
+
+    def close(self):
+        """Release background resources such as the extraction worker processes."""
+        self.extractor.shutdown()
+
+
+def create_vector_store() -> BaseVectorStore:
+    """
+    Create the vector store backend selected by settings.vector_store_backend.
+
+    Returns:
+        A PineconeVectorStore ("pinecone") or LocalVectorStore ("local")
+    """
+    backend = settings.vector_store_backend
+    if backend == "local":
+        from app.services.local_vector_store import LocalVectorStore
+        return LocalVectorStore()
+    if backend == "pinecone":
+        from app.services.pinecone_vector_store import PineconeVectorStore
+        return PineconeVectorStore(index_name="knowledge-base")
+    raise ValueError(f"Unknown vector store backend: {backend}")
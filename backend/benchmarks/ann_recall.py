@@ -0,0 +1,108 @@
+"""
+Measure recall and latency of the local IVF-PQ index against exact search.
+
+Runs on synthetic clustered vectors by default, or on the vectors of an
+existing local vector store with --store-dir. For every nprobe value it
+reports recall@k (overlap with the exact top-k) and p50/p95 query latency
+for both the index and the brute-force scan it replaces.
+
+Usage (from the backend directory):
+    python -m benchmarks.ann_recall --vectors 100000 --nprobe 4 8 16 32
+    python -m benchmarks.ann_recall --store-dir .index/local
+"""
+import os
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+from app.services.ann_index import IVFPQIndex
+
+
+def synthetic_vectors(count: int, dimensions: int, clusters: int, seed: int) -> np.ndarray:
+    """Generate normalized vectors grouped around random cluster centers."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimensions)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)]
+    vectors += 0.6 * rng.normal(size=vectors.shape).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def load_store_vectors(store_dir: str, dimensions: int) -> np.ndarray:
+    """Load the (possibly partly unused) vector matrix of a local vector store."""
+    vectors = np.memmap(os.path.join(store_dir, "vectors.f32"), dtype=np.float32, mode="r")
+    vectors = np.asarray(vectors).reshape(-1, dimensions)
+    return vectors[np.linalg.norm(vectors, axis=1) > 0]
+
+
+def percentile_ms(samples, q: float) -> float:
+    return float(np.percentile(samples, q) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store-dir", help="Benchmark the vectors of a local vector store")
+    parser.add_argument("--vectors", type=int, default=100000, help="Synthetic vector count")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=200, help="Synthetic cluster count")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32, 64])
+    parser.add_argument("--pq-m", type=int, default=48)
+    parser.add_argument("--refine-factor", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.store_dir:
+        vectors = load_store_vectors(args.store_dir, args.dimensions)
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dimensions, args.clusters, args.seed)
+    print(f"{len(vectors)} vectors, {args.dimensions} dimensions")
+
+    # Queries are perturbed copies of stored vectors, like paraphrased questions
+    rng = np.random.default_rng(args.seed + 1)
+    queries = vectors[rng.choice(len(vectors), size=args.queries, replace=False)]
+    queries = queries + 0.3 * rng.normal(size=queries.shape).astype(np.float32) / np.sqrt(args.dimensions)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact, exact_times = [], []
+    for query in queries:
+        start = time.perf_counter()
+        scores = vectors @ query
+        top = np.argpartition(-scores, args.top_k - 1)[:args.top_k]
+        exact_times.append(time.perf_counter() - start)
+        exact.append(set(top.tolist()))
+    print(f"exact:  p50 {percentile_ms(exact_times, 50):.2f} ms  p95 {percentile_ms(exact_times, 95):.2f} ms")
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = IVFPQIndex(directory, args.dimensions, len(vectors), nlist=args.nlist,
+                           pq_m=args.pq_m, refine_factor=args.refine_factor, seed=args.seed)
+        start = time.perf_counter()
+        sample = vectors[rng.choice(len(vectors), size=min(len(vectors), 100000), replace=False)]
+        index.train(sample, total_vectors=len(vectors))
+        train_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        index.add(np.arange(len(vectors)), vectors)
+        add_seconds = time.perf_counter() - start
+        print(f"ivfpq:  {len(index.centroids)} lists, trained in {train_seconds:.1f}s, "
+              f"encoded in {add_seconds:.1f}s")
+
+        for nprobe in args.nprobe:
+            index.nprobe = nprobe
+            index.search(queries[0], args.top_k, vectors)  # Build the inverted lists outside the timing
+            hits, times = 0, []
+            for query, truth in zip(queries, exact):
+                start = time.perf_counter()
+                slots, _ = index.search(query, args.top_k, vectors)
+                times.append(time.perf_counter() - start)
+                hits += len(truth & set(slots.tolist()))
+            recall = hits / (len(queries) * args.top_k)
+            print(f"nprobe {nprobe:4d}: recall@{args.top_k} {recall:.3f}  "
+                  f"p50 {percentile_ms(times, 50):.2f} ms  p95 {percentile_ms(times, 95):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,644 @@
+"""
+End-to-end latency benchmark of the backend against local stand-ins.
+
+Runs the real FastAPI app (main:app) in-process and replaces its external
+services with local fakes that have configurable latency and jitter:
+
+- OpenAI embeddings and streaming chat: benchmarks.fake_openai, served over
+  HTTP and reached through OPENAI_BASE_URL
+- Azure Speech: benchmarks.fake_speech, a fake SDK module that "hears" the
+  transcript scripted for each question from the audio streamed to it
+- Pinecone: the local vector store, with --index-latency-ms added to every
+  index call to stand in for the network round trip
+- Keyboard and mouse automation: benchmarks.fake_input, which records key
+  events instead of pressing keys
+
+It then measures three things:
+
+1. Ingestion: synthetic knowledge files are uploaded with
+   PUT /knowledge-files/{filename} and the ingestion jobs are polled until done
+2. Retrieval: distinct queries run against the vector store, one at a time
+   and then --concurrency at a time
+3. Sessions: joystick commands and spoken questions are replayed over
+   /ws/unified in real time while /ws/output is recorded. Audio comes from
+   WAV files or is synthesized. Events follow the session's timeline, so
+   joystick commands and the next question can arrive while an answer is
+   still streaming. The recorded timings give the joystick latency (idle
+   and while an answer streams), time to the complete transcription, time
+   to the first answer token and time to the complete answer, all measured
+   from END
+
+Percentiles are printed. With --output they are also written as JSON, so
+two runs can be compared.
+
+Usage (from the backend directory):
+    python -m benchmarks.e2e_latency
+    python -m benchmarks.e2e_latency --session benchmarks/sessions/conference_qa.json --rounds 5
+    python -m benchmarks.e2e_latency --ttft-ms 600 --index-latency-ms 40 --output results.json
+
+Chunking needs the tiktoken encoding; run the backend once with network
+access (or point TIKTOKEN_CACHE_DIR at a cache) before benchmarking offline.
+"""
+import os
+import re
+import sys
+import json
+import math
+import time
+import wave
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks import fake_input, fake_speech  # noqa: E402
+from benchmarks.fake_openai import FakeOpenAIConfig, create_app as create_openai_app  # noqa: E402
+
+SAMPLE_RATE = 16000
+CHUNK_MS = 100  # Audio per websocket frame, as the Raspberry Pi client sends it
+
+DEFAULT_SESSION = {
+    "name": "default",
+    "events": [
+        {"type": "joystick", "command": "right"},
+        {"type": "joystick", "command": "right", "pause": 0.5},
+        {"type": "question", "pause": 1.0,
+         "transcript": "How much does the platform cost for a large conference?"},
+        {"type": "joystick", "command": "right", "during_answer": True, "pause": 0.3},
+        {"type": "joystick", "command": "down", "pause": 0.5},
+        {"type": "question", "pause": 1.0,
+         "transcript": "How long does setup take before a talk? Do I need special hardware?"},
+        {"type": "joystick", "command": "left", "pause": 0.5},
+        {"type": "question", "pause": 1.0,
+         "transcript": "Can answers show up while the question is still being asked?"}
+    ]
+}
+
+VOCABULARY = (
+    "presenter audience question answer slide teleprompter conference pricing setup hardware "
+    "controller latency retrieval knowledge document speaker microphone stage network laptop "
+    "feature discount license support schedule keynote session workshop demo transcript "
+    "integration security privacy offline accuracy language response display joystick battery"
+).split()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """Return count, mean and p50/p95/p99 of latency samples in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": len(samples),
+        "mean_ms": round(float(values.mean()), 1),
+        "p50_ms": round(float(p50), 1),
+        "p95_ms": round(float(p95), 1),
+        "p99_ms": round(float(p99), 1)
+    }
+
+
+class ServerThread:
+    """Runs an ASGI app with uvicorn on its own event loop in a background thread."""
+
+    def __init__(self, app, port: int):
+        import uvicorn
+
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(
+            app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.server.serve())
+
+    def start(self, timeout: float = 120.0):
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError(f"Server on port {self.port} failed to start")
+            time.sleep(0.05)
+
+    def run(self, coroutine) -> "asyncio.Future":
+        """Run a coroutine on the server's loop and return an awaitable for its result."""
+        return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, self.loop))
+
+    def stop(self):
+        self.server.should_exit = True
+        self._thread.join(timeout=30)
+
+
+def prepare_environment(args, openai_port: int) -> str:
+    """
+    Create a scratch working directory and point the backend's settings at the fakes.
+
+    Must run before the backend is imported, since settings are read at import.
+
+    Returns:
+        The working directory
+    """
+    workdir = tempfile.mkdtemp(prefix="podium-bench-")
+    os.symlink(os.path.join(BACKEND_DIR, "static"), os.path.join(workdir, "static"))
+    os.makedirs(os.path.join(workdir, "knowledge"))
+    os.chdir(workdir)
+
+    for key in ("AZURE_AI_ENDPOINT", "AZURE_AI_KEY", "AZURE_SPEECH_KEY",
+                "GEMINI_API_KEY", "OPENAI_API_KEY", "PINECONE_API_KEY"):
+        os.environ[key] = "benchmark"
+    os.environ.update({
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+        "VECTOR_STORE_BACKEND": "local",
+        "INDEX_DATA_DIR": ".index",
+        "ANSWER_CACHE_ENABLED": "true" if args.answer_cache else "false",
+        "SPEECH_POOL_SIZE": str(args.speech_pool_size)
+    })
+    return workdir
+
+
+def load_backend(args):
+    """Install the fakes and import the backend app."""
+    fake_speech.service = fake_speech.FakeSpeechService(
+        words_per_second=args.words_per_second,
+        partial_latency_ms=args.speech_partial_ms,
+        final_latency_ms=args.speech_final_ms,
+        stop_latency_ms=args.speech_stop_ms,
+        jitter_ms=args.jitter_ms,
+        seed=args.seed
+    )
+    fake_speech.install()
+    fake_input.install()
+
+    import main
+    from app.services.local_vector_store import LocalVectorStore
+
+    fake_input.patch_backend(main)
+
+    if args.index_latency_ms > 0:
+        # Stand in for the Pinecone round trip on every index call
+        jitter = random.Random(args.seed)
+
+        def with_latency(method):
+            async def wrapper(self, *a, **kw):
+                delay = args.index_latency_ms + jitter.uniform(-args.jitter_ms, args.jitter_ms)
+                await asyncio.sleep(max(delay, 0) / 1000)
+                return await method(self, *a, **kw)
+            return wrapper
+
+        for name in ("_query_vector", "_upsert_vectors", "_delete_vector_ids"):
+            setattr(LocalVectorStore, name, with_latency(getattr(LocalVectorStore, name)))
+
+    return main.app
+
+
+def synthetic_corpus(files: int, size_kb: int, seed: int) -> List[Tuple[str, bytes]]:
+    """Generate knowledge files of random sentences over a small vocabulary."""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(files):
+        paragraphs, size = [], 0
+        while size < size_kb * 1024:
+            sentences = [" ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(8, 20))).capitalize() + "."
+                         for _ in range(rng.randint(3, 7))]
+            paragraph = " ".join(sentences)
+            paragraphs.append(paragraph)
+            size += len(paragraph) + 2
+        corpus.append((f"bench_{i:03d}.txt", "\n\n".join(paragraphs).encode("utf-8")))
+    return corpus
+
+
+def synthetic_speech(seconds: float, seed: int) -> bytes:
+    """Synthesize speech-like 16 kHz PCM: syllable bursts over a quiet noise floor."""
+    rng = np.random.default_rng(seed)
+    samples = int(seconds * SAMPLE_RATE)
+    t = np.arange(samples) / SAMPLE_RATE
+    envelope = 0.15 * np.clip(np.sin(2 * np.pi * 4 * t), 0, None) + 0.002
+    signal = envelope * rng.standard_normal(samples)
+    return (np.clip(signal, -1, 1) * 32767).astype("<i2").tobytes()
+
+
+def read_wav(path: str) -> Tuple[bytes, int, int]:
+    """Read a 16-bit PCM WAV file, returning (frames, sample rate, channels)."""
+    with wave.open(path, "rb") as f:
+        if f.getsampwidth() != 2:
+            raise ValueError(f"{path} must be 16-bit PCM")
+        return f.readframes(f.getnframes()), f.getframerate(), f.getnchannels()
+
+
+class OutputRecorder:
+    """Records every /ws/output message with its arrival time."""
+
+    def __init__(self, url: str, compact: bool = False):
+        self.url = url
+        self.compact = compact
+        self.messages: List[Tuple[float, Dict[str, Any]]] = []
+        self.sizes: List[int] = []
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        from websockets.asyncio.client import connect
+
+        from app.services.output_protocol import COMPACT_SUBPROTOCOL, CompactDecoder, JsonDecoder
+
+        self.decoder = CompactDecoder() if self.compact else JsonDecoder()
+        self.websocket = await connect(self.url, max_size=None,
+                                       subprotocols=[COMPACT_SUBPROTOCOL] if self.compact else None)
+        if self.compact and self.websocket.subprotocol != COMPACT_SUBPROTOCOL:
+            raise RuntimeError("Server did not accept the compact output protocol")
+        self._task = asyncio.create_task(self._read())
+        await self.wait_for("connection_established", 0)
+
+    async def _read(self):
+        async for raw in self.websocket:
+            now = time.perf_counter()
+            message = self.decoder.decode(raw)
+            self.sizes.append(len(raw))
+            self.messages.append((now, message))
+            self._changed.set()
+
+    def mark(self) -> int:
+        return len(self.messages)
+
+    async def wait_for(self, message_type: str, since: int, timeout: float = 60.0,
+                       data: Optional[str] = None) -> Tuple[int, float]:
+        """
+        Wait for the first message of a type received at or after index `since`.
+
+        Returns its index and arrival time. With `data`, only a message whose
+        data field equals it matches.
+        """
+        deadline = time.perf_counter() + timeout
+        scanned = since
+        while True:
+            for i in range(scanned, len(self.messages)):
+                message = self.messages[i][1]
+                if message.get("type") == message_type and (data is None or message.get("data") == data):
+                    return i, self.messages[i][0]
+            scanned = len(self.messages)
+            self._changed.clear()
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise TimeoutError(f"No {message_type} message within {timeout}s")
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self):
+        await self.websocket.close()
+        if self._task:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+async def bench_ingestion(client, corpus: List[Tuple[str, bytes]], concurrency: int) -> Dict[str, Any]:
+    """Upload the corpus and wait for every ingestion job to finish."""
+    semaphore = asyncio.Semaphore(concurrency)
+    upload_times, job_times, chunks = [], [], 0
+    failures = 0
+
+    async def ingest(name: str, data: bytes):
+        nonlocal chunks, failures
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.put(f"/knowledge-files/{name}", content=data)
+            response.raise_for_status()
+            upload_times.append(time.perf_counter() - start)
+            job_id = response.json()["job_id"]
+            while True:
+                job = (await client.get(f"/ingestion-jobs/{job_id}")).json()
+                if job["status"] in ("completed", "failed"):
+                    break
+                await asyncio.sleep(0.05)
+            job_times.append(time.perf_counter() - start)
+            for file in job["files"].values():
+                if file["status"] == "failed":
+                    failures += 1
+                chunks += (file.get("result") or {}).get("chunks_processed", 0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(ingest(name, data) for name, data in corpus))
+    elapsed = time.perf_counter() - start
+    total_bytes = sum(len(data) for _, data in corpus)
+    return {
+        "files": len(corpus),
+        "failed": failures,
+        "megabytes": round(total_bytes / 1e6, 2),
+        "seconds": round(elapsed, 2),
+        "mb_per_second": round(total_bytes / 1e6 / elapsed, 2),
+        "chunks_per_second": round(chunks / elapsed, 1),
+        "upload": summarize(upload_times),
+        "upload_to_indexed": summarize(job_times)
+    }
+
+
+async def bench_retrieval(server: ServerThread, vector_store, queries: int,
+                          concurrency: int, seed: int) -> Dict[str, Any]:
+    """Time vector store queries sequentially, then `concurrency` at a time."""
+    rng = random.Random(seed)
+    texts = [" ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(5, 12))) for _ in range(2 * queries)]
+
+    async def timed(text: str) -> float:
+        start = time.perf_counter()
+        await server.run(vector_store.query(text, top_k=5))
+        return time.perf_counter() - start
+
+    sequential = [await timed(text) for text in texts[:queries]]
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(text: str) -> float:
+        async with semaphore:
+            return await timed(text)
+
+    start = time.perf_counter()
+    concurrent = await asyncio.gather(*(bounded(text) for text in texts[queries:]))
+    elapsed = time.perf_counter() - start
+    return {
+        "sequential": summarize(sequential),
+        "concurrent": {**summarize(list(concurrent)), "concurrency": concurrency,
+                       "queries_per_second": round(queries / elapsed, 1)}
+    }
+
+
+def load_session(path: Optional[str]) -> Tuple[Dict[str, Any], str]:
+    if not path:
+        return DEFAULT_SESSION, BACKEND_DIR
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f), os.path.dirname(os.path.abspath(path))
+
+
+async def collect_answer(transcript: str, mark: int, audio_start: float, end: float,
+                         recorder: OutputRecorder, results: Dict[str, list], first_token: asyncio.Event):
+    """Record the timings of one question's transcription and answer from /ws/output."""
+    # Answers stream one after another, so the answer to this question is the
+    # text between its complete_transcription and the next text_complete
+    complete, complete_at = await recorder.wait_for("complete_transcription", mark, data=transcript)
+    first, first_token_at = await recorder.wait_for("text_delta", complete + 1)
+    first_token.set()
+    done, done_at = await recorder.wait_for("text_complete", first + 1)
+
+    partials = [t for t, m in recorder.messages[mark:complete] if m.get("type") == "partial_transcription"]
+    if partials:
+        results["first_partial"].append(partials[0] - audio_start)
+    results["end_to_transcript"].append(complete_at - end)
+    results["time_to_first_token"].append(first_token_at - end)
+    results["answer_complete"].append(done_at - end)
+    answer = [i for i in range(complete, done + 1)
+              if recorder.messages[i][1].get("type") in ("complete_transcription", "text_delta", "text_complete")]
+    results["text_delta_messages"].append(
+        sum(1 for i in answer if recorder.messages[i][1].get("type") == "text_delta"))
+    results["output_bytes_per_answer"].append(sum(recorder.sizes[i] for i in answer))
+
+
+async def replay_session(session: Dict[str, Any], base_dir: str, base_url: str,
+                         recorder: OutputRecorder, args, results: Dict[str, list]):
+    """
+    Replay one session's joystick commands and questions in real time.
+
+    Events follow their own timeline: after END the next event is replayed
+    while the answer is still being transcribed and streamed, and the answer
+    is timed by a task of its own. A joystick event with "during_answer"
+    waits for the first answer token of the last question (then its pause),
+    so it is sent while that answer streams.
+    """
+    from websockets.asyncio.client import connect
+
+    answers: List[asyncio.Task] = []
+    first_token: Optional[asyncio.Event] = None
+    async with connect(f"{base_url}/ws/unified", max_size=None) as unified:
+        negotiated = None
+        try:
+            for index, event in enumerate(session["events"]):
+                if event.get("during_answer") and first_token:
+                    await first_token.wait()
+                if event.get("pause"):
+                    await asyncio.sleep(event["pause"] / args.speed)
+
+                if event["type"] == "joystick":
+                    streaming = bool(answers) and not answers[-1].done()
+                    seen = len(fake_input.events)
+                    start = time.perf_counter()
+                    await unified.send(event["command"])
+                    while len(fake_input.events) == seen:
+                        if time.perf_counter() - start > 10:
+                            raise TimeoutError("Joystick command produced no key event")
+                        await asyncio.sleep(0.001)
+                    latency = fake_input.events[seen][0] - start
+                    results["joystick_during_answer" if streaming else "joystick"].append(latency)
+                    continue
+
+                transcript = event["transcript"]
+                if event.get("audio"):
+                    audio, sample_rate, channels = read_wav(os.path.join(base_dir, event["audio"]))
+                else:
+                    seconds = len(transcript.split()) / args.words_per_second + 0.5
+                    audio, sample_rate, channels = synthetic_speech(seconds, args.seed + index), SAMPLE_RATE, 1
+
+                if negotiated != (sample_rate, channels):
+                    await unified.send(json.dumps({"type": "audio_format", "codec": "pcm",
+                                                   "sample_rate": sample_rate, "channels": channels}))
+                    reply = json.loads(await unified.recv())
+                    if reply.get("type") != "audio_format_accepted":
+                        raise RuntimeError(f"Audio format rejected: {reply}")
+                    negotiated = (sample_rate, channels)
+
+                fake_speech.service.expect(transcript)
+                mark = recorder.mark()
+                frame_bytes = sample_rate * channels * 2 * CHUNK_MS // 1000
+                audio_start = time.perf_counter()
+                for offset in range(0, len(audio), frame_bytes):
+                    await unified.send(audio[offset:offset + frame_bytes])
+                    # Pace frames in real time (scaled by --speed) like a live microphone
+                    target = audio_start + (offset + frame_bytes) / (frame_bytes * 1000 / CHUNK_MS) / args.speed
+                    await asyncio.sleep(max(target - time.perf_counter(), 0))
+
+                end = time.perf_counter()
+                await unified.send("END")
+                first_token = asyncio.Event()
+                answers.append(asyncio.create_task(
+                    collect_answer(transcript, mark, audio_start, end, recorder, results, first_token)))
+
+            # Keep the input websocket open until every answer has streamed
+            await asyncio.gather(*answers)
+        finally:
+            for task in answers:
+                task.cancel()
+
+
+def server_stage_quantiles(metrics_text: str) -> Dict[str, Dict[str, float]]:
+    """Parse question_stage_quantile_seconds from the /metrics exposition."""
+    pattern = re.compile(r'^question_stage_quantile_seconds\{(.*)\} (\S+)$')
+    stages: Dict[str, Dict[str, float]] = {}
+    for line in metrics_text.splitlines():
+        match = pattern.match(line)
+        if not match:
+            continue
+        labels = dict(re.findall(r'(\w+)="([^"]*)"', match.group(1)))
+        value = float(match.group(2))
+        if not math.isnan(value):
+            stages.setdefault(labels["stage"], {})[f"p{int(float(labels['quantile']) * 100)}_ms"] = round(value * 1000, 1)
+    return stages
+
+
+def print_report(report: Dict[str, Any]):
+    def row(name: str, stats: Dict[str, Any]):
+        if not stats.get("count"):
+            print(f"  {name:<28} (no samples)")
+            return
+        print(f"  {name:<28} n={stats['count']:<5} p50={stats['p50_ms']:>8.1f} ms  "
+              f"p95={stats['p95_ms']:>8.1f} ms  p99={stats['p99_ms']:>8.1f} ms")
+
+    ingestion = report["ingestion"]
+    print(f"\nIngestion: {ingestion['files']} files, {ingestion['megabytes']} MB in {ingestion['seconds']} s "
+          f"({ingestion['mb_per_second']} MB/s, {ingestion['chunks_per_second']} chunks/s, "
+          f"{ingestion['failed']} failed)")
+    row("upload", ingestion["upload"])
+    row("upload to indexed", ingestion["upload_to_indexed"])
+
+    retrieval = report["retrieval"]
+    print(f"\nRetrieval ({retrieval['concurrent'].get('queries_per_second')} queries/s "
+          f"at concurrency {retrieval['concurrent'].get('concurrency')})")
+    row("sequential", retrieval["sequential"])
+    row("concurrent", retrieval["concurrent"])
+
+    print("\nSessions (measured from END unless noted)")
+    for name, stats in report["sessions"].items():
+        row(name, stats)
+    output = report["output_messages"]
+    print(f"  /ws/output per answer: {output['text_delta_per_answer']:.1f} text_delta frames, "
+          f"{output['bytes_per_answer']:.0f} bytes ({output['protocol']} frames)")
+
+    if report["server_stages"]:
+        print("\nServer-side stages (from /metrics)")
+        for stage, values in report["server_stages"].items():
+            print(f"  {stage:<28} " + "  ".join(f"{k}={v:.1f}" for k, v in values.items()))
+
+
+async def run_benchmark(args, server: ServerThread, session: Dict[str, Any], base_dir: str) -> Dict[str, Any]:
+    import httpx
+
+    import main
+
+    base_url = f"http://127.0.0.1:{server.port}"
+    report: Dict[str, Any] = {}
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        print(f"Ingesting {args.files} synthetic files of {args.file_kb} KB...")
+        corpus = synthetic_corpus(args.files, args.file_kb, args.seed)
+        report["ingestion"] = await bench_ingestion(client, corpus, args.concurrency)
+
+        print(f"Running {args.queries} retrieval queries...")
+        vector_store = main.app.state.pinecone_assistant.vector_store
+        report["retrieval"] = await bench_retrieval(server, vector_store, args.queries, args.concurrency, args.seed)
+
+        print(f"Replaying session '{session.get('name', 'session')}' {args.rounds} time(s)...")
+        recorder = OutputRecorder(f"ws://127.0.0.1:{server.port}/ws/output", compact=args.compact_output)
+        await recorder.start()
+        results: Dict[str, list] = {name: [] for name in (
+            "joystick", "joystick_during_answer", "first_partial", "end_to_transcript", "time_to_first_token",
+            "answer_complete", "text_delta_messages", "output_bytes_per_answer")}
+        try:
+            for _ in range(args.rounds):
+                await replay_session(session, base_dir, f"ws://127.0.0.1:{server.port}", recorder, args, results)
+        finally:
+            await recorder.close()
+
+        report["sessions"] = {
+            "joystick (send to key)": summarize(results["joystick"]),
+            "joystick during answer": summarize(results["joystick_during_answer"]),
+            "first partial (from audio)": summarize(results["first_partial"]),
+            "complete transcription": summarize(results["end_to_transcript"]),
+            "first answer token": summarize(results["time_to_first_token"]),
+            "complete answer": summarize(results["answer_complete"])
+        }
+        report["output_messages"] = {
+            "protocol": "compact" if args.compact_output else "JSON",
+            "text_delta_per_answer": float(np.mean(results["text_delta_messages"])) if results["text_delta_messages"] else 0,
+            "bytes_per_answer": float(np.mean(results["output_bytes_per_answer"])) if results["output_bytes_per_answer"] else 0
+        }
+        report["server_stages"] = server_stage_quantiles((await client.get("/metrics")).text)
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--session", help="Session JSON file (default: a built-in Q&A session)")
+    parser.add_argument("--rounds", type=int, default=3, help="Times the session is replayed")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed (2 streams audio twice as fast)")
+    parser.add_argument("--files", type=int, default=20, help="Synthetic knowledge files to ingest")
+    parser.add_argument("--file-kb", type=int, default=64, help="Size of each synthetic file")
+    parser.add_argument("--queries", type=int, default=50, help="Retrieval queries per phase")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent uploads and queries")
+    parser.add_argument("--embedding-latency-ms", type=float, default=150.0)
+    parser.add_argument("--ttft-ms", type=float, default=400.0, help="Fake chat time to first token")
+    parser.add_argument("--token-interval-ms", type=float, default=20.0)
+    parser.add_argument("--answer-tokens", type=int, default=80)
+    parser.add_argument("--index-latency-ms", type=float, default=30.0,
+                        help="Round trip added to vector index calls (stands in for Pinecone)")
+    parser.add_argument("--speech-partial-ms", type=float, default=150.0)
+    parser.add_argument("--speech-final-ms", type=float, default=300.0)
+    parser.add_argument("--speech-stop-ms", type=float, default=400.0,
+                        help="Delay from stopping recognition to the final result")
+    parser.add_argument("--words-per-second", type=float, default=2.5)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--speech-pool-size", type=int, default=1)
+    parser.add_argument("--answer-cache", action="store_true",
+                        help="Keep the answer cache on (off by default so every question is answered in full)")
+    parser.add_argument("--compact-output", action="store_true",
+                        help="Record /ws/output with the compact binary protocol instead of JSON")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    session, base_dir = load_session(args.session)
+    output_path = os.path.abspath(args.output) if args.output else None
+
+    openai_server = ServerThread(create_openai_app(FakeOpenAIConfig(
+        embedding_latency_ms=args.embedding_latency_ms,
+        ttft_ms=args.ttft_ms,
+        token_interval_ms=args.token_interval_ms,
+        jitter_ms=args.jitter_ms,
+        answer_tokens=args.answer_tokens,
+        seed=args.seed
+    )), free_port())
+    openai_server.start()
+
+    workdir = prepare_environment(args, openai_server.port)
+    print(f"Working directory: {workdir}")
+    app_server = ServerThread(load_backend(args), free_port())
+    app_server.start()
+
+    try:
+        report = asyncio.run(run_benchmark(args, app_server, session, base_dir))
+    finally:
+        app_server.stop()
+        openai_server.stop()
+
+    print_report(report)
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), **report}, f, indent=2)
+        print(f"\nWrote {output_path}")
+
+
+if __name__ == "__main__":
+    main()
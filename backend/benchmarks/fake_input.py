@@ -0,0 +1,103 @@
+"""
+Local stand-ins for the OS input automation the backend drives, used by the
+end-to-end latency benchmark.
+
+install() provides fake pynput and pyautogui modules before the backend
+imports them, and patch_backend() replaces the osascript calls made by the
+input automation executor, so replayed
+joystick commands never press real keys or switch applications. Every key
+event is timestamped in `events`, which is how the benchmark measures
+joystick latency.
+"""
+import sys
+import time
+import threading
+import subprocess
+from types import ModuleType, SimpleNamespace
+from typing import List, Tuple
+
+# (time.perf_counter(), action, key) for every emulated key event
+events: List[Tuple[float, str, str]] = []
+_lock = threading.Lock()
+
+
+def record(action: str, key) -> None:
+    with _lock:
+        events.append((time.perf_counter(), action, str(key)))
+
+
+class Key:
+    right = "right"
+    left = "left"
+    up = "up"
+    down = "down"
+
+
+class Button:
+    left = "left"
+    right = "right"
+
+
+class Controller:
+    """Fake pynput keyboard controller."""
+
+    def press(self, key):
+        record("press", key)
+
+    def release(self, key):
+        record("release", key)
+
+    def tap(self, key):
+        self.press(key)
+        self.release(key)
+
+
+class MouseController:
+    """Fake pynput mouse controller."""
+
+    def __init__(self):
+        self.position = (0, 0)
+
+    def click(self, button, count: int = 1):
+        record("click", button)
+
+
+def _run(args, **kwargs) -> subprocess.CompletedProcess:
+    """Fake subprocess.run; osascript calls count as key events."""
+    if args and args[0] == "osascript":
+        record("osascript", args[-1].strip().splitlines()[0] if args[-1].strip() else "")
+    return subprocess.CompletedProcess(args, 0, stdout="", stderr="")
+
+
+def _module(name: str, **attributes) -> ModuleType:
+    module = ModuleType(name)
+    module.__dict__.update(attributes)
+    return module
+
+
+def install():
+    """Make the backend's pynput and pyautogui imports load the fakes."""
+    keyboard = _module("pynput.keyboard", Key=Key, Controller=Controller)
+    mouse = _module("pynput.mouse", Button=Button, Controller=MouseController)
+    pynput = _module("pynput", keyboard=keyboard, mouse=mouse)
+    pynput.__path__ = []
+    pyautogui = _module(
+        "pyautogui",
+        position=lambda: (0, 0),
+        moveTo=lambda *args, **kwargs: None,
+        click=lambda *args, **kwargs: record("click", "mouse"),
+        press=lambda key, *args, **kwargs: record("press", key)
+    )
+    sys.modules.update({
+        "pynput": pynput,
+        "pynput.keyboard": keyboard,
+        "pynput.mouse": mouse,
+        "pyautogui": pyautogui
+    })
+
+
+def patch_backend(main_module):
+    """Replace the subprocess module the input automation executor uses for osascript calls."""
+    from app.services import input_automation
+
+    input_automation.subprocess = SimpleNamespace(run=_run, CompletedProcess=subprocess.CompletedProcess)
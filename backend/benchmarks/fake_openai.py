@@ -0,0 +1,211 @@
+"""
+Local stand-in for the OpenAI API, used by the end-to-end latency benchmark.
+
+Serves the two endpoints the backend calls:
+
+- POST /v1/embeddings: deterministic bag-of-words embeddings, so texts that
+  share words are close and retrieval returns sensible results
+- POST /v1/chat/completions: a canned answer, streamed as server-sent events
+  token by token (or returned whole when stream is false)
+
+Every response is delayed by a configurable latency with uniform jitter.
+Point the backend at it with OPENAI_BASE_URL=http://host:port/v1.
+
+Standalone usage (from the backend directory):
+    python -m benchmarks.fake_openai --port 8100 --ttft-ms 400 --token-interval-ms 20
+"""
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import argparse
+from typing import List, Optional
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORD_PATTERN = re.compile(r"\w+")
+
+ANSWER = (
+    "That's a great question. In short, the platform is priced per presenter, "
+    "with a free tier for small events and volume discounts for conferences. "
+    "Setup takes about ten minutes, everything runs from a laptop and a small "
+    "handheld controller, and answers appear on the teleprompter while the "
+    "question is still fresh. I'm happy to go into more detail afterwards."
+)
+
+
+class FakeOpenAIConfig:
+    """Latency profile of the fake API."""
+
+    def __init__(self, embedding_latency_ms: float = 150.0, embedding_per_input_ms: float = 0.5,
+                 ttft_ms: float = 400.0, token_interval_ms: float = 20.0, jitter_ms: float = 30.0,
+                 answer_tokens: int = 80, dimensions: int = 1536, seed: int = 0):
+        """
+        Initialize the latency profile.
+
+        Args:
+            embedding_latency_ms: Base latency of an embeddings request
+            embedding_per_input_ms: Additional latency per embedded text
+            ttft_ms: Latency before the first streamed token
+            token_interval_ms: Latency between streamed tokens
+            jitter_ms: Uniform jitter added to every delay (plus or minus)
+            answer_tokens: Tokens per answer
+            dimensions: Embedding dimensions
+            seed: Seed for the jitter
+        """
+        self.embedding_latency_ms = embedding_latency_ms
+        self.embedding_per_input_ms = embedding_per_input_ms
+        self.ttft_ms = ttft_ms
+        self.token_interval_ms = token_interval_ms
+        self.jitter_ms = jitter_ms
+        self.answer_tokens = answer_tokens
+        self.dimensions = dimensions
+        self.random = random.Random(seed)
+
+    def delay(self, ms: float) -> float:
+        """Return a jittered delay in seconds."""
+        jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(ms + jitter, 0.0) / 1000
+
+
+def _word_vector(word: str, dimensions: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).standard_normal(dimensions, dtype=np.float32)
+
+
+def embed(text: str, dimensions: int) -> List[float]:
+    """Return a normalized bag-of-words embedding of a text."""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in WORD_PATTERN.findall(text.lower()):
+        vector += _word_vector(word, dimensions)
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = 1.0
+        norm = 1.0
+    return (vector / norm).tolist()
+
+
+def answer_tokens(count: int) -> List[str]:
+    """Split the canned answer into roughly count word-sized tokens."""
+    words = ANSWER.split(" ")
+    tokens = [word + " " for word in (words * (count // len(words) + 1))[:count]]
+    tokens[-1] = tokens[-1].rstrip()
+    return tokens
+
+
+def create_app(config: Optional[FakeOpenAIConfig] = None) -> FastAPI:
+    """
+    Create the fake API application.
+
+    Args:
+        config: Latency profile; defaults to FakeOpenAIConfig()
+
+    Returns:
+        The FastAPI application
+    """
+    config = config or FakeOpenAIConfig()
+    app = FastAPI()
+    app.state.config = config
+    app.state.requests = {"embeddings": 0, "chat": 0}
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        app.state.requests["embeddings"] += 1
+        await asyncio.sleep(config.delay(
+            config.embedding_latency_ms + config.embedding_per_input_ms * len(texts)))
+        # Embedding texts is CPU work; keep it off the loop serving the streams
+        vectors = await asyncio.to_thread(
+            lambda: [embed(text, config.dimensions) for text in texts])
+        return JSONResponse({
+            "object": "list",
+            "model": body.get("model", "text-embedding-3-small"),
+            "data": [{"object": "embedding", "index": i, "embedding": vector}
+                     for i, vector in enumerate(vectors)],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0}
+        })
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests["chat"] += 1
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "gpt-4.1")
+
+        if not body.get("stream"):
+            await asyncio.sleep(config.delay(
+                config.ttft_ms + config.token_interval_ms * config.answer_tokens))
+            if (body.get("response_format") or {}).get("type") == "json_object":
+                # Answer preparation asks for likely questions as JSON
+                content = json.dumps({"questions": [
+                    "How much does it cost?", "How long does setup take?",
+                    "What hardware do I need?", "Does it work offline?"
+                ]})
+            else:
+                content = "".join(answer_tokens(config.answer_tokens))
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": config.answer_tokens, "total_tokens": 0}
+            })
+
+        def chunk(delta: dict, finish_reason: Optional[str] = None) -> str:
+            return "data: " + json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }) + "\n\n"
+
+        async def stream():
+            yield chunk({"role": "assistant", "content": ""})
+            await asyncio.sleep(config.delay(config.ttft_ms))
+            for i, token in enumerate(answer_tokens(config.answer_tokens)):
+                if i:
+                    await asyncio.sleep(config.delay(config.token_interval_ms))
+                yield chunk({"content": token})
+            yield chunk({}, finish_reason="stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--embedding-latency-ms", type=float, default=150.0)
+    parser.add_argument("--ttft-ms", type=float, default=400.0)
+    parser.add_argument("--token-interval-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=30.0)
+    parser.add_argument("--answer-tokens", type=int, default=80)
+    args = parser.parse_args()
+
+    config = FakeOpenAIConfig(
+        embedding_latency_ms=args.embedding_latency_ms,
+        ttft_ms=args.ttft_ms,
+        token_interval_ms=args.token_interval_ms,
+        jitter_ms=args.jitter_ms,
+        answer_tokens=args.answer_tokens
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+Local stand-in for the Azure Speech SDK, used by the end-to-end latency benchmark.
+
+install() replaces azure.cognitiveservices.speech with a fake module before
+the backend imports it, so the real SpeechRecognitionManager and
+SpeechRecognizerPool run unchanged against a recognizer that needs no
+network. The fake recognizer "hears" a scripted transcript: words are
+revealed in proportion to the audio pushed into its stream, partial
+hypotheses and finished sentences are delivered from an SDK-like callback
+thread after configurable delays, and stopping recognition finalizes the
+rest of the transcript before session_stopped fires.
+"""
+import sys
+import time
+import queue
+import random
+import threading
+import importlib
+from collections import deque
+from types import ModuleType, SimpleNamespace
+from typing import Callable, List, Optional
+
+PCM_BYTES_PER_SECOND = 16000 * 2  # 16 kHz mono 16-bit, the PCM push format
+OPUS_BYTES_PER_SECOND = 4000  # Rough 32 kbit/s Ogg Opus
+
+
+class FakeSpeechService:
+    """Latency profile and transcript script shared by all fake recognizers."""
+
+    def __init__(self, words_per_second: float = 2.5, partial_latency_ms: float = 150.0,
+                 final_latency_ms: float = 300.0, stop_latency_ms: float = 400.0,
+                 connect_latency_ms: float = 200.0, jitter_ms: float = 30.0, seed: int = 0):
+        """
+        Initialize the service.
+
+        Args:
+            words_per_second: Speaking rate the audio is mapped to words with
+            partial_latency_ms: Delay before a partial hypothesis is delivered
+            final_latency_ms: Delay before a finished sentence is delivered
+            stop_latency_ms: Delay between stopping recognition and the final result
+            connect_latency_ms: Time to open a connection (paid while warming up)
+            jitter_ms: Uniform jitter added to every delay (plus or minus)
+            seed: Seed for the jitter
+        """
+        self.words_per_second = words_per_second
+        self.partial_latency_ms = partial_latency_ms
+        self.final_latency_ms = final_latency_ms
+        self.stop_latency_ms = stop_latency_ms
+        self.connect_latency_ms = connect_latency_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._script: deque = deque()
+
+    def delay(self, ms: float) -> float:
+        """Return a jittered delay in seconds."""
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(ms + jitter, 0.0) / 1000
+
+    def expect(self, transcript: str):
+        """Queue the transcript the next recognition session will produce."""
+        with self._lock:
+            self._script.append(transcript)
+
+    def next_transcript(self) -> str:
+        with self._lock:
+            return self._script.popleft() if self._script else ""
+
+
+service = FakeSpeechService()
+
+
+def _split_sentences(transcript: str) -> List[List[str]]:
+    """Split a transcript into sentences of words, the way segments are recognized."""
+    sentences, current = [], []
+    for word in transcript.split():
+        current.append(word)
+        if word[-1] in ".?!":
+            sentences.append(current)
+            current = []
+    if current:
+        sentences.append(current)
+    return sentences
+
+
+class _Signal:
+    def __init__(self):
+        self.handlers: List[Callable] = []
+
+    def connect(self, handler: Callable):
+        self.handlers.append(handler)
+
+    def fire(self, evt):
+        for handler in self.handlers:
+            handler(evt)
+
+
+class _ResultFuture:
+    def get(self):
+        return None
+
+
+class _Dispatcher:
+    """Delivers recognizer events in order from one thread, each at its due time."""
+
+    def __init__(self):
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def schedule(self, delay: float, callback: Optional[Callable]):
+        self._queue.put((time.monotonic() + delay, callback))
+
+    def _run(self):
+        while True:
+            due, callback = self._queue.get()
+            if callback is None:
+                return
+            wait = due - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            callback()
+
+
+class SpeechConfig:
+    def __init__(self, subscription: Optional[str] = None, region: Optional[str] = None, **kwargs):
+        self.subscription = subscription
+        self.region = region
+
+
+class AudioStreamContainerFormat:
+    OGG_OPUS = "ogg_opus"
+
+
+class AudioStreamFormat:
+    def __init__(self, samples_per_second: int = 16000, bits_per_sample: int = 16,
+                 channels: int = 1, compressed_stream_format: Optional[str] = None):
+        self.compressed = compressed_stream_format is not None
+        self.bytes_per_second = (OPUS_BYTES_PER_SECOND if self.compressed
+                                 else samples_per_second * bits_per_sample // 8 * channels)
+
+
+class PushAudioInputStream:
+    def __init__(self, stream_format: Optional[AudioStreamFormat] = None):
+        self.format = stream_format or AudioStreamFormat()
+        self.recognizer: Optional["SpeechRecognizer"] = None
+        self.closed = False
+
+    def write(self, data: bytes):
+        if self.recognizer is not None and not self.closed:
+            self.recognizer._on_audio(len(data) / self.format.bytes_per_second)
+
+    def close(self):
+        self.closed = True
+
+
+class AudioConfig:
+    def __init__(self, stream: Optional[PushAudioInputStream] = None, **kwargs):
+        self.stream = stream
+
+
+class SpeechRecognizer:
+    """Recognizes the next scripted transcript from the amount of audio received."""
+
+    def __init__(self, speech_config: Optional[SpeechConfig] = None,
+                 audio_config: Optional[AudioConfig] = None):
+        self.recognizing = _Signal()
+        self.recognized = _Signal()
+        self.session_stopped = _Signal()
+        self.canceled = _Signal()
+        self._stream = audio_config.stream if audio_config else None
+        if self._stream is not None:
+            self._stream.recognizer = self
+        self._lock = threading.Lock()
+        self._dispatcher: Optional[_Dispatcher] = None
+        self._sentences: List[List[str]] = []
+        self._sentence = 0  # Index of the sentence being spoken
+        self._words_heard = 0  # Words revealed in the current sentence
+        self._audio_seconds = 0.0
+        self._words_before = 0  # Words in the sentences before the current one
+        self._running = False
+
+    @staticmethod
+    def _event(text: str):
+        return SimpleNamespace(result=SimpleNamespace(text=text))
+
+    def start_continuous_recognition_async(self) -> _ResultFuture:
+        with self._lock:
+            self._sentences = _split_sentences(service.next_transcript())
+            self._sentence = 0
+            self._words_heard = 0
+            self._words_before = 0
+            self._audio_seconds = 0.0
+            self._running = True
+            self._dispatcher = _Dispatcher()
+        return _ResultFuture()
+
+    def _on_audio(self, seconds: float):
+        """Reveal the words spoken in the audio received so far."""
+        with self._lock:
+            if not self._running or self._sentence >= len(self._sentences):
+                return
+            self._audio_seconds += seconds
+            spoken = int(self._audio_seconds * service.words_per_second) - self._words_before
+            sentence = self._sentences[self._sentence]
+            if spoken <= self._words_heard:
+                return
+            self._words_heard = min(spoken, len(sentence))
+            text = " ".join(sentence[:self._words_heard])
+            self._dispatcher.schedule(service.delay(service.partial_latency_ms),
+                                      lambda: self.recognizing.fire(self._event(text)))
+            # A finished sentence is recognized once the next one has started
+            if self._words_heard == len(sentence) and self._sentence + 1 < len(self._sentences):
+                self._dispatcher.schedule(service.delay(service.final_latency_ms),
+                                          lambda: self.recognized.fire(self._event(text)))
+                self._words_before += len(sentence)
+                self._sentence += 1
+                self._words_heard = 0
+
+    def stop_continuous_recognition_async(self) -> _ResultFuture:
+        with self._lock:
+            if not self._running:
+                return _ResultFuture()
+            self._running = False
+            remaining = [" ".join(words) for words in self._sentences[self._sentence:]]
+            dispatcher = self._dispatcher
+            first_delay = service.delay(service.stop_latency_ms)
+            for i, text in enumerate(remaining):
+                dispatcher.schedule(first_delay if i == 0 else 0.0,
+                                    lambda text=text: self.recognized.fire(self._event(text)))
+            dispatcher.schedule(first_delay if not remaining else 0.0,
+                                lambda: self.session_stopped.fire(SimpleNamespace()))
+            dispatcher.schedule(0.0, None)
+        return _ResultFuture()
+
+
+class Connection:
+    def __init__(self, recognizer: SpeechRecognizer):
+        self.recognizer = recognizer
+
+    @classmethod
+    def from_recognizer(cls, recognizer: SpeechRecognizer) -> "Connection":
+        return cls(recognizer)
+
+    def open(self, for_continuous_recognition: bool):
+        time.sleep(service.delay(service.connect_latency_ms))
+
+    def close(self):
+        pass
+
+
+def _build_module() -> ModuleType:
+    module = ModuleType("azure.cognitiveservices.speech")
+    module.SpeechConfig = SpeechConfig
+    module.SpeechRecognizer = SpeechRecognizer
+    module.Connection = Connection
+    module.AudioStreamContainerFormat = AudioStreamContainerFormat
+    module.audio = SimpleNamespace(
+        AudioStreamFormat=AudioStreamFormat,
+        PushAudioInputStream=PushAudioInputStream,
+        AudioConfig=AudioConfig
+    )
+    return module
+
+
+def _package(name: str) -> ModuleType:
+    """Return a package module, creating an empty one if it isn't installed."""
+    if name in sys.modules:
+        return sys.modules[name]
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        module = ModuleType(name)
+        module.__path__ = []
+        sys.modules[name] = module
+        return module
+
+
+def install():
+    """Make `import azure.cognitiveservices.speech` load the fake SDK."""
+    fake = _build_module()
+    azure = _package("azure")
+    cognitiveservices = _package("azure.cognitiveservices")
+    azure.cognitiveservices = cognitiveservices
+    cognitiveservices.speech = fake
+    sys.modules["azure.cognitiveservices.speech"] = fake
+    # The backend may have been imported with the real SDK already
+    speech_module = sys.modules.get("app.services.speech_recognition")
+    if speech_module is not None:
+        speech_module.speechsdk = fake
@@ -1,24 +1,31 @@
 from fastapi import FastAPI, WebSocket, Request, Depends, UploadFile, File, HTTPException, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
-from fastapi.websockets import WebSocketState
+from starlette.requests import ClientDisconnect
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 import logging
 from contextlib import asynccontextmanager
 from app.services.transcription import websocket_transcribe, TranscriptionResult, send_messages, process_with_pinecone_assistant_text_only
 from app.services.pinecone_assistant import PineconeAssistant
-from app.services.speech_recognition import create_speech_manager
+from app.services.speech_recognition import SpeechRecognizerPool, UtteranceRecognition
+from app.services.speculative_retrieval import SpeculativeRetriever
+from app.services.audio_processing import AudioFormat, EndFrameWait, LEGACY_AUDIO_FORMAT, SUPPORTED_CODECS
+from app.services.ingestion_jobs import IngestionJobManager
+from app.services.answer_preparation import AnswerPreparer
+from app.services.metrics import question_trace, span
+from app.services.input_automation import InputAutomationExecutor
+from app.services.output_broadcaster import OutputBroadcaster
+from app.services.output_protocol import COMPACT_SUBPROTOCOL
+from app.services.uploads import (STREAM_CHUNKED_EXTENSIONS, UploadTooLarge, iter_upload_file,
+                                  safe_filename, save_upload)
+from app.config import settings
 import os
-from typing import List, Dict, Any, Optional
-from pydantic import BaseModel
+from typing import List, Dict, Any, Optional, Set
+from pydantic import BaseModel, ValidationError
 import socket
-import time
-from pynput.keyboard import Key, Controller
-from pynput.mouse import Button, Controller as MouseController
-import subprocess
-import platform
-import pyautogui
 import asyncio
+import json
 
 # uvicorn main:app --reload
 logger = logging.getLogger("app_logger")
@@ -50,6 +57,12 @@ async def get_pinecone_assistant_http(request: Request) -> PineconeAssistant:
 class PresentationContext(BaseModel):
     context: str
 
+
+# Define a model for preparing answers ahead of the talk
+class PrepareAnswersRequest(BaseModel):
+    count: int = settings.prepare_question_count  # Questions to generate
+    questions: List[str] = []  # Questions to prepare in addition to the generated ones
+
 # Define a model for key command input
 
 
@@ -81,8 +94,41 @@ async def lifespan(app: FastAPI):
         # Initialize current window tracking
         app.state.current_window = "left"
         
-        # Initialize output websocket connection
-        app.state.output_websocket = None
+        # Fan output messages out to every /ws/output client
+        app.state.output_broadcaster = OutputBroadcaster(
+            max_queue=settings.output_queue_size,
+            delta_window=settings.output_delta_window_ms / 1000,
+            delta_max_bytes=settings.output_delta_max_bytes
+        )
+
+        # Ingest knowledge files in the background, reporting progress on /ws/output
+        async def get_vector_store():
+            if not assistant.vector_store:
+                await assistant.initialize_async()
+            return assistant.vector_store
+
+        async def publish_output(message: Dict[str, Any]):
+            app.state.output_broadcaster.publish(message)
+
+        app.state.ingestion_jobs = IngestionJobManager(
+            get_vector_store,
+            publish=publish_output,
+            workers=settings.ingestion_workers,
+            history=settings.ingestion_job_history
+        )
+        await app.state.ingestion_jobs.start()
+
+        # Answers to likely questions, prepared on request before the talk
+        app.state.answer_preparer = AnswerPreparer(
+            assistant, concurrency=settings.prepare_answers_concurrency,
+            phrasings=settings.prepare_phrasings_per_question)
+
+        # Emulate joystick commands on a worker thread, off the event loop
+        app.state.input_automation = InputAutomationExecutor()
+
+        # Keep pre-connected speech recognizers ready for the next utterance
+        app.state.speech_pool = SpeechRecognizerPool(size=settings.speech_pool_size)
+        await app.state.speech_pool.start()
 
         logging.info("PineconeAssistant initialized successfully")
 
@@ -96,10 +142,21 @@ async def lifespan(app: FastAPI):
     yield
 
     # Cleanup on shutdown if needed
+    await app.state.speech_pool.close()
+    app.state.speech_pool = None
+    await app.state.ingestion_jobs.close()
+    app.state.ingestion_jobs = None
+    await app.state.answer_preparer.close()
+    app.state.answer_preparer = None
+    app.state.input_automation.close()
+    app.state.input_automation = None
+    if app.state.pinecone_assistant.vector_store:
+        app.state.pinecone_assistant.vector_store.close()
     app.state.pinecone_assistant = None
     app.state.presentation_context = ""
     app.state.current_window = "left"
-    app.state.output_websocket = None
+    await app.state.output_broadcaster.close()
+    app.state.output_broadcaster = None
 
 app = FastAPI(
     title="FastAPI Project",
@@ -130,6 +187,7 @@ async def get_index():
 
 @app.post("/upload-knowledge-files/")
 async def upload_knowledge_files(
+    request: Request,
     files: List[UploadFile] = File(...),
     pinecone_assistant: PineconeAssistant = Depends(
         get_pinecone_assistant_http)
@@ -137,8 +195,8 @@ async def upload_knowledge_files(
     """
     Upload files to the knowledge base for embedding and vectorization.
 
-    Files will be temporarily saved to the 'knowledge' directory and then
-    processed by the PineconeVectorStore.
+    Files are saved to the 'knowledge' directory and queued for ingestion;
+    the response carries the ingestion job id (see /ingestion-jobs/{job_id}).
     """
     # Create knowledge directory if it doesn't exist
     knowledge_dir = os.path.join(os.getcwd(), "knowledge")
@@ -147,29 +205,28 @@ async def upload_knowledge_files(
 
     saved_files = []
     try:
-        # Save uploaded files to knowledge directory
+        # Stream uploaded files to the knowledge directory block by block
         for file in files:
-            file_path = os.path.join(knowledge_dir, file.filename)
-
-            # Read file content
-            content = await file.read()
-
-            # Write to knowledge directory
-            with open(file_path, "wb") as f:
-                f.write(content)
-
+            file_path = os.path.join(knowledge_dir, safe_filename(file.filename))
+            await save_upload(
+                iter_upload_file(file, settings.upload_block_bytes),
+                file_path,
+                max_bytes=settings.upload_max_bytes,
+                block_size=settings.upload_block_bytes
+            )
             saved_files.append(file_path)
 
-        # Process the files with the vector store
-        result = await pinecone_assistant.upload_knowledge_files()
+        # Process the files with the vector store in the background
+        job = request.app.state.ingestion_jobs.submit([{"path": path} for path in saved_files])
 
         return JSONResponse(
             content={
-                "message": "Files uploaded and processed successfully",
+                "message": "Files uploaded and queued for processing",
                 "files": [os.path.basename(f) for f in saved_files],
-                "upload_result": result
+                "job_id": job.id,
+                "status_url": f"/ingestion-jobs/{job.id}"
             },
-            status_code=200
+            status_code=202
         )
     except Exception as e:
         # Clean up any saved files on error
@@ -177,6 +234,11 @@ async def upload_knowledge_files(
             if os.path.exists(file_path):
                 os.remove(file_path)
 
+        if isinstance(e, UploadTooLarge):
+            raise HTTPException(status_code=413, detail=str(e))
+        if isinstance(e, ValueError):
+            raise HTTPException(status_code=400, detail=str(e))
+
         logging.error(f"Error processing uploaded files: {e}", exc_info=True)
         raise HTTPException(
             status_code=500,
@@ -184,6 +246,113 @@ async def upload_knowledge_files(
         )
 
 
+@app.put("/knowledge-files/{filename}")
+async def put_knowledge_file(
+    filename: str,
+    request: Request,
+    pinecone_assistant: PineconeAssistant = Depends(
+        get_pinecone_assistant_http)
+):
+    """
+    Upload a single knowledge file as the raw request body and queue it for ingestion.
+
+    The body is written to disk in fixed-size blocks as it arrives and hashed
+    on the way; text files are also chunked before the upload finishes.
+
+    Args:
+        filename: Name to store the file under
+
+    Returns:
+        JSON response with the ingestion job id
+    """
+    try:
+        filename = safe_filename(filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.upload_max_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Upload exceeds the {settings.upload_max_bytes} byte limit"
+        )
+
+    if not pinecone_assistant.vector_store:
+        await pinecone_assistant.initialize_async()
+    vector_store = pinecone_assistant.vector_store
+
+    knowledge_dir = os.path.join(os.getcwd(), "knowledge")
+    file_path = os.path.join(knowledge_dir, filename)
+    extension = os.path.splitext(filename)[1].lower()
+
+    try:
+        upload = await save_upload(
+            request.stream(),
+            file_path,
+            max_bytes=settings.upload_max_bytes,
+            block_size=settings.upload_block_bytes,
+            chunker=vector_store.chunker if extension in STREAM_CHUNKED_EXTENSIONS else None
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ClientDisconnect:
+        logging.info(f"Client disconnected while uploading '{filename}'")
+        raise HTTPException(status_code=400, detail="Upload was interrupted")
+
+    job = request.app.state.ingestion_jobs.submit([{
+        "path": file_path,
+        "content_hash": upload["sha256"],
+        "pieces": upload["pieces"]
+    }])
+
+    return JSONResponse(
+        content={
+            "message": "File uploaded and queued for processing",
+            "file": filename,
+            "size": upload["size"],
+            "job_id": job.id,
+            "status_url": f"/ingestion-jobs/{job.id}"
+        },
+        status_code=202
+    )
+
+
+@app.get("/ingestion-jobs/")
+async def list_ingestion_jobs(request: Request):
+    """
+    List recent ingestion jobs, newest first.
+
+    Returns a JSON response with a snapshot of every job.
+    """
+    jobs = request.app.state.ingestion_jobs.list_jobs()
+    return JSONResponse(
+        content={
+            "jobs": [job.to_dict() for job in jobs]
+        },
+        status_code=200
+    )
+
+
+@app.get("/ingestion-jobs/{job_id}")
+async def get_ingestion_job(job_id: str, request: Request):
+    """
+    Get the status and per-file progress of an ingestion job.
+
+    Args:
+        job_id: ID returned by an upload endpoint
+
+    Returns:
+        JSON response with the job snapshot
+    """
+    job = request.app.state.ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Ingestion job '{job_id}' not found"
+        )
+    return JSONResponse(content=job.to_dict(), status_code=200)
+
+
 @app.get("/knowledge-files/")
 async def get_knowledge_files():
     """
@@ -264,6 +433,16 @@ async def delete_knowledge_file(
         )
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus metrics, including per-stage question latency histograms
+    (question_stage_seconds) and recent p50/p95/p99 per stage
+    (question_stage_quantile_seconds).
+    """
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.websocket("/ws/transcribe")
 async def websocket_endpoint(websocket: WebSocket, pinecone_assistant: PineconeAssistant = Depends(get_pinecone_assistant)):
     await websocket_transcribe(websocket, pinecone_assistant)
@@ -309,31 +488,73 @@ async def get_presentation_context(
         )
 
 
+@app.post("/prepare-answers/")
+async def prepare_answers(
+    prepare_request: PrepareAnswersRequest,
+    request: Request,
+    assistant: PineconeAssistant = Depends(get_pinecone_assistant_http)
+):
+    """
+    Prepare answers to likely audience questions in the background.
+
+    Questions are generated from the presentation context and the knowledge
+    base (plus any given explicitly), answered ahead of time and stored in
+    the answer cache, so matching live questions are answered instantly.
+    Set the presentation context and ingest the knowledge files first.
+
+    Returns a 202 response; poll GET /prepare-answers/ for progress.
+    """
+    if assistant.answer_cache is None:
+        raise HTTPException(
+            status_code=400,
+            detail="The answer cache is disabled (ANSWER_CACHE_ENABLED=false)"
+        )
+    preparer = request.app.state.answer_preparer
+    try:
+        preparer.start(prepare_request.count, prepare_request.questions)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return JSONResponse(
+        content={
+            "message": "Preparing answers",
+            "status_url": "/prepare-answers/"
+        },
+        status_code=202
+    )
+
+
+@app.get("/prepare-answers/")
+async def get_prepared_answers(request: Request):
+    """
+    Get the progress of the current or last answer preparation run.
+
+    Returns a JSON response with the run status and every question's status.
+    """
+    return JSONResponse(content=request.app.state.answer_preparer.to_dict(), status_code=200)
+
+
 @app.websocket("/ws/output")
 async def output_websocket_endpoint(websocket: WebSocket):
     """
     WebSocket endpoint for sending output messages (transcriptions, assistant responses)
-    to the frontend. Accepts only one connection.
+    to the frontend. Any number of clients can connect; each receives every message
+    from its own queue, so a slow client doesn't hold up the others.
+
+    Clients that offer the "podium.compact.v1" subprotocol receive compact binary
+    frames (see app.services.output_protocol) instead of JSON text frames.
     """
-    await websocket.accept()
-    logger.info("Output WebSocket connection accepted")
-    if websocket.app.state.output_websocket is not None:
-        logger.warning("Output WebSocket already connected. Closing new connection.")
-        await websocket.close(code=1008, reason="Already connected")
-        return
-
-    # Store in app state
-    websocket.app.state.output_websocket = websocket
-    
+    compact = COMPACT_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=COMPACT_SUBPROTOCOL if compact else None)
+    logger.info(f"Output WebSocket connection accepted ({'compact' if compact else 'JSON'} frames)")
+
+    broadcaster = websocket.app.state.output_broadcaster
+    subscriber = broadcaster.subscribe(websocket, compact=compact)
+
     # Send an initial connection confirmation
-    try:
-        await websocket.send_json({
-            "type": "connection_established",
-            "message": "Output WebSocket connection established"
-        })
-        logger.info("Sent connection confirmation to output websocket")
-    except Exception as e:
-        logger.error(f"Error sending connection confirmation: {e}")
+    subscriber.send({
+        "type": "connection_established",
+        "message": "Output WebSocket connection established"
+    })
 
     # Create a heartbeat task to keep the connection alive
     heartbeat_task = None
@@ -341,14 +562,9 @@ async def output_websocket_endpoint(websocket: WebSocket):
     async def send_heartbeat():
         try:
             while True:
-                try:
-                    if websocket.client_state == WebSocketState.CONNECTED:
-                        await websocket.send_json({"type": "heartbeat"})
-                        logger.debug("Sent heartbeat to output websocket")
-                    await asyncio.sleep(30)  # Send heartbeat every 30 seconds
-                except Exception as e:
-                    logger.error(f"Error in heartbeat: {e}")
-                    break
+                subscriber.send({"type": "heartbeat"})
+                logger.debug("Queued heartbeat for output websocket")
+                await asyncio.sleep(30)  # Send heartbeat every 30 seconds
         except asyncio.CancelledError:
             # Normal cancellation when websocket closes
             pass
@@ -381,9 +597,9 @@ async def output_websocket_endpoint(websocket: WebSocket):
             except asyncio.CancelledError:
                 pass
         
-        # Clear from app state
-        websocket.app.state.output_websocket = None
-        logger.info("Output WebSocket connection closed and cleared from state")
+        # Stop sending to this client
+        await broadcaster.unsubscribe(subscriber)
+        logger.info("Output WebSocket connection closed and unsubscribed")
 
 @app.websocket("/ws/unified")
 async def unified_websocket_endpoint(websocket: WebSocket, pinecone_assistant: PineconeAssistant = Depends(get_pinecone_assistant)):
@@ -395,30 +611,115 @@ async def unified_websocket_endpoint(websocket: WebSocket, pinecone_assistant: P
     - Text messages: Directional commands like "forward", "backward", "up", "down"
     - Binary data: Audio chunks for speech recognition
     - "END" text message: Signal to stop receiving audio and process the transcription
+    - {"type": "audio_format", "codec": ..., "sample_rate": ..., "channels": ...}:
+      Optional format negotiation, applied from the next utterance on. Codecs are
+      "pcm" (16-bit little-endian, resampled to 16 kHz mono on the server) and
+      "ogg_opus". Without it, 44.1 kHz mono PCM is assumed.
     """
     await websocket.accept()
     logger.info("Unified Input WebSocket connection accepted")
 
-    # Initialize speech recognition components
-    recognition_done = asyncio.Event()
-    transcription_result = TranscriptionResult()
-
-    # Get the output websocket if available
-    output_websocket = websocket.app.state.output_websocket
-    if output_websocket:
+    # Output messages are published to every /ws/output client
+    output = websocket.app.state.output_broadcaster
+    if output.has_subscribers:
         logger.info("Output websocket is available - partial transcriptions will be sent")
     else:
         logger.warning("No output websocket connected - partial transcriptions will not be sent")
 
-    # Create speech manager with transcription result and output websocket
-    speech_manager = create_speech_manager(
-        message_callback=None,
-        recognition_done_event=recognition_done,
-        transcription_result=transcription_result,
-        output_websocket=output_websocket
-    )
+    # Per-utterance speech recognition state, set up on the first audio chunk
+    speech_pool = websocket.app.state.speech_pool
+    recognition: Optional[UtteranceRecognition] = None
+    recognition_done = None
+    transcription_result = None
+    retriever = None
+    audio_format = LEGACY_AUDIO_FORMAT
 
     is_audio_streaming = False
+    # Set when voice activity detection ended the utterance before the client sent END
+    end_frame_wait: Optional[EndFrameWait] = None
+
+    # Questions being stopped or answered in the background, so the loop keeps
+    # receiving joystick commands while an answer streams
+    utterance_tasks: Set[asyncio.Task] = set()
+    last_utterance: Optional[asyncio.Task] = None
+    # Set once the recognizer of the last finished utterance has stopped
+    recognition_stopped: Optional[asyncio.Event] = None
+
+    async def answer_utterance(trigger: str, utterance: UtteranceRecognition, done: asyncio.Event,
+                               result: TranscriptionResult,
+                               utterance_retriever: Optional[SpeculativeRetriever], stopped: asyncio.Event,
+                               previous: Optional[asyncio.Task]):
+        """Stop recognition of a finished utterance and answer the transcribed question."""
+        try:
+            # Trace the question from the end of the utterance to the end of the answer
+            with question_trace(trigger):
+                with span("recognition_stop"):
+                    await utterance.stop()
+                    await done.wait()
+                stopped.set()
+
+                stats = utterance.get_audio_stats()
+                if stats:
+                    logger.info(f"Voice activity detection dropped {stats['frames_dropped']} of {stats['frames_total']} frames")
+
+                with span("transcript"):
+                    complete_text = result.get_complete_text()
+                logger.info(f"Complete transcription text: {complete_text[:50]}...")
+
+                # Answers are streamed one after another, never interleaved
+                if previous and not previous.done():
+                    with span("previous_answer"):
+                        await asyncio.wait([previous])
+
+                # Send completion message via output websocket
+                if complete_text:
+                    output.publish({
+                        "type": "complete_transcription",
+                        "data": complete_text
+                    })
+
+                # Process with Pinecone assistant if available
+                if pinecone_assistant and complete_text.strip():
+                    context_results = None
+                    if utterance_retriever:
+                        with span("speculative_wait"):
+                            context_results = await utterance_retriever.get_results(complete_text)
+                    logger.info("Processing with assistant (text only)")
+                    await process_with_pinecone_assistant_text_only(
+                        complete_text,
+                        pinecone_assistant,
+                        context_results=context_results
+                    )
+        except asyncio.CancelledError:
+            logger.info("Answer cancelled because the input websocket closed")
+            raise
+        except Exception as e:
+            logger.error(f"Error answering question: {e}", exc_info=True)
+            output.publish({
+                "status": "error",
+                "message": f"Server error processing input: {str(e)}"
+            })
+        finally:
+            stopped.set()
+            if utterance_retriever:
+                utterance_retriever.cancel()
+            utterance.close()
+
+    def finish_utterance(trigger: str):
+        """Hand the utterance to a background task and reset for the next one."""
+        nonlocal recognition, retriever, is_audio_streaming, last_utterance, recognition_stopped
+        recognition_stopped = asyncio.Event()
+        last_utterance = asyncio.create_task(answer_utterance(
+            trigger, recognition, recognition_done, transcription_result, retriever,
+            recognition_stopped, last_utterance
+        ))
+        utterance_tasks.add(last_utterance)
+        last_utterance.add_done_callback(utterance_tasks.discard)
+
+        # The next audio chunk takes a fresh manager
+        is_audio_streaming = False
+        recognition = None
+        retriever = None
 
     try:
         while True:
@@ -428,58 +729,97 @@ async def unified_websocket_endpoint(websocket: WebSocket, pinecone_assistant: P
                 if "bytes" in data:
                     audio_chunk = data["bytes"]
                     if audio_chunk:
+                        if end_frame_wait:
+                            # Drop audio between an automatic end of utterance and END,
+                            # unless speech starts again or END doesn't come
+                            audio_chunk = end_frame_wait.process(audio_chunk)
+                            if audio_chunk is None:
+                                continue
+                            logger.info(f"Stopped waiting for END ({end_frame_wait.reason}) after "
+                                        f"dropping {end_frame_wait.chunks_dropped} audio chunks")
+                            end_frame_wait = None
+                            if not audio_chunk:
+                                continue
                         if not is_audio_streaming:
                             logger.info("Starting speech recognition on first audio chunk")
-                            speech_manager.start_recognition()
+                            recognition_done = asyncio.Event()
+                            transcription_result = TranscriptionResult()
+
+                            # Start retrieval speculatively while the question is still being spoken
+                            retriever = None
+                            if settings.speculative_retrieval_enabled and pinecone_assistant.vector_store:
+                                retriever = SpeculativeRetriever(pinecone_assistant.vector_store)
+
+                            # Take a pre-connected speech manager from the pool once the
+                            # previous recognizer has stopped; audio is buffered meanwhile
+                            recognition = UtteranceRecognition(
+                                speech_pool,
+                                audio_format=audio_format,
+                                after=recognition_stopped,
+                                message_callback=None,
+                                recognition_done_event=recognition_done,
+                                transcription_result=transcription_result,
+                                output=output,
+                                segment_callback=retriever.submit if retriever else None
+                            )
                             is_audio_streaming = True
-                        speech_manager.process_audio_chunk(audio_chunk)
+                        recognition.process_audio_chunk(audio_chunk)
+                        if recognition.end_of_utterance_detected:
+                            logger.info("Trailing silence detected, ending utterance without waiting for END")
+                            end_frame_wait = EndFrameWait(
+                                audio_format,
+                                timeout=settings.vad_end_frame_timeout_ms / 1000,
+                                threshold_db=settings.vad_threshold_db,
+                                margin_db=settings.vad_margin_db,
+                                preroll_ms=settings.vad_preroll_ms
+                            )
+                            finish_utterance("vad")
                     else:
                         logger.info("Received empty audio chunk")
 
                 elif "text" in data:
                     command = data["text"]
 
-                    if command == "END":
-                        if is_audio_streaming:
-                            logger.info("Received END command, processing audio")
-                            speech_manager.stop_recognition()
-                            await recognition_done.wait()
-
-                            complete_text = transcription_result.get_complete_text()
-                            logger.info(f"Complete transcription text: {complete_text[:50]}...")
-
-                            # Send completion message via output websocket
-                            output_ws = websocket.app.state.output_websocket
-                            if output_ws and complete_text:
-                                 await output_ws.send_json({
-                                    "type": "complete_transcription",
-                                    "data": complete_text
-                                })
-
-                            # Process with Pinecone assistant if available
-                            if pinecone_assistant and complete_text.strip():
-                                logger.info("Processing with assistant (text only)")
-                                await process_with_pinecone_assistant_text_only(
-                                    complete_text,
-                                    pinecone_assistant
-                                )
-
-                            # Reset audio streaming state
-                            is_audio_streaming = False
-                            recognition_done = asyncio.Event()
-                            transcription_result = TranscriptionResult()
+                    if command.startswith("{"):
+                        try:
+                            message = json.loads(command)
+                            if message.get("type") != "audio_format":
+                                logger.warning(f"Received unknown message: {message.get('type')}")
+                                continue
+                            requested_format = AudioFormat.model_validate(message)
+                        except (json.JSONDecodeError, ValidationError) as e:
+                            logger.warning(f"Rejected malformed audio format message: {e}")
+                            await websocket.send_json({
+                                "type": "audio_format_rejected",
+                                "error": str(e),
+                                "supported_codecs": list(SUPPORTED_CODECS)
+                            })
+                            continue
+                        if (requested_format.codec not in SUPPORTED_CODECS
+                                or requested_format.sample_rate <= 0
+                                or requested_format.channels not in (1, 2)):
+                            await websocket.send_json({
+                                "type": "audio_format_rejected",
+                                "supported_codecs": list(SUPPORTED_CODECS)
+                            })
+                            continue
+                        audio_format = requested_format
+                        logger.info(f"Negotiated audio format: {audio_format}")
+                        await websocket.send_json({
+                            "type": "audio_format_accepted",
+                            **audio_format.model_dump()
+                        })
 
-                            # Get current output websocket (it may have changed)
-                            current_output_ws = websocket.app.state.output_websocket
-                            
-                            # Recreate speech manager for next audio stream
-                            speech_manager.close()
-                            speech_manager = create_speech_manager(
-                                message_callback=None,
-                                recognition_done_event=recognition_done,
-                                transcription_result=transcription_result,
-                                output_websocket=current_output_ws
-                            )
+                    elif command == "END":
+                        if end_frame_wait:
+                            # The utterance was already ended by trailing silence
+                            if end_frame_wait.chunks_dropped:
+                                logger.info(f"Dropped {end_frame_wait.chunks_dropped} audio chunks "
+                                            "between the automatic end of utterance and END")
+                            end_frame_wait = None
+                        elif is_audio_streaming:
+                            logger.info("Received END command, processing audio")
+                            finish_utterance("end_frame")
                         else:
                              logger.info("Received END command but not streaming audio.")
 
@@ -492,7 +832,8 @@ async def unified_websocket_endpoint(websocket: WebSocket, pinecone_assistant: P
                             'down': 'down'
                          }[command]
                          logger.info(f"Processing directional command: {command} -> {actual_command}")
-                         await process_directional_command(actual_command)
+                         # Queue the key press and keep receiving audio while it runs
+                         websocket.app.state.input_automation.submit(actual_command)
                     else:
                         logger.warning(f"Received unknown command: {command}")
 
@@ -502,25 +843,28 @@ async def unified_websocket_endpoint(websocket: WebSocket, pinecone_assistant: P
             except Exception as e:
                 logger.error(f"Error in unified input WebSocket: {e}", exc_info=True)
                 # Send error via output ws
-                output_ws = websocket.app.state.output_websocket
-                if output_ws:
-                    try:
-                        await output_ws.send_json({
-                            "status": "error",
-                            "message": f"Server error processing input: {str(e)}"
-                        })
-                    except Exception as send_e:
-                         logger.error(f"Failed to send error to output websocket: {send_e}")
+                output.publish({
+                    "status": "error",
+                    "message": f"Server error processing input: {str(e)}"
+                })
                 break
 
     finally:
         # Clean up resources
-        if is_audio_streaming and speech_manager:
+        if recognition:
             logger.info("Cleaning up active speech recognition stream on disconnect.")
-            speech_manager.stop_recognition()
+            if recognition.manager:
+                recognition.manager.stop_recognition()
+            recognition.close()
 
-        if speech_manager:
-            speech_manager.close()
+        if retriever:
+            retriever.cancel()
+
+        # Stop answering for this client
+        for task in utterance_tasks:
+            task.cancel()
+        if utterance_tasks:
+            await asyncio.gather(*list(utterance_tasks), return_exceptions=True)
 
         logger.info("Unified Input WebSocket connection closed")
 
@@ -528,96 +872,12 @@ async def unified_websocket_endpoint(websocket: WebSocket, pinecone_assistant: P
 
 
 async def process_directional_command(command: str) -> Dict[str, Any]:
-    """Process directional commands (forward, backward, up, down)"""
-    if command not in ["forward", "backward", "up", "down"]:
-        raise ValueError(
-            f"Invalid command: {command}. Accepted commands are: forward, backward, up, down.")
-
+    """Process directional commands (forward, backward, up, down) and wait for the result"""
     try:
-        if platform.system() == "Darwin":  # macOS
-            # Save the current mouse position
-            original_position = pyautogui.position()
-
-            if command in ["forward", "backward"]:
-                # PowerPoint control on secondary monitor
-                key_to_press = "right" if command == "forward" else "left"
-
-                # Create AppleScript to control PowerPoint
-                applescript = f'''
-                tell application "Figma"
-                    activate
-                    tell application "System Events"
-                        key code {124 if command == "forward" else 123}
-                    end tell
-                end tell
-                '''
-
-                # Execute the AppleScript
-                result = subprocess.run(["osascript", "-e", applescript],
-                                        capture_output=True, text=True)
-
-                # Return focus to the previous application (most likely Chrome)
-                # Adjust the delay as needed
-                time.sleep(0.2)
-
-                # Return mouse to original position
-                pyautogui.moveTo(original_position[0], original_position[1])
-
-                return {
-                    "status": "success",
-                    "message": f"Successfully sent {key_to_press} arrow key to Figma",
-                    "application": "Figma",
-                    "command": command
-                }
-            else:  # "up" or "down"
-                # Chrome scrolling on main monitor
-                # First, make sure Chrome is active
-                applescript = '''
-                tell application "Google Chrome"
-                    activate
-                end tell
-                '''
-                subprocess.run(["osascript", "-e", applescript],
-                               capture_output=True, text=True)
-
-                # Now send the key
-                key_to_press = Key.up if command == "up" else Key.down
-                keyboard = Controller()
-                keyboard.press(key_to_press)
-                time.sleep(0.1  )
-                keyboard.release(key_to_press)
-
-                # Return mouse to original position
-                pyautogui.moveTo(original_position[0], original_position[1])
-
-                return {
-                    "status": "success",
-                    "message": f"Successfully scrolled {command} in Chrome",
-                    "application": "Google Chrome",
-                    "command": command
-                }
-        else:
-            # Fallback for non-macOS systems
-            keyboard = Controller()
-            key_mapping = {
-                "forward": Key.right,
-                "backward": Key.left,
-                "up": Key.up,
-                "down": Key.down
-            }
-
-            key = key_mapping[command]
-            keyboard.press(key)
-            time.sleep(0.1)
-            keyboard.release(key)
-
-            return {
-                "status": "success",
-                "message": f"Successfully emulated key press: {command}",
-                "key": str(key)
-            }
+        return await app.state.input_automation.execute(command)
+    except ValueError:
+        raise
     except Exception as e:
-        logging.error(f"Error emulating key press: {e}")
         raise Exception(f"Failed to emulate key press: {str(e)}")
 
 # Update the POST endpoint to use the same function for consistency
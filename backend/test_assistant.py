@@ -1,17 +1,18 @@
-from app.services.assistant import KnowledgeAssistant
-from app.config import settings
-def main():
+import asyncio
+
+from app.services.pinecone_assistant import PineconeAssistant
+
+
+async def main():
     try:
-        knowledge_assistant = KnowledgeAssistant()
-        knowledge_assistant.upload_knowledge_files()
+        knowledge_assistant = await PineconeAssistant.create()
+        await knowledge_assistant.upload_knowledge_files()
 
         print("Asking about key insights...")
-        knowledge_assistant.ask_question("What are the key insights from the interviews?")
-        # Ask about key insights
-        
-        # knowledge_assistant.ask_question("What are the key insights?")
+        result = await knowledge_assistant.generate_answer("What are the key insights from the interviews?")
+        print(result["answer"])
     except Exception as e:
         print(f"Error occurred: {str(e)}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The settings require API keys at import time; the tests never call the services
+for key in ("AZURE_AI_ENDPOINT", "AZURE_AI_KEY", "AZURE_SPEECH_KEY",
+            "GEMINI_API_KEY", "OPENAI_API_KEY", "PINECONE_API_KEY"):
+    os.environ.setdefault(key, "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
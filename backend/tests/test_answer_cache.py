@@ -0,0 +1,80 @@
+import asyncio
+
+import numpy as np
+
+from app.services.answer_cache import SemanticAnswerCache
+
+SCOPE = "talk"
+
+
+def embedding(similarity: float) -> np.ndarray:
+    """Unit vector with the given cosine similarity to the cached question's [1, 0]."""
+    return np.array([similarity, np.sqrt(1 - similarity ** 2)], dtype=np.float32)
+
+
+class FakeConfirm:
+    """Stands in for the LLM check, recording the candidates it was offered."""
+
+    def __init__(self, choice):
+        self.choice = choice
+        self.calls = []
+
+    async def __call__(self, question, candidates):
+        self.calls.append((question, candidates))
+        return self.choice
+
+
+def make_cache() -> SemanticAnswerCache:
+    cache = SemanticAnswerCache(similarity=0.92, candidate_similarity=0.5)
+    cache.put(SCOPE, "How much does it cost?", embedding(1.0), "It's $10 a month.")
+    return cache
+
+
+def test_exact_repeat_hits_without_embedding_match():
+    cache = make_cache()
+    assert cache.get_exact(SCOPE, "how much does it cost") is not None
+
+
+def test_near_verbatim_repeat_hits_without_confirm():
+    cache, confirm = make_cache(), FakeConfirm(None)
+    cached = asyncio.run(cache.get(SCOPE, "So how much does it cost?", embedding(0.95), confirm))
+    assert cached.answer == "It's $10 a month."
+    assert confirm.calls == []
+
+
+def test_paraphrase_hits_when_confirmed():
+    cache, confirm = make_cache(), FakeConfirm(0)
+    cached = asyncio.run(cache.get(SCOPE, "What's the pricing?", embedding(0.7), confirm))
+    assert cached.answer == "It's $10 a month."
+    assert confirm.calls == [("What's the pricing?", ["How much does it cost?"])]
+    assert cache.hits == 1
+
+
+def test_related_question_misses_when_not_confirmed():
+    cache, confirm = make_cache(), FakeConfirm(None)
+    cached = asyncio.run(cache.get(SCOPE, "Is there a free trial?", embedding(0.7), confirm))
+    assert cached is None
+    assert len(confirm.calls) == 1
+    assert cache.misses == 1
+
+
+def test_unrelated_question_misses_without_confirm():
+    cache, confirm = make_cache(), FakeConfirm(0)
+    cached = asyncio.run(cache.get(SCOPE, "Who founded the company?", embedding(0.1), confirm))
+    assert cached is None
+    assert confirm.calls == []
+
+
+def test_paraphrase_misses_without_confirm():
+    cache = make_cache()
+    assert asyncio.run(cache.get(SCOPE, "What's the pricing?", embedding(0.7))) is None
+
+
+def test_candidates_sharing_an_answer_are_confirmed_once():
+    cache, confirm = SemanticAnswerCache(similarity=0.92, candidate_similarity=0.5), FakeConfirm(0)
+    cache.put(SCOPE, "How much does it cost?", np.array([1.0, 0.0, 0.0]), "It's $10 a month.")
+    cache.put(SCOPE, "What does it cost per month?", np.array([1.0, 0.3, 0.0]), "It's $10 a month.")
+    cache.put(SCOPE, "Is there a free trial?", np.array([0.5, 0.5, 0.7]), "Yes, for 14 days.")
+    asyncio.run(cache.get(SCOPE, "What's the pricing?", np.array([0.7, 0.0, 0.7]), confirm))
+    _, candidates = confirm.calls[0]
+    assert candidates == ["Is there a free trial?", "How much does it cost?"]
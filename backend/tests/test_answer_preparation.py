@@ -0,0 +1,90 @@
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.answer_preparation import COMPLETED, AnswerPreparer
+
+VOCABULARY = {}
+
+
+def bag_of_words(text):
+    """Embedding that scores questions by the words they share."""
+    vector = np.zeros(64, dtype=np.float32)
+    for word in re.findall(r"[a-z']+", text.lower()):
+        vector[VOCABULARY.setdefault(word, len(VOCABULARY))] += 1
+    return vector.tolist()
+
+
+class FakeVectorStore:
+    async def embed_query(self, text):
+        return bag_of_words(text)
+
+    async def embed_queries(self, texts):
+        return [bag_of_words(text) for text in texts]
+
+    async def query(self, text, top_k=5, query_embedding=None):
+        return [{"source": "pricing.md", "text": "Licenses are $10 per user per month."}]
+
+    def knowledge_version(self):
+        return "v1"
+
+
+class FakeCompletions:
+    async def create(self, model, messages, **kwargs):
+        system = messages[0]["content"]
+        if "most likely to ask" in system:
+            content = {"questions": ["What's the pricing?"]}
+        else:
+            content = {"1": ["How much does a license cost per month?", "What's the pricing?"]}
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(content)))])
+
+
+class FakeAssistant:
+    def __init__(self):
+        self.presentation_context = "Launch of our product"
+        self.model = "test"
+        self.vector_store = FakeVectorStore()
+        self.async_client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions()))
+        self.answer_cache = SemanticAnswerCache(similarity=0.92)
+
+    def answer_scope(self):
+        return "talk"
+
+    async def generate_answer(self, question):
+        return {"question": question, "embedding": bag_of_words(question),
+                "answer": "It's $10 per user per month."}
+
+
+def prepare(phrasings):
+    assistant = FakeAssistant()
+    preparer = AnswerPreparer(assistant, phrasings=phrasings)
+
+    async def run():
+        preparer.start(count=1)
+        await preparer._task
+
+    asyncio.run(run())
+    assert preparer.status == COMPLETED
+    return assistant, preparer
+
+
+def lookup(assistant, question):
+    return asyncio.run(assistant.answer_cache.get("talk", question, bag_of_words(question)))
+
+
+def test_rephrased_question_hits_prepared_answer():
+    assistant, preparer = prepare(phrasings=4)
+    # A duplicate of the question itself is not kept as a phrasing
+    assert preparer.to_dict()["questions"][0]["phrasings"] == ["How much does a license cost per month?"]
+    cached = lookup(assistant, "So how much does a license cost per month?")
+    assert cached is not None
+    assert cached.answer == "It's $10 per user per month."
+
+
+def test_rephrased_question_misses_without_phrasings():
+    assistant, _ = prepare(phrasings=0)
+    assert lookup(assistant, "So how much does a license cost per month?") is None
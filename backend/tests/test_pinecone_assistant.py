@@ -0,0 +1,113 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services.pinecone_assistant import PineconeAssistant
+
+# The cached question and its paraphrase sit between the candidate and hit thresholds
+EMBEDDINGS = {
+    "How much does it cost?": [1.0, 0.0],
+    "What's the pricing?": [0.7, 0.714],
+    "Who founded the company?": [0.0, 1.0],
+}
+
+
+class FakeVectorStore:
+    async def embed_query(self, text):
+        return np.array(EMBEDDINGS[text], dtype=np.float32)
+
+    async def query(self, text, top_k=5, query_embedding=None):
+        return [{"source": "notes.md", "chunk_id": 0, "text": "Pricing is $10 a month."}]
+
+    def knowledge_version(self):
+        return "v1"
+
+
+class FakeStream:
+    def __init__(self, text):
+        self.text = text
+        self.closed = False
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        for word in self.text.split(" "):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))])
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeCompletions:
+    """Answers the rephrasing check with `confirm_reply` and starts streaming answers after `delay`."""
+
+    def __init__(self, confirm_reply, delay=0.05):
+        self.confirm_reply = confirm_reply
+        self.delay = delay
+        self.streams_requested = 0
+        self.streams_cancelled = 0
+
+    async def create(self, model, messages, stream=False, **kwargs):
+        if model == settings.answer_cache_confirm_model:
+            await asyncio.sleep(self.delay / 5)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.confirm_reply))])
+        self.streams_requested += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.streams_cancelled += 1
+            raise
+        return FakeStream("A fresh answer.")
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.text = ""
+        self.done = False
+
+    def on_text_delta(self, delta, snapshot):
+        self.text = snapshot.value
+
+    def on_message_done(self, message):
+        self.done = True
+
+
+@pytest.fixture
+def assistant(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assistant = PineconeAssistant()
+    assistant.vector_store = FakeVectorStore()
+    assistant.answer_cache.put(
+        assistant.answer_scope(), "How much does it cost?", [1.0, 0.0], "It's $10 a month.")
+    return assistant
+
+
+def ask(assistant, question, completions):
+    assistant.async_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    handler = RecordingHandler()
+    asyncio.run(assistant.ask_and_stream_response(question, handler))
+    assert handler.done
+    return handler.text
+
+
+def test_confirmed_paraphrase_replays_answer_and_cancels_completion(assistant):
+    completions = FakeCompletions(confirm_reply="1")
+    assert ask(assistant, "What's the pricing?", completions) == "It's $10 a month."
+    assert completions.streams_requested == 1
+    assert completions.streams_cancelled == 1
+
+
+def test_declined_paraphrase_streams_a_fresh_answer(assistant):
+    completions = FakeCompletions(confirm_reply="0")
+    assert ask(assistant, "What's the pricing?", completions) == "A fresh answer. "
+    assert completions.streams_cancelled == 0
+
+
+def test_unrelated_question_streams_and_is_cached(assistant):
+    completions = FakeCompletions(confirm_reply="1")
+    assert ask(assistant, "Who founded the company?", completions) == "A fresh answer. "
+    assert assistant.answer_cache.get_exact(assistant.answer_scope(), "Who founded the company?")
@@ -5,6 +5,26 @@ interface FileUploadProps {
   onUploadSuccess?: () => void;
 }
 
+interface IngestionJob {
+  status: 'queued' | 'running' | 'completed' | 'failed';
+  files_total: number;
+  files_finished: number;
+}
+
+const API_BASE = 'http://127.0.0.1:8000';
+
+// Poll an ingestion job until it has finished processing
+const waitForJob = async (jobId: string): Promise<IngestionJob> => {
+  for (;;) {
+    const response = await fetch(`${API_BASE}/ingestion-jobs/${jobId}`);
+    const job: IngestionJob = await response.json();
+    if (!response.ok || job.status === 'completed' || job.status === 'failed') {
+      return job;
+    }
+    await new Promise(resolve => setTimeout(resolve, 1000));
+  }
+};
+
 export const FileUpload = ({ onUploadSuccess }: FileUploadProps) => {
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [selectedFiles, setSelectedFiles] = useState<File[]>([]);
@@ -51,22 +71,31 @@ export const FileUpload = ({ onUploadSuccess }: FileUploadProps) => {
     setUploadStatus(null);
 
     try {
-      const formData = new FormData();
-      selectedFiles.forEach(file => {
-        formData.append('files', file);
-      });
-
-      const response = await fetch('http://127.0.0.1:8000/upload-knowledge-files/', {
-        method: 'POST',
-        body: formData,
-      });
-
-      const data = await response.json();
+      // Send each file as a raw body so the backend can stream it to disk
+      let response: Response | null = null;
+      let detail: string | undefined;
+      const uploadedFiles: string[] = [];
+      const jobIds: string[] = [];
+      for (const file of selectedFiles) {
+        response = await fetch(`${API_BASE}/knowledge-files/${encodeURIComponent(file.name)}`, {
+          method: 'PUT',
+          headers: { 'Content-Type': file.type || 'application/octet-stream' },
+          body: file,
+        });
+        const result: { file?: string; detail?: string; job_id?: string } = await response.json();
+        if (!response.ok) {
+          detail = result.detail;
+          break;
+        }
+        uploadedFiles.push(result.file ?? file.name);
+        if (result.job_id) jobIds.push(result.job_id);
+      }
+      const data = { files: uploadedFiles, detail };
 
-      if (response.ok) {
+      if (response?.ok) {
         setUploadStatus({
           success: true,
-          message: `Files uploaded successfully! ${data.files.length} file(s) added to the knowledge base.`,
+          message: `Files uploaded! Processing ${data.files.length} file(s) in the background...`,
         });
         // Clear the file selection after successful upload
         setSelectedFiles([]);
@@ -78,6 +107,17 @@ export const FileUpload = ({ onUploadSuccess }: FileUploadProps) => {
         if (onUploadSuccess) {
           onUploadSuccess();
         }
+
+        // Processing continues in the background; report when it is done
+        void Promise.all(jobIds.map(waitForJob)).then(jobs => {
+          const failed = jobs.filter(job => job.status !== 'completed').length;
+          setUploadStatus({
+            success: failed === 0,
+            message: failed === 0
+              ? `${data.files.length} file(s) added to the knowledge base.`
+              : `${failed} file(s) could not be processed.`,
+          });
+        }).catch(error => console.error('Error checking ingestion status:', error));
       } else {
         setUploadStatus({
           success: false,
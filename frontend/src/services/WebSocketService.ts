@@ -25,6 +25,75 @@ export interface WebSocketHandlers {
   clearTranscription: () => void;
 }
 
+// Subprotocol for compact binary output frames (see backend app/services/output_protocol.py)
+const COMPACT_SUBPROTOCOL = "podium.compact.v1";
+
+// Compact frame types: one type byte, then the payload
+const FRAME_JSON = 0;
+const FRAME_PARTIAL = 1;
+const FRAME_FINAL = 2;
+const FRAME_DELTA = 3;
+const FRAME_COMPLETE = 4;
+const FRAME_HEARTBEAT = 5;
+const FRAME_QUESTION = 6;
+
+/**
+ * Decodes JSON text frames. Partial transcriptions arrive as a diff: keep the first
+ * `keep` characters of the previous partial and append `text`.
+ */
+export class JsonFrameDecoder {
+  private partial = "";
+
+  decode(data: string) {
+    const message = JSON.parse(data);
+    if (message.type === "partial_transcription" && message.keep !== undefined) {
+      this.partial = this.partial.slice(0, message.keep) + message.text;
+      message.text = this.partial;
+      delete message.keep;
+    }
+    return message;
+  }
+}
+
+/**
+ * Decodes compact binary frames into the same messages the JSON protocol sends.
+ * Partial transcriptions arrive as a diff against the previous partial's UTF-8 bytes.
+ */
+export class CompactFrameDecoder {
+  private partial = new Uint8Array(0);
+  private textDecoder = new TextDecoder();
+
+  decode(buffer: ArrayBuffer) {
+    const frame = new Uint8Array(buffer);
+    const payload = frame.subarray(1);
+    switch (frame[0]) {
+      case FRAME_PARTIAL: {
+        const keep = frame[1] | (frame[2] << 8);
+        const tail = frame.subarray(3);
+        const partial = new Uint8Array(keep + tail.length);
+        partial.set(this.partial.subarray(0, keep));
+        partial.set(tail, keep);
+        this.partial = partial;
+        return { type: "partial_transcription", text: this.textDecoder.decode(partial) };
+      }
+      case FRAME_FINAL:
+        return { type: "final_transcription_segment", text: this.textDecoder.decode(payload) };
+      case FRAME_DELTA:
+        return { type: "text_delta", text: this.textDecoder.decode(payload) };
+      case FRAME_COMPLETE:
+        return { type: "text_complete" };
+      case FRAME_HEARTBEAT:
+        return { type: "heartbeat" };
+      case FRAME_QUESTION:
+        return { type: "complete_transcription", data: this.textDecoder.decode(payload) };
+      case FRAME_JSON:
+        return JSON.parse(this.textDecoder.decode(payload));
+      default:
+        throw new Error(`Unknown output frame type ${frame[0]}`);
+    }
+  }
+}
+
 /**
  * Clean up WebSocket resources
  */
@@ -47,7 +116,11 @@ export const initOutputWebSocket = async (
   const wsUrl = `ws://localhost:8000/ws/output`;
   
   try {
-    refs.outputWs.current = new WebSocket(wsUrl);
+    // Offer the compact binary protocol; the server falls back to JSON text frames
+    refs.outputWs.current = new WebSocket(wsUrl, [COMPACT_SUBPROTOCOL]);
+    refs.outputWs.current.binaryType = "arraybuffer";
+    const compactDecoder = new CompactFrameDecoder();
+    const jsonDecoder = new JsonFrameDecoder();
     
     refs.outputWs.current.onopen = () => {
       handlers.appendMessage("Connected to output websocket", "status");
@@ -56,7 +129,9 @@ export const initOutputWebSocket = async (
     
     refs.outputWs.current.onmessage = (event: MessageEvent) => {
       try {
-        const jsonData = JSON.parse(event.data);
+        const jsonData = event.data instanceof ArrayBuffer
+          ? compactDecoder.decode(event.data)
+          : jsonDecoder.decode(event.data);
         
         // Handle different message types based on the example
         switch(jsonData.type) {
@@ -101,6 +176,16 @@ export const initOutputWebSocket = async (
             handlers.appendMessage("Assistant's response complete", "status");
             break;
             
+          case "ingestion_progress":
+            // Only report finished jobs; FileUpload tracks its own uploads
+            if (jsonData.job.status === "completed" || jsonData.job.status === "failed") {
+              handlers.appendMessage(
+                `Knowledge ingestion ${jsonData.job.status}: ${jsonData.job.files_finished}/${jsonData.job.files_total} file(s)`,
+                "status"
+              );
+            }
+            break;
+
           case "error":
             handlers.appendMessage(`Error: ${jsonData.message}`, "status");
             handlers.setIsLoading(false);
@@ -110,7 +195,7 @@ export const initOutputWebSocket = async (
             console.log("Unknown message type:", jsonData.type);
         }
       } catch (e) {
-        console.error("Error parsing message as JSON:", e);
+        console.error("Error decoding output message:", e);
         handlers.appendMessage(`Error parsing message: ${e}`, "status");
       }
     };